@@ -7,7 +7,9 @@ import csv
 
 from sneparse import RESOURCES
 from sneparse.catalog import Catalog
-from sneparse.record import SneRecord, Source
+from sneparse.record import Source
+from sneparse.cache import ParseCache
+from sneparse.frame import CatalogFrame
 
 if __name__ == "__main__":
 
@@ -15,15 +17,24 @@ if __name__ == "__main__":
 
     N_PROCESSES = 12
 
-    c = Catalog()
-
-    c.parse_dir(RESOURCES.joinpath("oac-data"), Source.OAC, N_PROCESSES)
-    c.parse_dir(RESOURCES.joinpath("tns-data"), Source.TNS, N_PROCESSES)
-
-    with open(RESOURCES.joinpath("sne.csv"), "w") as csvfile:
+    # Only files that changed since the last run are actually parsed, the
+    # rest of the records come from the cache.
+    with Catalog() as c, ParseCache() as cache, open(RESOURCES.joinpath("sne.csv"), "w") as csvfile:
+        # Records are written out chunk by chunk as soon as they are parsed, so the catalog
+        # is never held in memory as `SneRecord`s; only the chunks' columns are kept.
+        chunks = c.iter_dirs_chunks([(RESOURCES.joinpath("oac-data"), Source.OAC),
+                                     (RESOURCES.joinpath("tns-data"), Source.TNS)], N_PROCESSES, cache=cache)
         writer = csv.writer(csvfile, delimiter=',')
         writer.writerow(("name", "ra", "dec",
                           "discovery_date", "claimed_type", "source"))
-        writer.writerows(map(SneRecord.as_row, c.records))
+
+        frames: list[CatalogFrame] = []
+        for chunk in chunks:
+            writer.writerows(chunk.frame.as_rows())
+            frames.append(chunk.frame)
+
+        # Also write a binary snapshot, which is much faster to load than the csv.
+        # See `Catalog.load_snapshot`.
+        CatalogFrame.concat(frames).save(RESOURCES.joinpath("sne.snapshot"))
 
     print(f"------{time.time() - start_time}--------")
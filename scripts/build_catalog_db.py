@@ -1,30 +1,46 @@
 #!/usr/bin/env python3
 from __future__ import annotations
-from typing import cast, Iterator
+from typing import Iterator, Iterable
 import os
-from datetime import timedelta
+from pathlib import Path
+from itertools import chain
 import argparse
 
-from sqlalchemy import URL, create_engine, func, select
-from sqlalchemy.orm import sessionmaker, aliased
-from disjoint_set import DisjointSet
+import numpy as np
+from sqlalchemy import URL, create_engine, select, update
+from sqlalchemy.orm import sessionmaker
 
 from sneparse import RESOURCES
 from sneparse.coordinates import DecimalDegrees, DegreesMinutesSeconds
-from sneparse.record import Source
+from sneparse.record import SneRecord, Source
 from sneparse.catalog import Catalog
+from sneparse.cache import ParseCache
+from sneparse.diagnostics import Detail
 from sneparse.db.models import *
 from sneparse.db.util import paramterize, prepare_q3c_index
+from sneparse.dates import to_datetime64
+from sneparse.grouping import FriendsOfFriends, group_members
 from sneparse.util import unwrap
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--sne", action=argparse.BooleanOptionalAction, default=True)
     parser.add_argument("--tde", action=argparse.BooleanOptionalAction, default=False)
+    parser.add_argument("--cache", action=argparse.BooleanOptionalAction, default=True,
+                        help="only re-parse input files that changed since the last run")
+    parser.add_argument("--git", action=argparse.BooleanOptionalAction, default=False,
+                        help="read OAC data from the HEAD commit of each repository instead of the working tree")
+    parser.add_argument("--log-detail", choices=[d.value for d in Detail], default=Detail.NONE.value,
+                        help="which records with missing fields to write to the warnings log")
     args = parser.parse_args()
+    detail = Detail(args.log_detail)
 
     N_PROCESSES = 12
 
+    # Number of inserted records between commits. Committing regularly lets
+    # the session forget about records that are already in the database.
+    COMMIT_BATCH_SIZE = 10_000
+
     # Initialize Postgres connection
     engine = create_engine(URL.create(
         drivername=unwrap(os.getenv("DRIVER_NAME")),
@@ -38,6 +54,29 @@ if __name__ == "__main__":
     session_maker = sessionmaker(engine)
     session = session_maker()
 
+    cache = ParseCache() if args.cache else None
+
+    def iter_sources(catalog: Catalog, oac_dirs: list[Path], tns_dirs: list[Path]) -> Iterator[SneRecord]:
+        if args.git:
+            # The blobs from every repository go through the same queue to the same workers.
+            return chain(catalog.iter_gits(oac_dirs, num_processes=N_PROCESSES),
+                         catalog.iter_dirs([(d, Source.TNS) for d in tns_dirs], N_PROCESSES, cache=cache))
+
+        # The files from every directory go through the same queue to the same workers.
+        return catalog.iter_dirs([(d, Source.OAC) for d in oac_dirs] + [(d, Source.TNS) for d in tns_dirs],
+                                 N_PROCESSES, cache=cache)
+
+    def insert_records(records: Iterable[SneRecord], row_class: type[MasterRecord] | type[TdeRecord]) -> None:
+        for i, record in enumerate(records, start=1):
+            params: dict = paramterize(record)
+            if row_class is TdeRecord:
+                params.pop("source")
+            session.add(row_class(**params))
+
+            if i % COMMIT_BATCH_SIZE == 0:
+                session.commit()
+        session.commit()
+
     if args.sne:
         # Drop and recreate the master and cleaned tables.
         Base.metadata.drop_all(
@@ -47,65 +86,52 @@ if __name__ == "__main__":
             engine, tables=[MasterRecord.__table__, CleanedRecord.__table__]  # type: ignore
         )
 
-        # Create a catalog from data sources
-        sne_catalog = Catalog()
-
-        # TODO: is it really necessary to construct the entire catalog in memory,
-        # only to add it all to the database and never use it again? It would
-        # probably be better to insert right away after parsing.
-        for d in RESOURCES.joinpath("oac-data").glob("sne-*"):
-            sne_catalog.parse_dir(d, Source.OAC, N_PROCESSES)
-
-        sne_catalog.parse_dir(RESOURCES.joinpath("tns-data"), Source.TNS, N_PROCESSES)
-
-        # Insert records into master table
-        for record in sne_catalog.records:
-            session.add(MasterRecord(**paramterize(record)))
-        session.commit()
+        # Create a catalog from data sources. Its pool of workers is shared by all
+        # the data sources.
+        with Catalog(detail=detail) as sne_catalog:
+            # Insert records into master table as they are parsed, rather than
+            # constructing the entire catalog in memory first.
+            insert_records(
+                iter_sources(sne_catalog,
+                             list(RESOURCES.joinpath("oac-data").glob("sne-*")),
+                             [RESOURCES.joinpath("tns-data")]),
+                MasterRecord
+            )
 
         prepare_q3c_index(MASTER_TABLE_NAME, session)
         session.commit()
 
         # Perform the cross matching
-        separation = DecimalDegrees.from_dms(DegreesMinutesSeconds(1, 0, 0, 5)).degrees
-
-        # TODO: clean up the `where` clause. There has to be a simpler
-        # way to get make a comparison with the absolute value of an interval.
-        aliasMasterRecord = aliased(MasterRecord)
-        select_pairs = \
-            select(MasterRecord, aliasMasterRecord) \
-                .filter(func.q3c_join(MasterRecord.right_ascension,
-                                      MasterRecord.declination,
-                                      aliasMasterRecord.right_ascension,
-                                      aliasMasterRecord.declination,
-                                      separation)) \
-                .where((MasterRecord.name < aliasMasterRecord.name) 
-                          & (((timedelta(0) <= (MasterRecord.discover_date - aliasMasterRecord.discover_date))
-                                  & ((MasterRecord.discover_date - aliasMasterRecord.discover_date) < timedelta(1)))
-                              | ((timedelta(0) <= (aliasMasterRecord.discover_date - MasterRecord.discover_date))
-                                  & ((aliasMasterRecord.discover_date - MasterRecord.discover_date) < timedelta(1)))
-                            )
-                      )
-
-        cross_matches = session.execute(select_pairs).all()
-
-        # Combine matches into disjoint sets of 1, 2, 3, 4, ...
-        ds: DisjointSet[MasterRecord] = DisjointSet()
-        for u, v in [row._tuple() for row in cross_matches]:
-            ds.union(u, v)
-
-        # Assign a representative member in each set and update the table
+        separation = DecimalDegrees.from_dms(DegreesMinutesSeconds(1, 0, 0, 5))
+
+        # Group records within `separation` of each other that were discovered less than a
+        # day apart. Records with the same name are never linked directly.
+        rows = session.execute(
+            select(MasterRecord.id,
+                   MasterRecord.name,
+                   MasterRecord.right_ascension,
+                   MasterRecord.declination,
+                   MasterRecord.discover_date,
+                   MasterRecord.source).order_by(MasterRecord.id)
+        ).all()
+        ids, names, ras, decs, dates, sources = zip(*rows) if rows else ((),) * 6
+        labels = FriendsOfFriends(np.array(ras, dtype=np.float64),
+                                  np.array(decs, dtype=np.float64),
+                                  to_datetime64(dates),
+                                  names=names).groups(separation)
+
+        # Assign a representative member in each group and update the table
         # so that the other members point to it via the `alias_of` foreign key
-        for s in cast(Iterator[set[MasterRecord]], ds.itersets()):
-            unique_records = list(s)
-
+        aliases: list[dict] = []
+        for members in group_members(labels):
             # TODO: the best records are the ones from TNS with the most information
             # (e.g. `claimed_type` not NULL). Use a cost function to evaluate each member
             # and choose the best as the representative.
-            rep_idx = next((i for i, record in enumerate(unique_records) if record.source == Source.TNS), 0)
-            for i, record in enumerate(unique_records):
-                if i != rep_idx:
-                    record.alias_of = unique_records[rep_idx].id
+            rep = next((i for i in members if sources[i] == Source.TNS), members[0])
+            aliases.extend({ "id": ids[i], "alias_of": ids[rep] } for i in members if i != rep)
+
+        if aliases:
+            session.execute(update(MasterRecord), aliases)
         session.commit()
         
         select_reps = select(MasterRecord)\
@@ -133,15 +159,14 @@ if __name__ == "__main__":
         TdeRecord.__table__.drop(engine, checkfirst=True) # type: ignore
         Base.metadata.create_all(engine, tables=[TdeRecord.__table__]) # type: ignore
 
-        tde_catalog = Catalog()
-        for d in RESOURCES.joinpath("oac-data").glob("tde-*"):
-            tde_catalog.parse_dir(d, Source.OAC, N_PROCESSES)
-
-        for record in tde_catalog.records:
-            params: dict = paramterize(record)
-            params.pop("source")
-            session.add(TdeRecord(**params))
-        session.commit()
+        with Catalog(detail=detail) as tde_catalog:
+            insert_records(
+                iter_sources(tde_catalog, list(RESOURCES.joinpath("oac-data").glob("tde-*")), []),
+                TdeRecord
+            )
 
         prepare_q3c_index(TDE_TABLE_NAME, session)
         session.commit()
+
+    if cache is not None:
+        cache.close()
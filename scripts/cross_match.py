@@ -2,7 +2,8 @@
 
 from __future__ import annotations
 import os
-from io import StringIO
+import sys
+from pathlib import Path
 import argparse
 
 from sqlalchemy import URL, create_engine, text
@@ -11,24 +12,103 @@ from sqlalchemy.orm import sessionmaker
 from sneparse import RESOURCES
 from sneparse.coordinates import DecimalDegrees, DegreesMinutesSeconds
 from sneparse.db.models import CLEANED_TABLE_NAME, TDE_TABLE_NAME
+from sneparse.db.util import epoch_components_table
+from sneparse import crossmatch
+from sneparse.crossmatch import EPOCH_DATE_CUTOFFS
+from sneparse.export import EXPORT_FORMATS, copy_to, export_path, select_list
 from sneparse.util import unwrap
 
-EPOCH_DATE_CUTOFFS = {
-    1: "2020-01-01",
-    2: "2022-03-01",
-    3: "2024-01-01",
-}
-
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--sne", action=argparse.BooleanOptionalAction, default=True)
     parser.add_argument("--tde", action=argparse.BooleanOptionalAction, default=False)
+    parser.add_argument("--components", type=Path, default=None,
+                        help="cross match locally against an export (csv or parquet) of the pybdsf_gaussian "
+                             "table, and exports of the catalog tables in resources, instead of using the database")
+    parser.add_argument("--partitioned", action=argparse.BooleanOptionalAction, default=False,
+                        help="with --components, stream the components from disk in declination bands "
+                             "instead of loading them all into memory")
+    parser.add_argument("--memory-budget", type=float, default=crossmatch.PARTITION_MEMORY_BUDGET / (1 << 30),
+                        help="with --partitioned, roughly how much memory (in GiB) the bands being matched may use")
+    parser.add_argument("--radii", type=float, nargs="+", default=None,
+                        help="with --components, cross match with each of these radii (in arcseconds) in one pass, "
+                             "writing the separation and smallest radius of each match to epoch<N>_cross_matches_radii.csv")
+    parser.add_argument("--best", action=argparse.BooleanOptionalAction, default=False,
+                        help="with --components, keep only the nearest component of each sn, along with how many it "
+                             "matched and all the files they're in, writing them to epoch<N>_best_matches.parquet "
+                             "(or .pickle, without pyarrow)")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv",
+                        help="the format to export the cross matches from the database in")
+    parser.add_argument("--catalog-columns", nargs="+", default=None,
+                        help="only export these columns of the catalog tables from the database (default: all)")
+    parser.add_argument("--component-columns", nargs="+", default=None,
+                        help="only export these columns of pybdsf_gaussian from the database; ones also in --catalog-columns are exported as b_{name} (default: all)")
+    parser.add_argument("--rebuild", action=argparse.BooleanOptionalAction, default=False,
+                        help="rebuild this epoch's copy of the pybdsf_gaussian table, even if it's up to date")
     args = parser.parse_args()
 
     epoch = int(unwrap(os.getenv("EPOCH")))
 
+    if args.components is not None:
+        def local_table(table_name: str) -> Path:
+            # Prefer parquet, which is much faster to read.
+            if (path := RESOURCES.joinpath(f"{table_name}.parquet")).exists():
+                return path
+            return RESOURCES.joinpath(f"{table_name}.csv")
+
+        if not args.partitioned:
+            print(f"Reading components from {args.components}")
+            components = crossmatch.epoch_components(crossmatch.read_table(args.components), epoch)
+
+        radii = None if args.radii is None else \
+                    [DecimalDegrees(r / 3600) for r in args.radii]
+        if args.best and radii is not None:
+            parser.error("--best and --radii can't be used together")
+
+        if args.best:
+            try:
+                import pyarrow # noqa: F401
+                extension = "parquet"
+            except ImportError:
+                extension = "pickle"
+            outputs = (f"epoch{epoch}_best_matches.{extension}", f"epoch{epoch}_best_matches_tde.{extension}")
+        else:
+            suffix = "" if radii is None else "_radii"
+            outputs = (f"epoch{epoch}_cross_matches{suffix}.csv", f"epoch{epoch}_cross_matches_tde{suffix}.csv")
+
+        for (enabled, table_name, output_name) in ((args.sne, CLEANED_TABLE_NAME, outputs[0]),
+                                                    (args.tde, TDE_TABLE_NAME, outputs[1])):
+            if not enabled:
+                continue
+            print(f"Cross matching {local_table(table_name)}")
+            catalog = crossmatch.read_table(local_table(table_name))
+            if args.partitioned:
+                cross_matches = crossmatch.cross_match_partitioned(catalog, args.components, epoch,
+                                                                   memory_budget=int(args.memory_budget * (1 << 30)),
+                                                                   radii=radii, best=args.best)
+            elif args.best:
+                cross_matches = crossmatch.cross_match_best(catalog, components, epoch)
+            elif radii is not None:
+                cross_matches = crossmatch.cross_match_radii(catalog, components, epoch, radii)
+            else:
+                cross_matches = crossmatch.cross_match(catalog, components, epoch)
+
+            output_file = RESOURCES.joinpath(output_name)
+            print(f"Writing results to {output_file}")
+            if args.best:
+                crossmatch.save_best_matches(cross_matches, output_file)
+                continue
+            with open(output_file, "w") as csvfile:
+                cross_matches.to_csv(csvfile, index=False)
+
+        # Nothing to do in the database.
+        sys.exit(0)
+
     separation = DecimalDegrees.from_dms(DegreesMinutesSeconds(1, 0, 0, 5)).degrees
 
+    # Only the columns we need are kept in the cross matches.
+    columns = select_list(args.catalog_columns, args.component_columns)
+
     # Setup a connection to CIERA's VLASS db.
     engine = create_engine(URL.create(
         drivername=unwrap(os.getenv("DRIVER_NAME")),
@@ -39,90 +119,43 @@ if __name__ == "__main__":
         port      =int(unwrap(os.getenv("TRANSIENTS_PORT")))
     ))
 
-    session_maker = sessionmaker(engine)  
+    session_maker = sessionmaker(engine)
+
+    # The foreign VLASS sources table is not indexed properly, so we cross match against
+    # a copy of this epoch's components prepared for it. The copy is only built once.
+    with session_maker() as session:
+        gaussian = epoch_components_table(session, epoch, rebuild=args.rebuild)
 
     if args.sne:
         with session_maker() as session:
-            # The foreign VLASS sources table is not indexed properly, so we create a temp
-            # copy of it and prepare it for cross matching.
-            temp_gaussian = "temp_gaussian"
-            create_temp_gaussian = text(
-                f"CREATE TEMPORARY TABLE {temp_gaussian} AS                              \n"
-                f"    SELECT * FROM pybdsf_gaussian WHERE file_name LIKE 'VLASS{epoch}%';\n"
-            )
-            print(create_temp_gaussian)
-            session.execute(create_temp_gaussian)
-
-            q3c_prepare_gaussian = text(
-                f"CREATE INDEX ON {temp_gaussian} (q3c_ang2ipix(\"ra\", \"decl\"));\n"
-                f"CLUSTER {temp_gaussian}_q3c_ang2ipix_idx ON {temp_gaussian};     \n"
-                f"ANALYZE {temp_gaussian};                                         \n"
-            )
-            print(q3c_prepare_gaussian)
-            session.execute(q3c_prepare_gaussian);
-
             temp_cross_match = "temp_cross_match"
             cross_match = text(
                 f"CREATE TEMPORARY TABLE {temp_cross_match} AS                                    \n"
-                f"    SELECT * FROM {CLEANED_TABLE_NAME} AS a, {temp_gaussian} AS b               \n"
+                f"    SELECT {columns} FROM {CLEANED_TABLE_NAME} AS a, {gaussian} AS b            \n"
                 f"    WHERE q3c_join(a.right_ascension, a.declination, b.ra, b.decl, {separation})\n"
-                f"        AND b.file_name LIKE 'VLASS{epoch}%'                                    \n"
                 f"        AND a.discover_date < TIMESTAMP '{EPOCH_DATE_CUTOFFS[epoch]}';          \n"
             )
             print(cross_match)
             session.execute(cross_match)
 
-            # Copy cross matches into memory
-            cross_matches_buffer = StringIO()
-            copy_cross_matches = f"COPY {temp_cross_match} TO STDOUT WITH (FORMAT csv, HEADER);\n"
-            print(copy_cross_matches)
-            session.connection().connection.cursor().copy_expert(copy_cross_matches, cross_matches_buffer)
-            cross_matches_buffer.seek(0)
-
-        output_file = RESOURCES.joinpath(f"epoch{epoch}_cross_matches.csv")
-        print(f"Writing results to {output_file}")
-        with open(output_file, "w") as csvfile:
-            # Save the results to an output file.
-            print(cross_matches_buffer.getvalue(), file=csvfile)
+            # Stream the cross matches straight to the output file.
+            output_file = export_path(RESOURCES.joinpath(f"epoch{epoch}_cross_matches.csv"), args.format)
+            print(f"Writing results to {output_file}")
+            copy_to(session.connection().connection.cursor(), temp_cross_match, output_file)
     if args.tde:
         with session_maker() as session:
-            temp_gaussian = "temp_gaussian"
-            create_temp_gaussian = text(
-                f"CREATE TEMPORARY TABLE {temp_gaussian} AS                              \n"
-                f"    SELECT * FROM pybdsf_gaussian WHERE file_name LIKE 'VLASS{epoch}%';\n"
-            )
-            print(create_temp_gaussian)
-            session.execute(create_temp_gaussian)
-
-            q3c_prepare_gaussian = text(
-                f"CREATE INDEX ON {temp_gaussian} (q3c_ang2ipix(\"ra\", \"decl\"));\n"
-                f"CLUSTER {temp_gaussian}_q3c_ang2ipix_idx ON {temp_gaussian};     \n"
-                f"ANALYZE {temp_gaussian};                                         \n"
-            )
-            print(q3c_prepare_gaussian)
-            session.execute(q3c_prepare_gaussian);
-
             temp_cross_match = "temp_cross_match_tde"
             cross_match = text(
                 f"CREATE TEMPORARY TABLE {temp_cross_match} AS                                    \n"
-                f"    SELECT * FROM {TDE_TABLE_NAME} AS a, {temp_gaussian} AS b                   \n"
+                f"    SELECT {columns} FROM {TDE_TABLE_NAME} AS a, {gaussian} AS b                \n"
                 f"    WHERE q3c_join(a.right_ascension, a.declination, b.ra, b.decl, {separation})\n"
-                f"        AND b.file_name LIKE 'VLASS{epoch}%'                                    \n"
                 f"        AND a.discover_date < TIMESTAMP '{EPOCH_DATE_CUTOFFS[epoch]}'           \n"
             )
             print(cross_match)
             session.execute(cross_match)
 
-            # Copy cross matches into memory
-            cross_matches_buffer = StringIO()
-            copy_cross_matches = f"COPY {temp_cross_match} TO STDOUT WITH (FORMAT csv, HEADER);\n"
-            print(copy_cross_matches)
-            session.connection().connection.cursor().copy_expert(copy_cross_matches, cross_matches_buffer)
-            cross_matches_buffer.seek(0)
-
-        output_file = RESOURCES.joinpath(f"epoch{epoch}_cross_matches_tde.csv")
-        print(f"Writing results to {output_file}")
-        with open(output_file, "w") as csvfile:
-            # Save the results to an output file.
-            print(cross_matches_buffer.getvalue(), file=csvfile)
+            # Stream the cross matches straight to the output file.
+            output_file = export_path(RESOURCES.joinpath(f"epoch{epoch}_cross_matches_tde.csv"), args.format)
+            print(f"Writing results to {output_file}")
+            copy_to(session.connection().connection.cursor(), temp_cross_match, output_file)
 
@@ -14,11 +14,13 @@ from aplpy.core import log
 from sqlalchemy import URL, create_engine
 from sqlalchemy.orm import sessionmaker
 import matplotlib.pyplot as plt
+import pandas as pd
 
 from sneparse import RESOURCES
 from sneparse.record import SneRecord, Source
 from sneparse.util import unwrap, find_paths
 from sneparse.imaging import plot_image_apl
+from sneparse import crossmatch
 
 if __name__ == "__main__":
     epoch = int(unwrap(os.getenv("EPOCH")))
@@ -30,6 +32,9 @@ if __name__ == "__main__":
     parser.add_argument("--make-cache-file", type=str)
     parser.add_argument("--sne", action=argparse.BooleanOptionalAction, default=True)
     parser.add_argument("--tde", action=argparse.BooleanOptionalAction, default=False)
+    parser.add_argument("--best", type=Path, default=None,
+                        help="read the sne to image from the best matches written by cross_match.py --best, "
+                             "instead of all the cross matches")
 
     args = parser.parse_args()
 
@@ -55,6 +60,34 @@ if __name__ == "__main__":
         if cache_file is not None:
             with open(cache_file, "rb") as f:
                 sne = pickle.load(f)
+        elif args.best is not None:
+            with session_maker() as session:
+                fails: list[Tuple[str, str]] = []
+
+                # One row per sn, with every file it was matched in, so each file is only
+                # looked up once per sn.
+                best = crossmatch.load_best_matches(args.best)
+                for row in tqdm(best.itertuples(index=False), total=len(best)):
+                    file_paths: set[Path] = set()
+                    for file_name in row.file_names:
+                        found = find_paths(session, file_name, epoch)
+                        if len(found) == 0:
+                            fails.append((row.name, file_name))
+                        file_paths.update(found)
+
+                    record = SneRecord(
+                        row.name,
+                        row.right_ascension,
+                        row.declination,
+                        None if pd.isna(row.discover_date) else row.discover_date.to_pydatetime(),
+                        None if pd.isna(row.claimed_type) else row.claimed_type,
+                        row.source
+                    )
+                    sne[record] = file_paths
+
+            if len(fails) > 0:
+                print(f"Unable to find FITS files for the following (sne, file) pairs in epoch {epoch}:")
+                pprint(fails)
         else:
             with session_maker() as session:
                 fails: list[Tuple[str, str]] = []
@@ -1,30 +1,33 @@
 #!/usr/bin/env python3
-from typing import Iterator, cast
+from typing import Iterator
 from pathlib import Path
 
-from disjoint_set import DisjointSet
-
 from sneparse import RESOURCES
 from sneparse.catalog import Catalog
+from sneparse.frame import CatalogFrame
+from sneparse.grouping import FriendsOfFriends, group_members
 from sneparse.record import SneRecord
 from sneparse.coordinates import DecimalDegrees
 
 NULL_STR = "None"
 
 def independent_sets(path: Path) -> Iterator[set[SneRecord]]:
-    c: Catalog
-    ds: DisjointSet[SneRecord] = DisjointSet()
-
-    with open(path) as f:
-        # Skip the first line with the column names
-        next(f)
-        c = Catalog.from_lines(f)
-
-    for u, v in c.find_close_pairs(DecimalDegrees(0.000555556)):
-        if u.discover_date is not None and v.discover_date is not None:
-            if abs(u.discover_date - v.discover_date).days < 1:
-                ds.union(u, v)
-    return cast(Iterator[set[SneRecord]], ds.itersets())
+    frame: CatalogFrame
+
+    # Prefer the snapshot written alongside the csv, which loads almost instantly.
+    if (snapshot_path := path.with_suffix(".snapshot")).exists():
+        frame = CatalogFrame.load(snapshot_path)
+    else:
+        with open(path) as f:
+            # Skip the first line with the column names
+            next(f)
+            frame = Catalog.from_lines(f).to_frame()
+
+    labels = FriendsOfFriends(frame.right_ascension, frame.declination, frame.discover_date) \
+                .groups(DecimalDegrees(0.000555556))
+
+    # Only the records that are part of a group need to be created.
+    return ({ frame.record(i) for i in members } for members in group_members(labels))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,52 @@
+from typing import Iterator, Tuple
+from pathlib import Path, PurePosixPath
+import tarfile
+import zipfile
+
+# Suffixes of the archives that can be parsed like directories. See `Catalog.iter_dir`.
+TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+ZSTD_TAR_SUFFIXES = (".tar.zst", ".tzst")
+ZIP_SUFFIXES = (".zip",)
+
+def is_archive(path: Path) -> bool:
+    path = Path(path)
+    return path.is_file() and path.name.endswith(TAR_SUFFIXES + ZSTD_TAR_SUFFIXES + ZIP_SUFFIXES)
+
+def _iter_tar(tar: tarfile.TarFile, archive_path: Path, suffix: str) -> Iterator[Tuple[bytes, Path]]:
+    for member in tar:
+        if member.isfile() and PurePosixPath(member.name).suffix == suffix:
+            f = tar.extractfile(member)
+            assert f is not None
+            yield (f.read(), archive_path.joinpath(member.name))
+
+def iter_members(archive_path: Path, suffix: str) -> Iterator[Tuple[bytes, Path]]:
+    """
+    Read the contents of each file with the given `suffix` in the archive at `archive_path`.
+    Yields the contents along with the path of the file, as if the archive were a directory.
+
+    Archives are read sequentially, in a single pass, so only one member needs to be in
+    memory at a time. Reading zstd-compressed tar files requires the `zstandard` package.
+    """
+    archive_path = Path(archive_path)
+    name = archive_path.name
+
+    if name.endswith(ZIP_SUFFIXES):
+        with zipfile.ZipFile(archive_path) as z:
+            for info in z.infolist():
+                if not info.is_dir() and PurePosixPath(info.filename).suffix == suffix:
+                    yield (z.read(info), archive_path.joinpath(info.filename))
+    elif name.endswith(ZSTD_TAR_SUFFIXES):
+        try:
+            import zstandard
+        except ImportError:
+            raise Exception(f"Reading {archive_path} requires the `zstandard` package")
+
+        with open(archive_path, "rb") as f, zstandard.ZstdDecompressor().stream_reader(f) as reader:
+            with tarfile.open(fileobj=reader, mode="r|") as tar:
+                yield from _iter_tar(tar, archive_path, suffix)
+    elif name.endswith(TAR_SUFFIXES):
+        # Streaming mode, since members are only ever read in order.
+        with tarfile.open(archive_path, mode="r|*") as tar:
+            yield from _iter_tar(tar, archive_path, suffix)
+    else:
+        raise Exception(f"Unknown archive format: {archive_path}")
@@ -0,0 +1,119 @@
+from __future__ import annotations # for postponed annotation evaluation
+from typing import Optional, Any
+from pathlib import Path
+from hashlib import sha1
+import sqlite3
+import pickle
+
+from sneparse import RESOURCES
+from sneparse.frame import CatalogFrame
+
+DEFAULT_CACHE_PATH = RESOURCES.joinpath("cache", "parse_cache.sqlite")
+
+# Bump this whenever a change to the parsers changes the records they produce
+# (or how they are stored), so that records parsed by older code are thrown away.
+CACHE_VERSION = 2
+
+# Number of new entries to write before committing them to disk.
+COMMIT_INTERVAL = 1000
+
+# Files are hashed in blocks of this many bytes.
+HASH_BLOCK_SIZE = 1 << 20
+
+class ParseCache():
+    """
+    A persistent cache of parsed records, for `Catalog.parse_dir` and `Catalog.iter_dir`.
+
+    Each entry maps an input file to the records parsed from it, along with the
+    file's fingerprint: its size and modification time and, if `hash_contents` is
+    set, a hash of its contents. An entry is only used if the file's fingerprint
+    hasn't changed, so only new or modified files ever need to be parsed again.
+
+    The cache is an sqlite database (at `RESOURCES/cache/parse_cache.sqlite` by default),
+    so entries are read and written one at a time rather than all at once.
+    """
+    def __init__(self, path: Path = DEFAULT_CACHE_PATH, hash_contents: bool = False) -> None:
+        self.path = path
+        self.hash_contents = hash_contents
+        self.hits = 0
+        self.misses = 0
+        self._uncommitted = 0
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(path)
+        self._connection.execute("CREATE TABLE IF NOT EXISTS meta (version INTEGER)")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, fingerprint TEXT, records BLOB)"
+        )
+
+        version = self._connection.execute("SELECT version FROM meta").fetchone()
+        if version is None or version[0] != CACHE_VERSION:
+            self._connection.execute("DELETE FROM entries")
+            self._connection.execute("DELETE FROM meta")
+            self._connection.execute("INSERT INTO meta VALUES (?)", (CACHE_VERSION,))
+        self._connection.commit()
+
+    def __enter__(self) -> ParseCache:
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def fingerprint(self, path: Path) -> str:
+        """
+        Get the fingerprint of the file at `path`.
+        """
+        stat = path.stat()
+        digest = ""
+        if self.hash_contents:
+            h = sha1()
+            with open(path, "rb") as f:
+                while block := f.read(HASH_BLOCK_SIZE):
+                    h.update(block)
+            digest = h.hexdigest()
+        return f"{stat.st_size}:{stat.st_mtime_ns}:{digest}"
+
+    def contains(self, key: str, fingerprint: str) -> bool:
+        """
+        Check whether there is an up-to-date entry for `key`, without loading it.
+        """
+        row = self._connection.execute("SELECT fingerprint FROM entries WHERE key = ?", (key,)).fetchone()
+        return row is not None and row[0] == fingerprint
+
+    def get(self, key: str, fingerprint: str) -> Optional[CatalogFrame]:
+        """
+        Get the records cached for `key`, or `None` if there are none or they are out of date.
+        """
+        row = self._connection.execute(
+            "SELECT records FROM entries WHERE key = ? AND fingerprint = ?", (key, fingerprint)
+        ).fetchone()
+
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return pickle.loads(row[0])
+
+    def put(self, key: str, fingerprint: str, records: CatalogFrame) -> None:
+        """
+        Cache the `records` parsed for `key`, replacing any older entry.
+        """
+        self._connection.execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?)",
+            (key, fingerprint, pickle.dumps(records, pickle.HIGHEST_PROTOCOL))
+        )
+
+        self._uncommitted += 1
+        if self._uncommitted >= COMMIT_INTERVAL:
+            self.commit()
+
+    def commit(self) -> None:
+        self._connection.commit()
+        self._uncommitted = 0
+
+    def close(self) -> None:
+        self.commit()
+        self._connection.close()
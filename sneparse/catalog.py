@@ -1,40 +1,94 @@
 from __future__ import annotations # for postponed annotation evaluation
-from typing import Tuple, Any, Iterable, Callable
+from typing import Tuple, Any, Iterable, Iterator, Callable, Optional, Generator, Union, cast
 from pathlib import Path
 from datetime import datetime
-import json
+from threading import Semaphore, Event
+from itertools import count, chain
+from multiprocessing.shared_memory import SharedMemory
+import os
+import time
 import csv
+import io
+import secrets
+
+import numpy as np
 
 # After experimenting with asyncio and threading,
 # multiprocessing gave the best speedup by far for mass parsing,
 # which I think has to do with Python's GIL.
-from multiprocessing import Pool
-from scipy.spatial import KDTree
+from multiprocessing import Pool, get_context, TimeoutError as PoolTimeoutError
+from multiprocessing.pool import Pool as PoolType
 
 from sneparse import RESOURCES
 from sneparse.record import SneRecord, Source
-from sneparse.coordinates import Cartesian, angular_separation_to_distance, DecimalDegrees
+from sneparse.coordinates import DecimalDegrees
+from sneparse.frame import CatalogFrame
+from sneparse.dates import parse_timestamp
+from sneparse.oac import extract_oac_fields
+from sneparse.cache import ParseCache
+from sneparse.diagnostics import ParseDiagnostics, Detail
+from sneparse import gitstore, archive, shared
+from sneparse.util import unwrap
+
 
+# Modules imported by the server process that long-lived pools fork their workers
+# from (see `Catalog.__enter__`), so that the workers don't have to import them.
+FORKSERVER_PRELOAD = ["sneparse.catalog"]
 
-# Using a chunksize > 1 seems to give a slight performance
-# boost to imap after testing multiple values.
-# The exact value isn't that important.
+# Files are handed to the workers in batches of at most this many, and each batch comes
+# back as a single `ParsedChunk`. Using batches > 1 seems to give a slight performance
+# boost to imap after testing multiple values. The exact value isn't that important.
 IMAP_CHUNK_SIZE = 20
 
+# A batch is also closed once its files add up to this many bytes, so a batch of
+# large files doesn't take much longer to parse than a batch of small ones.
+BATCH_BYTES = 1 << 20
+
+# The default number of parsed batches (of up to `IMAP_CHUNK_SIZE` files each) that may
+# be waiting to be consumed, per process, when streaming records out of a `Catalog`
+# (see `Catalog.iter_dir`).
+PENDING_BATCHES_PER_PROCESS = 4
+
+# How often (in seconds) to check that no worker died while waiting for parsed chunks.
+# A pool quietly replaces a worker that dies, and the batch it was parsing never comes back.
+WORKER_POLL_INTERVAL = 1.0
+
 NULL_STR = ""
 
 class Catalog:
     """
     A `Catalog` holds a collection of `SneRecord` objects. It manages a log file
-    to record warnings.
+    to record its progress, and keeps count of the parsed records that are missing
+    fields (see `ParseDiagnostics`). With a `detail` other than `Detail.NONE`, those
+    records are also written to a separate log.
+
+    A `Catalog` created from a `CatalogFrame` (e.g. a snapshot) only creates its
+    `SneRecord` objects when `records` is first accessed.
     """
-    def __init__(self, log_file_name: str = "log.txt") -> None:
+    def __init__(self, log_file_name: str = "log.txt", detail: Detail = Detail.NONE) -> None:
         self.log_file_path = RESOURCES.joinpath("logs", log_file_name)
-        self.records: list[SneRecord] = []
+        self.detail = detail
+        self._records: Optional[list[SneRecord]] = []
+        self._frame: Optional[CatalogFrame] = None
+        self._pool: Optional[PoolType] = None
+        self._keep_pool = False
+
+        # The per-worker statistics of the last parse that ran to completion.
+        self.worker_stats: list[WorkerStats] = []
+
+        # The records with missing fields in the last parse. The summaries of all of the
+        # catalog's parses go to `diagnostics_path`, and the records to `warnings_path`.
+        self.diagnostics: Optional[ParseDiagnostics] = None
+        self.diagnostics_path = self.log_file_path.with_suffix(".diagnostics.json")
+        self.warnings_path = self.log_file_path.with_suffix(".warnings.txt")
 
         with open(self.log_file_path, "w+") as f:
             f.write(f"[{datetime.now().time()}] Catalog created\n")
 
+        # Like the log, the diagnostics only cover this catalog's parses.
+        self.diagnostics_path.unlink(missing_ok=True)
+        self.warnings_path.unlink(missing_ok=True)
+
     @classmethod
     def from_lines(cls, lines: Iterable[str], log_file_name: str = "log.txt") -> Catalog:
         """
@@ -48,61 +102,500 @@ class Catalog:
             name, ra, dec, date, type_, source = line.split(",")
             ra     = None if ra    == NULL_STR else float(ra)
             dec    = None if dec   == NULL_STR else float(dec)
-            date   = None if date  == NULL_STR else datetime.strptime(date, "%Y-%m-%d %H:%M:%S.%f")
+            date   = None if date  == NULL_STR else parse_timestamp(date)
             type_  = None if type_ == NULL_STR else type_
             source = source.replace("\n", "")
             c.records.append(SneRecord(name, ra, dec, date, type_, Source.from_str(source)))
 
         return c
 
-    def _parse_dir_base(self,
-                        dir_path: Path,
-                        worker: Callable[[Path], Tuple[list[SneRecord], Path]],
-                        pattern: str,
-                        num_processes: int = 12) -> None:
+    @classmethod
+    def from_frame(cls, frame: CatalogFrame, log_file_name: str = "log.txt") -> Catalog:
+        """
+        Create a `Catalog` from the records in a `CatalogFrame`.
+        """
+        c = Catalog(log_file_name)
+        c._records = None
+        c._frame = frame
+        return c
+
+    @classmethod
+    def load_snapshot(cls, path: Path, log_file_name: str = "log.txt") -> Catalog:
+        """
+        Create a `Catalog` from a snapshot written by `save_snapshot`. The snapshot is
+        memory-mapped, and records are only created when they are needed.
+        """
+        return Catalog.from_frame(CatalogFrame.load(path), log_file_name)
+
+    def save_snapshot(self, path: Path) -> None:
+        """
+        Write `self`'s records to a binary snapshot file. See `CatalogFrame.save`.
+        """
+        self.to_frame().save(path)
+
+    @property
+    def records(self) -> list[SneRecord]:
+        if self._records is None:
+            self._records = unwrap(self._frame).to_records()
+            self._frame = None
+        return self._records
+
+    @records.setter
+    def records(self, records: list[SneRecord]) -> None:
+        self._records = records
+        self._frame = None
+
+    def to_frame(self) -> CatalogFrame:
+        """
+        Get the columnar representation of `self`'s records. The indices of
+        the frame match the indices of `self.records`.
+        """
+        if self._records is None:
+            return unwrap(self._frame)
+        return CatalogFrame.from_records(self._records)
+
+    def _extend(self, frame: CatalogFrame) -> None:
+        """
+        Add the records in `frame` to `self`. If `self`'s records haven't been
+        created yet, they still aren't.
+        """
+        if self._records is None:
+            self._frame = CatalogFrame.concat([unwrap(self._frame), frame])
+        elif len(self._records) == 0:
+            self._records = None
+            self._frame = frame
+        else:
+            self._records.extend(frame)
+
+    def __enter__(self) -> Catalog:
+        """
+        Keep a pool of worker processes around for as long as the `Catalog` is
+        used as a context manager, rather than starting a new pool for every call
+        to `parse_dir`, `iter_dir`, etc.
+        """
+        self._keep_pool = True
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Stop the `Catalog`'s pool of worker processes, if it has one.
+        """
+        self._keep_pool = False
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def _get_pool(self, num_processes: int) -> Tuple[PoolType, bool]:
+        """
+        Get a pool to parse with, and whether it's `self`'s long-lived pool
+        (as opposed to one that should be torn down when parsing is done).
+        """
+        if not self._keep_pool:
+            return (Pool(num_processes), False)
+
+        if self._pool is None:
+            # Workers are forked from a server process that has already imported
+            # `sneparse` (and so numpy, scipy, etc.), so they start quickly and
+            # don't inherit anything else from this process.
+            context = get_context("forkserver")
+            context.set_forkserver_preload(FORKSERVER_PRELOAD)
+            self._pool = context.Pool(num_processes)
+        return (self._pool, True)
+
+    def _iter_chunks(self,
+                     description: str,
+                     tasks: Iterable[SizedTask],
+                     num_processes: int = 12,
+                     max_pending: Optional[int] = None,
+                     cached: Iterable[ParsedChunk] = (),
+                     on_parsed: Optional[Callable[[ParsedChunk], None]] = None,
+                     segments: Optional[SharedSegments] = None) -> Iterator[ParsedChunk]:
+        """
+        Hand the `tasks` to the workers in batches, in order, and yield the `ParsedChunk`
+        of each batch, along with any `cached` chunks that don't need parsing.
+        `on_parsed` is called with each newly parsed chunk. At most `max_pending`
+        parsed batches wait to be consumed at a time.
+
+        If `segments` is given, the workers send back their chunks through shared
+        memory (see `SharedSegments`).
+        """
+        if max_pending is None:
+            max_pending = PENDING_BATCHES_PER_PROCESS * num_processes
+
+        # The pool's task handler would otherwise drain `tasks` as fast as it can, and the
+        # results would pile up in the pool's (unbounded) result queue whenever the consumer
+        # is slower than the workers. Each batch handed to the pool takes a slot, and each
+        # chunk handed to the consumer gives one back.
+        slots = Semaphore(max(max_pending, 1))
+        stopped = Event()
+
+        def throttled(tasks: Iterable[SizedTask]) -> Iterator[Batch]:
+            for batch in _batched(tasks, IMAP_CHUNK_SIZE, BATCH_BYTES):
+                slots.acquire()
+                if stopped.is_set():
+                    return
+                yield (batch, None if segments is None else segments.new_name())
+
         with open(self.log_file_path, "a+") as f:
-            f.write(f"[{datetime.now().time()}] Parsing files in {dir_path}\n")
+            f.write(f"[{datetime.now().time()}] Parsing {description}\n")
+
+            pool, persistent = self._get_pool(num_processes)
+            finished = False
+            crashed = False
+            stats: dict[int, WorkerStats] = {}
+            start = time.perf_counter()
+
+            # Records with missing fields are only counted while parsing. The summary
+            # is added to those of the catalog's earlier parses once parsing stops, and
+            # the detail log, if any, is appended to.
+            self.diagnostics = diagnostics = ParseDiagnostics(self.diagnostics_path,
+                                                              self.warnings_path,
+                                                              self.detail,
+                                                              description)
 
-            # Recursively find all json files in the specified directory.
-            paths = Path(dir_path).glob(pattern)
-            pool = Pool(num_processes)
+            pids = _worker_pids(pool)
+            results: Optional[Iterator[Any]] = None
 
-            # Parse each record. Files are split among multiple processes for
-            # an easy speedup to this loop.
-            for records, path in pool.imap_unordered(worker, paths, IMAP_CHUNK_SIZE):
-                self.records.extend(records)
+            try:
+                # Files are split among multiple processes for an easy speedup. The pool
+                # starts working on them right away, while the cached chunks are consumed.
+                results = pool.imap_unordered(_parse_batch_worker, throttled(tasks))
 
-                for r in records:
-                    # The unclassified TNS data will naturaly be missing a claimed type.
-                    # We set it to `None` instead of the empty string for consistency.
-                    if r.claimed_type == "":
-                        r.claimed_type = None
+                for chunk in cached:
+                    diagnostics.add(chunk)
+                    yield chunk
 
-                    # If any of the fields in the newly parsed record are empty,
-                    # then put a warning in the log file.
-                    if len(missing := [k for (k, v) in vars(r).items() if v is None]):
-                        f.write(f"[{datetime.now().time()}] Warning: In '{path}','{r.name}' is missing {', '.join(missing)}\n")
+                while True:
+                    try:
+                        result = results.next(WORKER_POLL_INTERVAL) # type: ignore
+                    except StopIteration:
+                        break
+                    except PoolTimeoutError:
+                        if _worker_pids(pool) != pids:
+                            crashed = True
+                            raise Exception(f"A worker process died while parsing {description}")
+                        continue
 
-            # Clean up
-            pool.close()
-            pool.join()
+                    slots.release()
+                    chunk = result if segments is None else segments.attach(cast(SharedChunk, result))
+                    stats.setdefault(chunk.pid, WorkerStats(chunk.pid)).add(chunk)
+                    if on_parsed is not None:
+                        on_parsed(chunk)
+                    diagnostics.add(chunk)
+                    yield chunk
+                finished = True
 
-    def parse_dir(self, dir_path: Path, source: Source, num_processes: int = 12) -> None:
+                self.worker_stats = list(stats.values())
+                elapsed = time.perf_counter() - start
+                for worker_stats in self.worker_stats:
+                    f.write(f"[{datetime.now().time()}] {worker_stats.summary(elapsed)}\n")
+                f.write(f"[{datetime.now().time()}] {diagnostics.incomplete} of {diagnostics.records} records "
+                        f"are missing fields, see '{diagnostics.run}' in '{diagnostics.summary_path}'\n")
+            finally:
+                # If the consumer stopped early, the task handler may be waiting on a slot.
+                # Wake it up so that it can notice it should stop, then clean up.
+                stopped.set()
+                slots.release()
+
+                if persistent and not finished and not crashed and results is not None:
+                    # A long-lived pool can't just be terminated. Wait for the few
+                    # batches already handed out, so they don't hold up the next
+                    # call (or create shared memory segments after they're removed).
+                    crashed = not _drain(results, pool, pids)
+
+                if not persistent or crashed:
+                    if finished:
+                        pool.close()
+                    pool.terminate()
+                    pool.join()
+                    if persistent:
+                        # The batch of the worker that died will never come back, so the
+                        # long-lived pool can't be waited on. The next call starts a new one.
+                        self._pool = None
+
+                diagnostics.close()
+
+    def _dir_tasks(self,
+                   dir_path: Path,
+                   source: Source,
+                   cache: Optional[ParseCache],
+                   fingerprints: dict[Path, Tuple[str, str]],
+                   cached: list[Tuple[str, str, Path]]) -> Tuple[list[SizedTask], Iterable[SizedTask]]:
         """
-        Recursively parse all json files in a directory into a `Catalog`'s
-        records. Multiple processes can be used for a perfomance boost on
-        a multicore system. For best perfomance, `num_processes` should
-        equal the number of cores.
+        Get the tasks for parsing the files of a given `source` in a directory or an
+        archive, as a list of the tasks for files and an iterable of the tasks for
+        members of an archive (which are only read as they are needed). Files that
+        are already in the `cache` are added to `cached` instead, and the cache entry
+        of each file to parse is added to `fingerprints`.
         """
         match source:
             case Source.OAC:
-                self._parse_dir_base(dir_path, _parse_dir_oac_worker, "**/*.json", num_processes);
+                worker, member_worker, suffix = _parse_dir_oac_worker, _parse_member_oac_worker, ".json"
             case Source.TNS:
-                self._parse_dir_base(dir_path, _parse_dir_tns_worker, "**/*.tsv", num_processes);
+                worker, member_worker, suffix = _parse_dir_tns_worker, _parse_member_tns_worker, ".tsv"
             case _:
                 raise Exception(f"Unknown source: {source}")
 
+        if archive.is_archive(dir_path):
+            # Archives are read lazily, as the workers ask for more tasks.
+            return ([], (((member_worker, member), len(member[0]))
+                            for member in archive.iter_members(dir_path, suffix)))
+
+        # Recursively find all matching files in the specified directory.
+        tasks: list[SizedTask] = []
+        for path in Path(dir_path).glob(f"**/*{suffix}"):
+            if cache is not None:
+                # Files that haven't changed since they were last parsed don't need to
+                # go to the pool at all.
+                key, fingerprint = _cache_key(source, path), cache.fingerprint(path)
+                if cache.contains(key, fingerprint):
+                    cached.append((key, fingerprint, path))
+                    continue
+                fingerprints[path] = (key, fingerprint)
+            tasks.append(((worker, path), path.stat().st_size))
+        return (tasks, ())
 
+    def iter_dirs_chunks(self,
+                         inputs: Iterable[Tuple[Path, Source]],
+                         num_processes: int = 12,
+                         max_pending: Optional[int] = None,
+                         cache: Optional[ParseCache] = None,
+                         segments: Optional[SharedSegments] = None) -> Iterator[ParsedChunk]:
+        """
+        Like `iter_dirs`, but yield the records in the columnar chunks the workers
+        return them in, rather than one `SneRecord` at a time.
+
+        If `segments` is given, the chunks are sent back through shared memory. They
+        are only valid until `segments` is closed.
+        """
+        inputs = list(inputs)
+        cached: list[Tuple[str, str, Path]] = []
+        fingerprints: dict[Path, Tuple[str, str]] = {}
+        files: list[SizedTask] = []
+        streamed: list[Iterable[SizedTask]] = []
+        for dir_path, source in inputs:
+            input_files, input_streamed = self._dir_tasks(dir_path, source, cache, fingerprints, cached)
+            files.extend(input_files)
+            streamed.append(input_streamed)
+
+        # Files range from a few KB to tens of MB. Handing out the largest ones first
+        # (longest-processing-time-first scheduling) means the last batches are all
+        # small, instead of a few workers still chewing on huge files while the rest
+        # sit idle.
+        files.sort(key=lambda task: task[1], reverse=True)
+        tasks = [files, *streamed]
+
+        description = ", ".join(str(dir_path) for (dir_path, _) in inputs)
+        if cache is None:
+            return self._iter_chunks(description, chain(*tasks), num_processes, max_pending, segments=segments)
+
+        def put(chunk: ParsedChunk) -> None:
+            for path, frame in chunk.split():
+                # Members of archives are never cached, so they have no cache entry.
+                if path in fingerprints:
+                    cache.put(*fingerprints[path], frame)
+
+        def committed(chunks: Iterator[ParsedChunk]) -> Iterator[ParsedChunk]:
+            try:
+                yield from chunks
+            finally:
+                cache.commit()
+
+        return committed(self._iter_chunks(
+            f"{description} ({len(cached)} cached, {len(fingerprints)} to parse)",
+            chain(*tasks),
+            num_processes,
+            max_pending,
+            cached=(ParsedChunk.of_file(unwrap(cache.get(key, fingerprint)), path)
+                        for key, fingerprint, path in cached),
+            on_parsed=put,
+            segments=segments
+        ))
+
+    def iter_dirs(self,
+                  inputs: Iterable[Tuple[Path, Source]],
+                  num_processes: int = 12,
+                  max_pending: Optional[int] = None,
+                  cache: Optional[ParseCache] = None) -> Iterator[SneRecord]:
+        """
+        Like `iter_dir`, for several `(dir_path, source)` inputs at once. The files
+        of all the inputs go through the same queue to the same workers, so there's
+        no winding down and starting up again between inputs.
+        """
+        return _iter_records(self.iter_dirs_chunks(inputs, num_processes, max_pending, cache))
+
+    def parse_dirs(self,
+                   inputs: Iterable[Tuple[Path, Source]],
+                   num_processes: int = 12,
+                   cache: Optional[ParseCache] = None,
+                   shared_memory: bool = False) -> None:
+        """
+        Like `parse_dir`, for several `(dir_path, source)` inputs at once. See `iter_dirs`.
+        """
+        if not shared_memory:
+            # The chunks are put together without creating an `SneRecord` for each record.
+            self._extend(CatalogFrame.concat(
+                chunk.frame for chunk in self.iter_dirs_chunks(inputs, num_processes, cache=cache)
+            ))
+            return
+
+        with SharedSegments() as segments:
+            # The chunks are read straight out of the segments, but `concat` still copies
+            # them into the catalog's frame, once, before the segments are closed.
+            self._extend(CatalogFrame.concat(
+                chunk.frame for chunk in self.iter_dirs_chunks(inputs, num_processes,
+                                                               cache=cache, segments=segments)
+            ))
+
+    def iter_dir_chunks(self,
+                        dir_path: Path,
+                        source: Source,
+                        num_processes: int = 12,
+                        max_pending: Optional[int] = None,
+                        cache: Optional[ParseCache] = None,
+                        segments: Optional[SharedSegments] = None) -> Iterator[ParsedChunk]:
+        """
+        Like `iter_dir`, but yield the records in the columnar chunks the workers
+        return them in, rather than one `SneRecord` at a time.
+
+        If `segments` is given, the chunks are sent back through shared memory. They
+        are only valid until `segments` is closed.
+        """
+        return self.iter_dirs_chunks([(dir_path, source)], num_processes, max_pending, cache, segments)
+
+    def iter_dir(self,
+                 dir_path: Path,
+                 source: Source,
+                 num_processes: int = 12,
+                 max_pending: Optional[int] = None,
+                 cache: Optional[ParseCache] = None) -> Iterator[SneRecord]:
+        """
+        Recursively parse all files of a given `source` in a directory, yielding
+        each `SneRecord` as soon as a worker has parsed it. Unlike `parse_dir`,
+        the records are not stored in the `Catalog`, so a consumer that writes
+        records out as it goes (e.g. to a csv file or a database) runs in constant
+        memory.
+
+        At most `max_pending` parsed batches (of up to `IMAP_CHUNK_SIZE` files, or
+        `BATCH_BYTES` bytes, each) may be waiting to be consumed at a time (by default,
+        `PENDING_BATCHES_PER_PROCESS` per process). Workers pause when this limit is
+        reached, so a slow consumer is never buried in parsed records.
+
+        If a `cache` is given, files that haven't changed since they were cached are
+        not parsed again; their records are loaded from the cache instead. Newly parsed
+        files are added to the cache.
+
+        `dir_path` may also be an archive (see `sneparse.archive`), in which case the
+        files in it are read one after another and handed to the workers as bytes,
+        instead of each being opened separately. Archives are not cached.
+        """
+        return _iter_records(self.iter_dir_chunks(dir_path, source, num_processes, max_pending, cache))
+
+    def parse_dir(self,
+                  dir_path: Path,
+                  source: Source,
+                  num_processes: int = 12,
+                  cache: Optional[ParseCache] = None,
+                  shared_memory: bool = False) -> None:
+        """
+        Recursively parse all files of a given `source` in a directory (or an
+        archive) into a `Catalog`'s records. Multiple processes can be used for
+        a perfomance boost on a multicore system. For best perfomance,
+        `num_processes` should equal the number of cores. See `iter_dir` for
+        the use of `cache`.
+
+        If `shared_memory` is set, the workers write their records to shared memory
+        instead of pickling them and sending them back through a pipe. The records are
+        still copied once out of shared memory when they are put together into the
+        catalog, so this only pays off when there are enough processes for the pipes
+        to become the bottleneck.
+        """
+        self.parse_dirs([(dir_path, source)], num_processes, cache, shared_memory)
+
+    def iter_gits_chunks(self,
+                         repo_paths: Iterable[Path],
+                         commit: str = "HEAD",
+                         since: Optional[str] = None,
+                         num_processes: int = 12,
+                         max_pending: Optional[int] = None) -> Iterator[ParsedChunk]:
+        """
+        Like `iter_gits`, but yield the records in the columnar chunks the workers
+        return them in, rather than one `SneRecord` at a time.
+        """
+        repo_paths = list(repo_paths)
+        range_ = commit if since is None else f"{since}..{commit}"
+        description = ", ".join(f"{range_} of {repo_path}" for repo_path in repo_paths)
+
+        blobs = [(repo_path, blob) for repo_path in repo_paths
+                    for blob in (gitstore.list_blobs(repo_path, commit) if since is None
+                                     else gitstore.changed_blobs(repo_path, since, commit))]
+
+        # Each worker reads blobs through its own long-lived `git cat-file` process
+        # per repository.
+        return self._iter_chunks(description,
+                                 (((_parse_git_oac_worker, (repo_path, oid, Path(repo_path).joinpath(path))), 0)
+                                     for repo_path, (oid, path) in blobs),
+                                 num_processes,
+                                 max_pending)
+
+    def iter_git_chunks(self,
+                        repo_path: Path,
+                        commit: str = "HEAD",
+                        since: Optional[str] = None,
+                        num_processes: int = 12,
+                        max_pending: Optional[int] = None) -> Iterator[ParsedChunk]:
+        """
+        Like `iter_git`, but yield the records in the columnar chunks the workers
+        return them in, rather than one `SneRecord` at a time.
+        """
+        return self.iter_gits_chunks([repo_path], commit, since, num_processes, max_pending)
+
+    def iter_gits(self,
+                  repo_paths: Iterable[Path],
+                  commit: str = "HEAD",
+                  since: Optional[str] = None,
+                  num_processes: int = 12,
+                  max_pending: Optional[int] = None) -> Iterator[SneRecord]:
+        """
+        Like `iter_git`, for several repositories at once. The blobs of all the
+        repositories go through the same queue to the same workers, like the files
+        of `iter_dirs`.
+        """
+        return _iter_records(self.iter_gits_chunks(repo_paths, commit, since, num_processes, max_pending))
+
+    def iter_git(self,
+                 repo_path: Path,
+                 commit: str = "HEAD",
+                 since: Optional[str] = None,
+                 num_processes: int = 12,
+                 max_pending: Optional[int] = None) -> Iterator[SneRecord]:
+        """
+        Like `iter_dir` for OAC data, but parse the json files in the tree of a
+        `commit` of the git repository at `repo_path`, reading them straight out of
+        the repository's object store rather than from the working tree.
+
+        If `since` is given, only the files that were added or modified between
+        `since` and `commit` are parsed. Records of files that were deleted or
+        modified are not removed from anywhere; that's up to the caller.
+        """
+        return _iter_records(self.iter_git_chunks(repo_path, commit, since, num_processes, max_pending))
+
+    def parse_git(self,
+                  repo_path: Path,
+                  commit: str = "HEAD",
+                  since: Optional[str] = None,
+                  num_processes: int = 12) -> None:
+        """
+        Parse the OAC json files of a git repository into a `Catalog`'s records.
+        See `iter_git`.
+        """
+        self._extend(CatalogFrame.concat(
+            chunk.frame for chunk in self.iter_git_chunks(repo_path, commit, since, num_processes)
+        ))
 
     def find_close_pairs(self, threshold: DecimalDegrees) -> list[Tuple[SneRecord, SneRecord]]:
         """
@@ -110,20 +603,262 @@ class Catalog:
         `threshold`. This function is useful for identifying
         records which likely refer to the same source in the sky.
         """
+        frame = self.to_frame()
+
+        # Only the records that are part of a pair need to be created.
+        record: Callable[[int], SneRecord] = frame.record if self._records is None else self._records.__getitem__
+        return [(record(i), record(j)) for (i, j) in frame.find_close_pairs(threshold)]
+
+class ParsedChunk():
+    """
+    The records parsed from a batch of files, as returned by a worker.
+
+    Rather than a list of `SneRecord`s, which would be pickled (and unpickled)
+    object by object, a chunk holds:
+        * `frame`: the records, as a `CatalogFrame` (which pickles as a few arrays)
+        * `paths`: the paths of the files in the batch
+        * `path_index`: for each record, the index in `paths` of its file
+        * `warnings`: for each record, a mask of the fields it is missing
+          (see `CatalogFrame.missing_fields`)
+        * `pid` and `busy`: the worker process that parsed the batch, and how many
+          seconds it spent doing so (0 for chunks that weren't parsed by a worker)
+
+    The records of each file are contiguous and in the same order as `paths`.
+    """
+    def __init__(self,
+                 frame: CatalogFrame,
+                 paths: list[Path],
+                 path_index: np.ndarray,
+                 warnings: np.ndarray,
+                 pid: int = 0,
+                 busy: float = 0.0) -> None:
+        self.frame      = frame
+        self.paths      = paths
+        self.path_index = path_index
+        self.warnings   = warnings
+        self.pid        = pid
+        self.busy       = busy
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    @classmethod
+    def of_file(cls, frame: CatalogFrame, path: Path) -> ParsedChunk:
+        """
+        Create a chunk of the records parsed from a single file.
+        """
+        return ParsedChunk(frame, [path], np.zeros(len(frame), dtype=np.int32), frame.missing_fields())
+
+    def columns(self) -> dict[str, np.ndarray]:
+        return self.frame.columns() | { "path_index": self.path_index, "warnings": self.warnings }
+
+    @classmethod
+    def from_columns(cls,
+                     columns: dict[str, np.ndarray],
+                     claimed_types: list[str],
+                     paths: list[Path],
+                     pid: int = 0,
+                     busy: float = 0.0) -> ParsedChunk:
+        return ParsedChunk(CatalogFrame.from_columns(columns, claimed_types), paths,
+                           columns["path_index"], columns["warnings"], pid, busy)
+
+    def split(self) -> Iterator[Tuple[Path, CatalogFrame]]:
+        """
+        The records of each file in the chunk, with the file's path.
+        """
+        bounds = np.searchsorted(self.path_index, np.arange(len(self.paths) + 1))
+        for i, path in enumerate(self.paths):
+            yield (path, self.frame.take(slice(bounds[i], bounds[i + 1])))
+
+class WorkerStats():
+    """
+    How much work a worker process did while parsing, to see how evenly
+    the work was spread out.
+    """
+    def __init__(self, pid: int) -> None:
+        self.pid = pid
+        self.batches = 0
+        self.files = 0
+        self.records = 0
+        self.busy = 0.0
+
+    def add(self, chunk: ParsedChunk) -> None:
+        self.batches += 1
+        self.files += len(chunk.paths)
+        self.records += len(chunk)
+        self.busy += chunk.busy
+
+    def summary(self, elapsed: float) -> str:
+        utilization = self.busy / elapsed if elapsed > 0 else 0.0
+        return f"Worker {self.pid}: {self.batches} batches, {self.files} files, {self.records} records, " \
+               f"busy {self.busy:.2f}s of {elapsed:.2f}s ({utilization:.0%})"
+
+class SharedChunk():
+    """
+    A `ParsedChunk` whose columns were written to a shared memory segment by a
+    worker. Only this small description of the chunk goes through the pipe.
+    """
+    def __init__(self,
+                 segment: str,
+                 layout: dict[str, dict[str, Any]],
+                 claimed_types: list[str],
+                 paths: list[Path],
+                 pid: int,
+                 busy: float) -> None:
+        self.segment       = segment
+        self.layout        = layout
+        self.claimed_types = claimed_types
+        self.paths         = paths
+        self.pid           = pid
+        self.busy          = busy
+
+class SharedSegments():
+    """
+    The shared memory segments used to send `ParsedChunk`s back from the workers.
+
+    Segments are named after this process, a random token and the number of the
+    batch they're for (`sneparse_{pid}_{token}_{run}_{batch}`), so every segment that
+    may have been created is known, and all of them are removed when this is closed,
+    even if a worker failed (or died) before sending back its chunk. The token keeps
+    the names from colliding with segments left behind by an earlier process that had
+    the same pid and was killed before it could clean up.
+
+    Each segment is unlinked as soon as its chunk is attached. Its memory stays
+    mapped until this is closed.
+    """
+    def __init__(self) -> None:
+        self.prefix = f"sneparse_{os.getpid()}_{secrets.token_hex(4)}_{next(_shared_runs)}"
+        self.count = 0
+        self._attached: list[SharedMemory] = []
+
+    def __enter__(self) -> SharedSegments:
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        self.close()
+
+    def new_name(self) -> str:
+        name = f"{self.prefix}_{self.count}"
+        self.count += 1
+        return name
+
+    def attach(self, chunk: SharedChunk) -> ParsedChunk:
+        """
+        Get the `ParsedChunk` in a segment, without copying it.
+        """
+        shm, columns = shared.read_columns(chunk.segment, chunk.layout)
+        self._attached.append(shm)
+        shm.unlink()
+        return ParsedChunk.from_columns(columns, chunk.claimed_types, chunk.paths, chunk.pid, chunk.busy)
+
+    def close(self) -> None:
+        for shm in self._attached:
+            try:
+                shm.close()
+            except BufferError:
+                # Something still holds on to an array in the segment. It
+                # stays mapped until that's gone, but can still be unlinked.
+                pass
+        self._attached.clear()
+
+        for i in range(self.count):
+            shared.unlink(f"{self.prefix}_{i}")
 
-        valid_records = [r for r in self.records if r.right_ascension is not None and r.declination is not None]
+_shared_runs = count()
 
-        distance_threshold = angular_separation_to_distance(threshold)
+# A task for `_parse_batch_worker`: the worker to parse the task with, and the task
+# itself (e.g. a path).
+Task = Tuple[Callable[[Any], Tuple[list[SneRecord], Path]], Any]
 
-        # The typechecker will complain on the call to KDTree if `points` is allowed
-        # the type of list[Tuple[ ... ]] because apparently it isn't `ArrayLike` (Why not??).
-        # So we set it to list[Any].
-        points: list[Any] = [((c := Cartesian.from_angular(r.right_ascension, r.declination)).x, c.y, c.z) \
-                for r in valid_records]
+# A task, with the size in bytes of its input (0 if unknown).
+SizedTask = Tuple[Task, int]
 
+# A batch of tasks for `_parse_batch_worker`, and the shared memory segment to write
+# the results to, if any.
+Batch = Tuple[list[Task], Optional[str]]
 
-        kd_tree = KDTree(points)
-        return [(valid_records[i], valid_records[j]) for (i, j) in kd_tree.query_pairs(distance_threshold)]
+def _batched(tasks: Iterable[SizedTask], max_count: int, max_bytes: int) -> Iterator[list[Task]]:
+    """
+    Split some `tasks` into batches of at most `max_count` tasks, closing a batch
+    early once the sizes of its tasks add up to `max_bytes`.
+    """
+    batch: list[Task] = []
+    size = 0
+    for task, task_size in tasks:
+        batch.append(task)
+        size += task_size
+        if len(batch) >= max_count or size >= max_bytes:
+            yield batch
+            batch = []
+            size = 0
+    if len(batch):
+        yield batch
+
+def _worker_pids(pool: PoolType) -> set[int]:
+    # `Pool` doesn't expose its workers, but a change in them is the only sign that one
+    # of them died. (Workers never exit on their own, since `maxtasksperchild` isn't set.)
+    return { process.pid for process in pool._pool } # type: ignore
+
+def _drain(results: Any, pool: PoolType, pids: set[int]) -> bool:
+    """
+    Wait for all the `results` of a `pool`, ignoring any errors. Returns whether they
+    all came back, which they don't if one of the workers (originally `pids`) died.
+    """
+    while True:
+        try:
+            results.next(WORKER_POLL_INTERVAL)
+        except StopIteration:
+            return True
+        except PoolTimeoutError:
+            if _worker_pids(pool) != pids:
+                return False
+        except Exception:
+            pass
+
+def _iter_records(chunks: Iterator[ParsedChunk]) -> Iterator[SneRecord]:
+    try:
+        for chunk in chunks:
+            yield from chunk.frame
+    finally:
+        # Stop the workers as soon as the consumer stops.
+        if isinstance(chunks, Generator):
+            chunks.close()
+
+# This function must be top-level defined so that in can be pickled and used
+# with the multiprocessing pool.
+def _parse_batch_worker(batch: Batch) -> Union[ParsedChunk, SharedChunk]:
+    """
+    Parse each task in a batch with the given worker, and put the results together in a `ParsedChunk`.
+    """
+    tasks, segment = batch
+    start = time.perf_counter()
+
+    records: list[SneRecord] = []
+    paths: list[Path] = []
+    path_index: list[int] = []
+    for worker, task in tasks:
+        file_records, path = worker(task)
+        for r in file_records:
+            # The unclassified TNS data will naturaly be missing a claimed type.
+            # We set it to `None` instead of the empty string for consistency.
+            if r.claimed_type == "":
+                r.claimed_type = None
+
+        path_index.extend([len(paths)] * len(file_records))
+        paths.append(path)
+        records.extend(file_records)
+
+    frame = CatalogFrame.from_records(records)
+    chunk = ParsedChunk(frame, paths, np.array(path_index, dtype=np.int32), frame.missing_fields())
+    if segment is None:
+        chunk.pid, chunk.busy = os.getpid(), time.perf_counter() - start
+        return chunk
+
+    layout = shared.write_columns(segment, chunk.columns())
+    return SharedChunk(segment, layout, frame.claimed_types, paths, os.getpid(), time.perf_counter() - start)
+
+def _cache_key(source: Source, path: Path) -> str:
+    return f"{source.value}:{path.resolve()}"
 
 # This function must be top-level defined so that in can be pickled and used
 # with the multiprocessing pool.
@@ -131,13 +866,33 @@ def _parse_dir_oac_worker(path: Path) -> Tuple[list[SneRecord], Path]:
     """
     Create an `SneRecord` from an OAC json file at a given `path`.
     """
-    d: dict[str, Any]
     with open(path, "r") as f:
-        d = json.load(f)
+        # The path is passed back in the return value so that the caller can access
+        # it for logging purposes. There might be a better way to do this.
+        return ([_parse_oac_text(f.read())], path)
 
-    # The path is passed back in the return value so that the caller can access
-    # it for logging purposes. There might be a better way to do this.
-    return ([SneRecord.from_oac(d)], path)
+# This function must be top-level defined so that in can be pickled and used
+# with the multiprocessing pool.
+def _parse_git_oac_worker(blob: Tuple[Path, str, Path]) -> Tuple[list[SneRecord], Path]:
+    """
+    Create an `SneRecord` from an OAC json blob, given its repository, object id and path.
+    """
+    repo_path, oid, path = blob
+    return ([_parse_oac_text(gitstore.read_blob(repo_path, oid).decode())], path)
+
+# This function must be top-level defined so that in can be pickled and used
+# with the multiprocessing pool.
+def _parse_member_oac_worker(member: Tuple[bytes, Path]) -> Tuple[list[SneRecord], Path]:
+    """
+    Create an `SneRecord` from the contents of an OAC json file in an archive.
+    """
+    data, path = member
+    return ([_parse_oac_text(data.decode())], path)
+
+def _parse_oac_text(text: str) -> SneRecord:
+    # Only the few fields `SneRecord.from_oac` needs are decoded from the document.
+    d: dict[str, Any] = extract_oac_fields(text)
+    return SneRecord.from_oac(d)
 
 # This function must be top-level defined so that in can be pickled and used
 # with the multiprocessing pool.
@@ -149,3 +904,13 @@ def _parse_dir_tns_worker(path: Path) -> Tuple[list[SneRecord], Path]:
         reader = csv.DictReader(f, delimiter="\t")
         return (SneRecord.from_tns(reader), path)
 
+# This function must be top-level defined so that in can be pickled and used
+# with the multiprocessing pool.
+def _parse_member_tns_worker(member: Tuple[bytes, Path]) -> Tuple[list[SneRecord], Path]:
+    """
+    Create `SneRecord`s from the contents of a TNS tsv file in an archive.
+    """
+    data, path = member
+    reader = csv.DictReader(io.StringIO(data.decode(), newline=""), delimiter="\t")
+    return (SneRecord.from_tns(reader), path)
+
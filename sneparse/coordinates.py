@@ -1,7 +1,9 @@
 from __future__ import annotations # for postponed annotation evaluation
-from typing import Literal, Tuple, cast
+from typing import Literal, Tuple, Sequence, Callable, Iterator, Union, cast
 from math import floor, sin, cos, acos, radians, degrees, copysign
 
+import numpy as np
+
 HMS_HOURS_PER_DEGREE = 24.0 / 360.0
 HMS_MINUTES_PER_HOUR = 60
 HMS_SECONDS_PER_MINUTE = 60
@@ -19,6 +21,8 @@ class HoursMinutesSeconds():
     `seconds` (0.0 - 59.999...). An angle in hours:minutes:seconds 
     also has an associated `sign` (+ or -).
     """
+    __slots__ = ("sign", "hours", "minutes", "seconds")
+
     def __init__(self, sign: Literal[-1, 1], hours: int, minutes: int, seconds: float) -> None:
         self.sign    = sign
         self.hours   = hours
@@ -79,6 +83,8 @@ class DecimalDegrees():
     """
     A base 10 representation of angles, in degrees.
     """
+    __slots__ = ("degrees",)
+
     def __init__(self, degrees: float) -> None:
         self.degrees = degrees
 
@@ -120,6 +126,8 @@ class DegreesMinutesSeconds():
     `seconds` (0.0 - 59.999...). An angle in degrees:minutes:seconds
     also has an associated `sign` (+ or -).
     """
+    __slots__ = ("sign", "degrees", "minutes", "seconds")
+
     def __init__(self, sign: Literal[-1, 1], degrees: int, minutes: int, seconds: float) -> None:
         self.sign    = sign
         self.degrees = degrees
@@ -217,19 +225,197 @@ def parse_sexagesimal(s: str) -> Tuple[Literal[1, -1], int, int, float]:
 
     return (sign, hhdd, mm, ss)
 
+# Code points of the characters the vectorized angle parser understands.
+_PLUS, _MINUS, _DOT, _ZERO, _NINE, _COLON = (ord(c) for c in "+-.09:")
+
+# Strings are parsed this many at a time, which keeps the temporary arrays small
+# enough to stay in cache.
+ANGLE_BLOCK_SIZE = 8192
+
+def _parse_angle_block(s: np.ndarray,
+                       from_sexagesimal: Callable[[np.ndarray, np.ndarray, np.ndarray], np.ndarray],
+                       from_decimal: Callable[[np.ndarray], np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Parse a block of angle strings without any Python-level loop over the strings.
+    Returns the angles in degrees, and a mask of the strings that could be handled.
+    """
+    n = len(s)
+
+    # View the strings as an (n, width) matrix of code points, padded with zeros. The
+    # strings are then scanned one column at a time, i.e. one character of every string
+    # at a time, accumulating the value of each colon-separated field (Horner's method).
+    codes = np.ascontiguousarray(s.view(np.uint32).reshape(n, s.itemsize // 4).T).astype(np.int64)
+    lengths = np.char.str_len(s)
+
+    # The vectorized path only handles the well-behaved strings: ascii digits, an optional
+    # leading sign, up to two colons, and at most one decimal point in the last field.
+    # Anything else (whitespace, exponents, garbage, ...) is left for `_parse_angle_array`
+    # to hand to the scalar parser, so the result always matches the scalar path.
+    ok = np.ones(n, dtype=bool)
+
+    field = np.zeros(n, dtype=np.int64)
+    after_dot = np.zeros(n, dtype=bool)
+    wholes = [np.zeros(n) for _ in range(3)]
+    digit_counts = [np.zeros(n, dtype=np.int64) for _ in range(3)]
+    fraction = np.zeros(n)
+    fraction_digits = np.zeros(n, dtype=np.int64)
+
+    for j, c in enumerate(codes):
+        live = j < lengths
+        is_digit = live & (c >= _ZERO) & (c <= _NINE)
+        is_colon = live & (c == _COLON)
+        is_dot   = live & (c == _DOT)
+        is_sign  = live & ((c == _PLUS) | (c == _MINUS)) & (j == 0)
+
+        ok &= ~live | is_digit | is_colon | is_dot | is_sign
+        ok &= ~((is_colon | is_dot) & after_dot)
+
+        d = c - _ZERO
+        for k in range(3):
+            in_field = is_digit & (field == k)
+            digit_counts[k] += in_field
+            wholes[k] = np.where(in_field & ~after_dot, wholes[k] * 10.0 + d, wholes[k])
+        fraction = np.where(is_digit & after_dot, fraction * 10.0 + d, fraction)
+        fraction_digits += is_digit & after_dot
+
+        field += is_colon
+        after_dot |= is_dot
+
+    # At most three fields, and each needs at least one digit (e.g. `int("")` or `float(".")` fail).
+    ok &= field <= 2
+    for k in range(3):
+        ok &= (digit_counts[k] > 0) | (field < k)
+
+    fraction /= 10.0 ** fraction_digits
+    first, second, third = wholes
+    sign = np.where(codes[0] == _MINUS, -1.0, 1.0)
+    with np.errstate(invalid="ignore"):
+        result = np.where(field == 0,
+                          from_decimal(sign * (first + fraction)),
+                          sign * from_sexagesimal(first,
+                                                  np.where(field == 1, second + fraction, second),
+                                                  np.where(field == 2, third + fraction, 0.0)))
+    return result, ok
+
+def _parse_angle_array(values: Union[Sequence[str], np.ndarray],
+                       from_sexagesimal: Callable[[np.ndarray, np.ndarray, np.ndarray], np.ndarray],
+                       from_decimal: Callable[[np.ndarray], np.ndarray],
+                       from_str: Callable[[str], float]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Shared implementation of `parse_ra_array` and `parse_dec_array`. `from_sexagesimal`
+    combines the unsigned fields of a sexagesimal angle into degrees, `from_decimal`
+    converts signed decimal values into degrees, and `from_str` is the scalar parser
+    for sexagesimal strings that the vectorized path can't handle.
+    """
+    s = np.asarray(values, dtype=str)
+    result = np.empty(len(s))
+    ok = np.empty(len(s), dtype=bool)
+    for start in range(0, len(s), ANGLE_BLOCK_SIZE):
+        block = slice(start, start + ANGLE_BLOCK_SIZE)
+        result[block], ok[block] = _parse_angle_block(s[block], from_sexagesimal, from_decimal)
+
+    result[~ok] = np.nan
+    valid = ok.copy()
+
+    for i in np.flatnonzero(~ok):
+        try:
+            if ":" in s[i]:
+                result[i] = from_str(str(s[i]))
+            else:
+                # Decimal values are converted the same way as above. Non-finite values
+                # can't be represented in sexagesimal, so the scalar path rejects them
+                # (or, for huge declinations, never finishes wrapping them).
+                d = float(s[i])
+                if not np.isfinite(d):
+                    continue
+                result[i] = from_decimal(np.array([d]))[0]
+            valid[i] = True
+        except Exception:
+            pass
+
+    return result, valid
+
+def parse_ra_array(values: Union[Sequence[str], np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Parse a whole column of right ascensions at once. Accepts every format that
+    `HoursMinutesSeconds.from_str` does (`hh:mm:ss.s`, `hh:mm.m` and decimal hours,
+    signed or unsigned).
+
+    Returns a float64 array of the angles in decimal degrees, and a mask of which
+    values could be parsed. Unparsable values are NaN.
+    """
+    return _parse_angle_array(
+        values,
+        lambda h, m, s: h / HMS_HOURS_PER_DEGREE
+                        + m / (HMS_HOURS_PER_DEGREE * HMS_MINUTES_PER_HOUR)
+                        + s / (HMS_HOURS_PER_DEGREE * HMS_MINUTES_PER_HOUR * HMS_SECONDS_PER_MINUTE),
+        lambda h: h / HMS_HOURS_PER_DEGREE,
+        lambda s: DecimalDegrees.from_hms(HoursMinutesSeconds.from_str(s)).degrees
+    )
+
+def parse_dec_array(values: Union[Sequence[str], np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Parse a whole column of declinations at once. Accepts every format that
+    `DegreesMinutesSeconds.from_str` does (`dd:mm:ss.s`, `dd:mm.m` and decimal
+    degrees, signed or unsigned).
+
+    Returns a float64 array of the angles in decimal degrees, and a mask of which
+    values could be parsed. Unparsable values are NaN.
+    """
+    def from_decimal(d: np.ndarray) -> np.ndarray:
+        # Mirror `DegreesMinutesSeconds.from_decimal_degrees`, which wraps
+        # magnitudes above 360 degrees.
+        magnitude = np.abs(d)
+        magnitude = np.where(magnitude > 360.0, magnitude - 360.0 * (np.ceil(magnitude / 360.0) - 1), magnitude)
+        return np.copysign(magnitude, d)
+
+    return _parse_angle_array(
+        values,
+        lambda d, m, s: d + m / DMS_MINUTES_PER_DEGREE + s / (DMS_MINUTES_PER_DEGREE * DMS_SECONDS_PER_MINUTE),
+        from_decimal,
+        lambda s: DecimalDegrees.from_dms(DegreesMinutesSeconds.from_str(s)).degrees
+    )
+
 def angular_separation(ra1: DecimalDegrees, d1: DecimalDegrees, ra2: DecimalDegrees, d2: DecimalDegrees) \
         -> DecimalDegrees:
     """
     Calculates the angular separation, in degrees, between the `(ra1, d1)` and `(ra2, d2)`.
+    See `angular_separations`.
     """
-    return DecimalDegrees(degrees(acos(sin(radians(d1.degrees)) * sin(radians(d2.degrees))
-                                + cos(radians(d1.degrees)) * cos(radians(d2.degrees))
-                                * cos(radians(ra1.degrees) - radians(ra2.degrees)))))
+    return DecimalDegrees(float(angular_separations(ra1.degrees, d1.degrees, ra2.degrees, d2.degrees)))
+
+def angular_separations(ra1: Union[float, np.ndarray],
+                        dec1: Union[float, np.ndarray],
+                        ra2: Union[float, np.ndarray],
+                        dec2: Union[float, np.ndarray]) -> np.ndarray:
+    """
+    Calculates the angular separations, in degrees, between the positions `(ra1, dec1)` and
+    `(ra2, dec2)`, for whole arrays (or anything that broadcasts) of coordinates in degrees.
+
+    This uses the Vincenty formula, which is accurate at every separation. The spherical law
+    of cosines takes the arccosine of a number very close to 1 for nearby positions, and
+    loses most of its precision at arcsecond scales.
+    """
+    a1 = np.radians(ra1)
+    b1 = np.radians(dec1)
+    a2 = np.radians(ra2)
+    b2 = np.radians(dec2)
+    delta = a2 - a1
+
+    sin_b1, cos_b1 = np.sin(b1), np.cos(b1)
+    sin_b2, cos_b2 = np.sin(b2), np.cos(b2)
+    cos_delta = np.cos(delta)
+
+    y = np.hypot(cos_b2 * np.sin(delta), cos_b1 * sin_b2 - sin_b1 * cos_b2 * cos_delta)
+    x = sin_b1 * sin_b2 + cos_b1 * cos_b2 * cos_delta
+    return np.degrees(np.arctan2(y, x))
 
 class Cartesian():
     """
     A cartesian coordinate in 3D space.
     """
+    __slots__ = ("x", "y", "z")
+
     def __init__(self, x: float, y: float, z: float) -> None:
         self.x = x
         self.y = y
@@ -264,6 +450,22 @@ def angle_between(p: Cartesian, q: Cartesian) -> DecimalDegrees:
     q_norm = (q.x * q.x + q.y * q.y + q.z * q.z) ** (0.5)
     return DecimalDegrees(degrees(acos(dot_product / (p_norm * q_norm))))
 
+def dist_sqrs(p: np.ndarray, q: np.ndarray) -> np.ndarray:
+    """
+    `dist_sqr` for (N, 3) arrays of points (or anything that broadcasts).
+    """
+    delta = np.asarray(p) - np.asarray(q)
+    return np.einsum("...i,...i->...", delta, delta)
+
+def angles_between(p: np.ndarray, q: np.ndarray) -> np.ndarray:
+    """
+    `angle_between` for (N, 3) arrays of vectors (or anything that broadcasts), in degrees.
+    Like `angular_separations`, this stays accurate for nearly parallel vectors.
+    """
+    p, q = np.asarray(p), np.asarray(q)
+    cross = np.linalg.norm(np.cross(p, q), axis=-1)
+    return np.degrees(np.arctan2(cross, np.einsum("...i,...i->...", p, q)))
+
 def angular_separation_to_distance(angle: DecimalDegrees) -> float:
     """
     Converts an angular separation (in degrees) to a distance in 3D space.
@@ -271,3 +473,252 @@ def angular_separation_to_distance(angle: DecimalDegrees) -> float:
     p = Cartesian.from_angular(DecimalDegrees(0.0), DecimalDegrees(0.0))
     q = Cartesian.from_angular(angle, DecimalDegrees(0.0))
     return dist_sqr(p, q) ** 0.5
+
+def to_cartesian(ra: np.ndarray, dec: np.ndarray) -> np.ndarray:
+    """
+    Converts arrays of angular coordinates (in degrees) to the (N, 3) array of points
+    on the unit sphere. See `Cartesian.from_angular`.
+    """
+    a = np.radians(ra)
+    b = np.radians(dec)
+    save = np.cos(b)
+    return np.column_stack((save * np.cos(a), save * np.sin(a), np.sin(b)))
+
+def angular_separations_to_distances(angles: np.ndarray) -> np.ndarray:
+    """
+    Converts angular separations (in degrees) to distances in 3D space between points on the
+    unit sphere. `angular_separation_to_distance`, for whole arrays at once.
+    """
+    return 2 * np.sin(np.radians(np.asarray(angles)) / 2)
+
+def distances_to_angular_separations(distances: np.ndarray) -> np.ndarray:
+    """
+    Converts distances in 3D space between points on the unit sphere to the angular
+    separations (in degrees) between them. The inverse of `angular_separation_to_distance`,
+    for whole arrays at once.
+    """
+    # The points and the origin make an isosceles triangle with two sides of length 1.
+    return np.degrees(2 * np.arcsin(np.minimum(distances / 2, 1.0)))
+
+# `iter_pairwise_separations` computes this many separations at a time, at most.
+PAIRWISE_BLOCK_SIZE = 1 << 22
+
+def iter_pairwise_separations(ra1: np.ndarray,
+                              dec1: np.ndarray,
+                              ra2: np.ndarray,
+                              dec2: np.ndarray,
+                              block_size: int = PAIRWISE_BLOCK_SIZE) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Calculate the angular separation (in degrees) between every position in `(ra1, dec1)` and
+    every position in `(ra2, dec2)`, a block of rows at a time. Yields the first row of each
+    block, and the block of the (N, M) matrix of separations, which has no more than
+    `block_size` elements (but always at least one row).
+    """
+    ra1, dec1 = np.asarray(ra1, dtype=np.float64), np.asarray(dec1, dtype=np.float64)
+    ra2, dec2 = np.asarray(ra2, dtype=np.float64), np.asarray(dec2, dtype=np.float64)
+    rows = max(block_size // max(len(ra2), 1), 1)
+    for start in range(0, len(ra1), rows):
+        block = slice(start, start + rows)
+        yield (start, angular_separations(ra1[block, np.newaxis], dec1[block, np.newaxis], ra2, dec2))
+
+def pairwise_separations(ra: np.ndarray,
+                         dec: np.ndarray,
+                         block_size: int = PAIRWISE_BLOCK_SIZE) -> np.ndarray:
+    """
+    The (N, N) matrix of the angular separations (in degrees) between each pair of some
+    positions, e.g. the members of a group. It's computed in blocks (see
+    `iter_pairwise_separations`), so only the result itself needs to fit in memory.
+    """
+    separations = np.empty((len(ra), len(ra)), dtype=np.float64)
+    for start, block in iter_pairwise_separations(ra, dec, ra, dec, block_size):
+        separations[start:start + len(block)] = block
+    return separations
+
+# The height of the declination zones of a `SkyIndex` (see `sky_cells`).
+SKY_ZONE_HEIGHT = DecimalDegrees(0.05)
+
+# A `SkyIndex` sorts positions by `zone * SKY_ZONE_KEY_STRIDE + ra`. The stride leaves a gap
+# after each zone, so an interval of right ascension never reaches into the next zone.
+SKY_ZONE_KEY_STRIDE = 720.0
+
+# `SkyIndex.join` matches this many positions at a time, to bound the memory used
+# by the candidate pairs.
+SKY_JOIN_BLOCK_SIZE = 65536
+
+def _zone_count(zone_height: float) -> int:
+    return int(np.ceil(180.0 / zone_height))
+
+def sky_zones(dec: np.ndarray, zone_height: DecimalDegrees = SKY_ZONE_HEIGHT) -> np.ndarray:
+    """
+    The declination zone of each of some declinations (in degrees), counting from the south pole.
+    """
+    h = zone_height.degrees
+    return np.clip(np.floor((np.asarray(dec) + 90.0) / h), 0, _zone_count(h) - 1).astype(np.int64)
+
+def _zone_cells(zone_height: float) -> Tuple[np.ndarray, np.ndarray]:
+    # The number of cells in each zone, and the number of the first cell of each zone. The cells
+    # are sized for the edge of the zone closest to the equator, where the zone is widest.
+    lower = -90.0 + zone_height * np.arange(_zone_count(zone_height))
+    upper = np.minimum(lower + zone_height, 90.0)
+    widest = np.where((lower <= 0) & (upper >= 0), 0.0, np.minimum(np.abs(lower), np.abs(upper)))
+    counts = np.maximum(np.floor(360.0 * np.cos(np.radians(widest)) / zone_height), 1).astype(np.int64)
+    return (counts, np.cumsum(counts) - counts)
+
+def sky_cells(ra: np.ndarray, dec: np.ndarray, zone_height: DecimalDegrees = SKY_ZONE_HEIGHT) -> np.ndarray:
+    """
+    Map some positions (in degrees) to the integer cells of an iso-latitude pixelization of
+    the sky, much like the ring scheme of HEALPix. The sky is cut into zones of declination
+    `zone_height` high (see `sky_zones`), and each zone into cells of right ascension about as
+    wide as they are high. Cells are numbered zone by zone, in order of right ascension, so
+    the cells around any position make up a few contiguous ranges of numbers.
+
+    Positions with a NaN coordinate are in cell -1.
+    """
+    ra = np.asarray(ra, dtype=np.float64) % 360.0
+    dec = np.asarray(dec, dtype=np.float64)
+    valid = ~(np.isnan(ra) | np.isnan(dec))
+
+    counts, first = _zone_cells(zone_height.degrees)
+    zones = sky_zones(np.where(valid, dec, 0.0), zone_height)
+    within = np.minimum(np.floor(np.where(valid, ra, 0.0) * counts[zones] / 360.0).astype(np.int64), counts[zones] - 1)
+    return np.where(valid, first[zones] + within, -1)
+
+def _ra_half_width(dec: np.ndarray, radius: float) -> np.ndarray:
+    # The largest difference in right ascension (in degrees) between a position and any
+    # position within `radius` degrees of it. The whole circle, near the poles.
+    dec = np.abs(dec)
+    half_width = np.full(len(dec), 180.0)
+    bounded = dec + radius < 90.0
+    half_width[bounded] = np.degrees(np.arcsin(np.minimum(np.sin(np.radians(radius))
+                                                              / np.cos(np.radians(dec[bounded])), 1.0)))
+    return half_width
+
+class SkyIndex():
+    """
+    An index of positions on the sky, for cone searches and cross-matching in memory,
+    without a database.
+
+    Positions are sorted by zone and then right ascension, the order of their cells (see
+    `sky_cells`). Everything within some radius of a position is then in a few ranges of
+    the index, one per nearby zone, which are found by binary search. The candidates in
+    those ranges are checked exactly.
+
+    Positions with a NaN coordinate are never matched. Results are indices into the
+    arrays the index was created from.
+    """
+    def __init__(self,
+                 right_ascension: np.ndarray,
+                 declination: np.ndarray,
+                 zone_height: DecimalDegrees = SKY_ZONE_HEIGHT) -> None:
+        ra = np.asarray(right_ascension, dtype=np.float64) % 360.0
+        dec = np.asarray(declination, dtype=np.float64)
+        valid = np.flatnonzero(~(np.isnan(ra) | np.isnan(dec)))
+
+        self.n = len(ra)
+        self.zone_height = zone_height
+
+        keys = sky_zones(dec[valid], zone_height) * SKY_ZONE_KEY_STRIDE + ra[valid]
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.index = valid[order]
+        self.right_ascension = ra[self.index]
+        self.declination = dec[self.index]
+        self.points = to_cartesian(self.right_ascension, self.declination)
+
+    def __len__(self) -> int:
+        return self.n
+
+    def cells(self) -> np.ndarray:
+        """
+        The cell of each indexed position, in index order. See `sky_cells`.
+        """
+        return sky_cells(self.right_ascension, self.declination, self.zone_height)
+
+    def _ranges(self, ra: np.ndarray, dec: np.ndarray, radius: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # The ranges of the index that may hold a position within `radius` degrees of each
+        # of some query positions, as (query, start, end) arrays.
+        h = self.zone_height.degrees
+        n_zones = _zone_count(h)
+
+        # Pad the search a little, so no match is missed to rounding. Candidates are checked exactly.
+        padded = radius + FLOAT_EPSILON
+        lowest = sky_zones(dec - padded, self.zone_height)
+        highest = sky_zones(dec + padded, self.zone_height)
+        half_width = _ra_half_width(dec, padded)
+        lo = ra - half_width
+        hi = ra + half_width
+        full = half_width >= 180.0
+
+        queries: list[np.ndarray] = []
+        starts: list[np.ndarray] = []
+        ends: list[np.ndarray] = []
+        for offset in range(int(np.max(highest - lowest, initial=0)) + 1):
+            zones = lowest + offset
+            in_reach = zones <= highest
+            base = np.minimum(zones, n_zones - 1) * SKY_ZONE_KEY_STRIDE
+
+            # Each query has the interval around its own right ascension, plus the part of it
+            # that wraps around past 0 or 360 degrees, if any.
+            for (lower, upper, use) in (
+                (np.where(full, 0.0, np.maximum(lo, 0.0)),  np.where(full, 360.0, np.minimum(hi, 360.0)), in_reach),
+                (lo + 360.0,                                np.full(len(ra), 360.0),                        in_reach & ~full & (lo < 0.0)),
+                (np.zeros(len(ra)),                         hi - 360.0,                                     in_reach & ~full & (hi > 360.0)),
+            ):
+                query = np.flatnonzero(use)
+                queries.append(query)
+                starts.append(np.searchsorted(self.keys, base[query] + lower[query], side="left"))
+                ends.append(np.searchsorted(self.keys, base[query] + upper[query], side="right"))
+
+        return (np.concatenate(queries), np.concatenate(starts), np.concatenate(ends))
+
+    def match(self,
+              ra: np.ndarray,
+              dec: np.ndarray,
+              radius: DecimalDegrees) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Find every indexed position within `radius` of each of some query positions (in degrees).
+        Returns the index of the query, the index of the matching position and the angular
+        separation (in degrees) of each match. Queries with a NaN coordinate match nothing.
+        """
+        ra = np.asarray(ra, dtype=np.float64) % 360.0
+        dec = np.asarray(dec, dtype=np.float64)
+        valid = np.flatnonzero(~(np.isnan(ra) | np.isnan(dec)))
+
+        query, start, end = self._ranges(ra[valid], dec[valid], radius.degrees)
+
+        # Expand the ranges into one (query, candidate) pair per position in them.
+        counts = end - start
+        query = np.repeat(query, counts)
+        candidate = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts - start, counts)
+
+        points = to_cartesian(ra[valid], dec[valid])
+        distances = np.linalg.norm(points[query] - self.points[candidate], axis=1)
+        close = distances <= angular_separation_to_distance(radius)
+        return (valid[query[close]], self.index[candidate[close]], distances_to_angular_separations(distances[close]))
+
+    def cone(self, ra: DecimalDegrees, dec: DecimalDegrees, radius: DecimalDegrees) -> np.ndarray:
+        """
+        Find the indexed positions within `radius` of `(ra, dec)`, in index order.
+        """
+        _, found, _ = self.match(np.array([ra.degrees]), np.array([dec.degrees]), radius)
+        return np.sort(found)
+
+    def join(self, other: SkyIndex, radius: DecimalDegrees) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Find every pair of positions, one from `self` and one from `other`, separated by no more
+        than `radius`. Returns the indices into `self`, the indices into `other` and the angular
+        separations (in degrees) of the pairs.
+
+        The positions of `other` are matched in their sorted order, a block at a time, so the
+        binary searches into `self` move steadily forward like in a sort-merge join.
+        """
+        mine: list[np.ndarray] = [np.empty(0, dtype=np.intp)]
+        theirs: list[np.ndarray] = [np.empty(0, dtype=np.intp)]
+        separations: list[np.ndarray] = [np.empty(0, dtype=np.float64)]
+        for start in range(0, len(other.index), SKY_JOIN_BLOCK_SIZE):
+            block = slice(start, start + SKY_JOIN_BLOCK_SIZE)
+            query, found, separation = self.match(other.right_ascension[block], other.declination[block], radius)
+            mine.append(found)
+            theirs.append(other.index[block][query])
+            separations.append(separation)
+        return (np.concatenate(mine), np.concatenate(theirs), np.concatenate(separations))
@@ -0,0 +1,419 @@
+from __future__ import annotations # for postponed annotation evaluation
+from typing import Any, Iterator, Optional, Sequence, Tuple
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from threading import Condition
+from multiprocessing import Pool
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from sneparse.coordinates import DecimalDegrees, DegreesMinutesSeconds, SkyIndex, angular_separations
+
+# Only records discovered before the cutoff of an epoch are matched against
+# the components from that epoch of VLASS.
+EPOCH_DATE_CUTOFFS = {
+    1: "2020-01-01",
+    2: "2022-03-01",
+    3: "2024-01-01",
+}
+
+CROSS_MATCH_RADIUS = DecimalDegrees.from_dms(DegreesMinutesSeconds(1, 0, 0, 5))
+
+# The columns `cross_match_radii` adds to each match.
+SEPARATION_COLUMN = "separation"
+RADIUS_COLUMN = "match_radius"
+
+# In the results of `cross_match_best`, the columns of each source's nearest component
+# are prefixed with this, and these columns are added.
+NEAREST_PREFIX = "nearest_"
+MATCH_COUNT_COLUMN = "match_count"
+FILE_NAMES_COLUMN = "file_names"
+
+# `cross_match_partitioned` splits the sky into declination bands this high.
+PARTITION_BAND_HEIGHT = DecimalDegrees(1.0)
+
+# Tables are streamed from disk this many rows at a time.
+PARTITION_CHUNK_ROWS = 500_000
+
+# The default memory budget of `cross_match_partitioned`, in bytes.
+PARTITION_MEMORY_BUDGET = 4 << 30
+
+# A partition takes up about this many times the size of its spill file once
+# it's loaded and indexed.
+PARTITION_MEMORY_FACTOR = 4
+
+def read_table(path: Path) -> pd.DataFrame:
+    """
+    Read a local export of a database table, as csv (e.g. from `COPY ... TO STDOUT WITH
+    (FORMAT csv, HEADER)`) or Parquet.
+
+    Csv values are kept as text, exactly as they were exported, so that writing the
+    results of `cross_match` back out gives the same rows the database would have.
+    Empty values are NULL.
+    """
+    match path.suffix:
+        case ".csv":
+            return pd.read_csv(path, dtype=str, keep_default_na=False, na_values=[""])
+        case ".parquet":
+            # Needs pyarrow (or fastparquet), which pandas imports itself.
+            return pd.read_parquet(path)
+        case _:
+            raise Exception(f"Unsupported table format: {path}")
+
+def iter_table(path: Path, chunk_rows: int = PARTITION_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Read a table like `read_table`, `chunk_rows` rows at a time. The rows of all the chunks
+    are numbered consecutively, so the index of each chunk says where its rows are in the table.
+    """
+    match path.suffix:
+        case ".csv":
+            yield from pd.read_csv(path, dtype=str, keep_default_na=False, na_values=[""], chunksize=chunk_rows)
+        case ".parquet":
+            import pyarrow.parquet as pq # type: ignore
+
+            start = 0
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+                chunk = batch.to_pandas()
+                chunk.index = pd.RangeIndex(start, start + len(chunk))
+                start += len(chunk)
+                yield chunk
+        case _:
+            raise Exception(f"Unsupported table format: {path}")
+
+def epoch_components(components: pd.DataFrame, epoch: int) -> pd.DataFrame:
+    """
+    The components from a given `epoch` of VLASS, i.e. those in files named 'VLASS{epoch}*'.
+    """
+    return components[components["file_name"].str.startswith(f"VLASS{epoch}", na=False)]
+
+def epoch_catalog(catalog: pd.DataFrame, epoch: int) -> pd.DataFrame:
+    """
+    The records of a `catalog` discovered before the cutoff of a given `epoch`. Records
+    without a discovery date are never before the cutoff, like in SQL.
+    """
+    return catalog[pd.to_datetime(catalog["discover_date"], format="ISO8601") < pd.Timestamp(EPOCH_DATE_CUTOFFS[epoch])]
+
+def _match(catalog: pd.DataFrame,
+           components: pd.DataFrame,
+           radius: DecimalDegrees) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # The positions (not labels) of the records and components in each match, ordered by
+    # record and then component, and the separation of each match.
+    index = SkyIndex(pd.to_numeric(catalog["right_ascension"]).to_numpy(dtype=np.float64),
+                     pd.to_numeric(catalog["declination"]).to_numpy(dtype=np.float64))
+    record, component, separation = index.join(SkyIndex(pd.to_numeric(components["ra"]).to_numpy(dtype=np.float64),
+                                                        pd.to_numeric(components["decl"]).to_numpy(dtype=np.float64)),
+                                               radius)
+    order = np.lexsort((component, record))
+    return (record[order], component[order], separation[order])
+
+def _matched_rows(catalog: pd.DataFrame,
+                  components: pd.DataFrame,
+                  record: np.ndarray,
+                  component: np.ndarray,
+                  separation: np.ndarray,
+                  radii: Optional[Sequence[DecimalDegrees]] = None) -> pd.DataFrame:
+    rows = pd.concat([catalog.iloc[record].reset_index(drop=True),
+                      components.iloc[component].reset_index(drop=True)], axis=1)
+    if radii is not None:
+        # Every match is within the largest radius, so each has a smallest radius it's within.
+        # (The clip only guards against a separation rounded to just past the largest radius.)
+        ascending = np.sort([r.degrees for r in radii])
+        rows[SEPARATION_COLUMN] = separation
+        rows[RADIUS_COLUMN] = ascending[np.minimum(np.searchsorted(ascending, separation, side="left"), len(ascending) - 1)]
+    return rows
+
+def cross_match(catalog: pd.DataFrame,
+                components: pd.DataFrame,
+                epoch: int,
+                radius: DecimalDegrees = CROSS_MATCH_RADIUS) -> pd.DataFrame:
+    """
+    Match the records of a `catalog` (e.g. the cleaned table) discovered before the
+    cutoff of an `epoch` against the Gaussian `components` (the `pybdsf_gaussian`
+    table) from that epoch, within `radius` of each other.
+
+    Each match is a row with all the columns of the record followed by all the columns
+    of the component, like `SELECT * FROM catalog AS a, components AS b WHERE ...`. The
+    rows are in the order of the records, then the components, in their tables.
+    """
+    catalog = epoch_catalog(catalog, epoch)
+    components = epoch_components(components, epoch)
+    return _matched_rows(catalog, components, *_match(catalog, components, radius))
+
+def cross_match_radii(catalog: pd.DataFrame,
+                      components: pd.DataFrame,
+                      epoch: int,
+                      radii: Sequence[DecimalDegrees]) -> pd.DataFrame:
+    """
+    Like `cross_match`, for several `radii` at once. The neighbors are only searched for once,
+    with the largest radius, and each match gets two more columns: its angular separation and
+    the smallest of the `radii` it's within, both in degrees. The matches for any one radius
+    are then the rows with a `match_radius` no larger than it.
+    """
+    catalog = epoch_catalog(catalog, epoch)
+    components = epoch_components(components, epoch)
+    return _matched_rows(catalog, components, *_match(catalog, components, _largest(radii)), radii)
+
+def match_separations(matches: pd.DataFrame) -> np.ndarray:
+    """
+    The angular separation (in degrees) between the record and the component of each
+    row returned by `cross_match`.
+    """
+    return angular_separations(pd.to_numeric(matches["right_ascension"]).to_numpy(dtype=np.float64),
+                               pd.to_numeric(matches["declination"]).to_numpy(dtype=np.float64),
+                               pd.to_numeric(matches["ra"]).to_numpy(dtype=np.float64),
+                               pd.to_numeric(matches["decl"]).to_numpy(dtype=np.float64))
+
+def cross_match_best(catalog: pd.DataFrame,
+                     components: pd.DataFrame,
+                     epoch: int,
+                     radius: DecimalDegrees = CROSS_MATCH_RADIUS) -> pd.DataFrame:
+    """
+    Like `cross_match`, but with one row per matched record instead of one per match. Each
+    row has all the columns of the record, then all the columns of its nearest component
+    (prefixed with `NEAREST_PREFIX`), then:
+        * `separation`: the angular separation (in degrees) of the nearest component
+        * `match_count`: how many components the record matched
+        * `file_names`: the sorted, distinct `file_name`s of all the components it matched
+
+    Positions and dates are typed (see `typed`), so the rows can be saved compactly with
+    `save_best_matches`.
+    """
+    catalog = epoch_catalog(catalog, epoch)
+    components = epoch_components(components, epoch)
+    record, component, separation = _match(catalog, components, radius)
+    return _best_rows(catalog, components.iloc[component], record, component, separation)
+
+def _best_rows(catalog: pd.DataFrame,
+               matched: pd.DataFrame,
+               record: np.ndarray,
+               component: np.ndarray,
+               separation: np.ndarray) -> pd.DataFrame:
+    # Reduce some matches to one row per record: `matched` has the columns of the component
+    # of each match, `record` holds the positions of the records in the `catalog`, and
+    # `component` orders the components (to break ties between equally near ones).
+    order = np.lexsort((component, separation, record))
+    grouped = record[order]
+    firsts = np.flatnonzero(np.diff(grouped, prepend=-1))
+    nearest = order[firsts]
+
+    # The distinct files of each record, sorted. Every record has at least one.
+    files = pd.DataFrame({ "record": record, "file_name": matched["file_name"].to_numpy() }) \
+                .drop_duplicates() \
+                .sort_values(["record", "file_name"])
+    file_groups = np.split(files["file_name"].to_numpy(), np.flatnonzero(np.diff(files["record"].to_numpy())) + 1)
+
+    nearest_components = matched.iloc[nearest].reset_index(drop=True)
+    nearest_components.columns = [NEAREST_PREFIX + str(c) for c in nearest_components.columns]
+    rows = pd.concat([catalog.iloc[grouped[firsts]].reset_index(drop=True), nearest_components], axis=1)
+    rows[SEPARATION_COLUMN] = separation[nearest]
+    rows[MATCH_COUNT_COLUMN] = np.diff(np.append(firsts, len(order))).astype(np.int64)
+    rows[FILE_NAMES_COLUMN] = [list(names) for names in file_groups] if len(firsts) else []
+    return typed(rows)
+
+def typed(rows: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert the positions (to floats) and discovery dates (to datetimes) of the rows of
+    `cross_match_best`, read as text (see `read_table`), to proper types, in place.
+    Returns the rows.
+    """
+    for column in ("right_ascension", "declination", NEAREST_PREFIX + "ra", NEAREST_PREFIX + "decl"):
+        if column in rows.columns:
+            rows[column] = pd.to_numeric(rows[column]).astype(np.float64)
+    if "discover_date" in rows.columns:
+        rows["discover_date"] = pd.to_datetime(rows["discover_date"], format="ISO8601")
+    return rows
+
+def save_best_matches(rows: pd.DataFrame, path: Path) -> None:
+    """
+    Save the results of `cross_match_best` as Parquet (needs pyarrow) or a pickle,
+    depending on the suffix of `path`. They can be loaded with `load_best_matches`.
+    """
+    match path.suffix:
+        case ".parquet":
+            rows.to_parquet(path, index=False)
+        case ".pickle":
+            rows.to_pickle(path)
+        case _:
+            raise Exception(f"Unsupported format for best matches: {path}")
+
+def load_best_matches(path: Path) -> pd.DataFrame:
+    """
+    Load the results of `cross_match_best` saved with `save_best_matches`.
+    """
+    match path.suffix:
+        case ".parquet":
+            return pd.read_parquet(path)
+        case ".pickle":
+            return pd.read_pickle(path)
+        case _:
+            raise Exception(f"Unsupported format for best matches: {path}")
+
+def _largest(radii: Sequence[DecimalDegrees]) -> DecimalDegrees:
+    if len(radii) == 0:
+        raise Exception("No radii to cross match with")
+    return max(radii, key=lambda r: r.degrees)
+
+def _bands(dec: np.ndarray, band_height: float) -> np.ndarray:
+    # The band of each declination, or -1 for a missing (NaN) one. Like in a single
+    # pass, positions without a declination never match anything, so they're in no band.
+    n_bands = int(np.ceil(180.0 / band_height))
+    bands = np.full(len(dec), -1, dtype=np.int64)
+    valid = np.isfinite(dec)
+    bands[valid] = np.clip(np.floor((dec[valid] + 90.0) / band_height), 0, n_bands - 1)
+    return bands
+
+def _spill(components_path: Path,
+           epoch: int,
+           band_height: float,
+           spill_dir: Path,
+           chunk_rows: int) -> Tuple[dict[int, Path], Optional[pd.DataFrame]]:
+    # Stream the components of the `epoch` into one file per declination band, as a
+    # sequence of pickled chunks. Each component is in exactly one band. Also returns
+    # an empty table with the columns of the components.
+    paths: dict[int, Path] = {}
+    empty: Optional[pd.DataFrame] = None
+    for chunk in iter_table(components_path, chunk_rows):
+        chunk = epoch_components(chunk, epoch)
+        if empty is None:
+            empty = chunk.head(0)
+        bands = _bands(pd.to_numeric(chunk["decl"]).to_numpy(dtype=np.float64), band_height)
+        for band in np.unique(bands[bands >= 0]):
+            path = paths.setdefault(int(band), spill_dir.joinpath(f"band_{band}.pickle"))
+            with open(path, "ab") as f:
+                pickle.dump(chunk[bands == band], f, protocol=pickle.HIGHEST_PROTOCOL)
+    return (paths, empty)
+
+def _load_spilled(path: Path) -> pd.DataFrame:
+    chunks: list[pd.DataFrame] = []
+    with open(path, "rb") as f:
+        while True:
+            try:
+                chunks.append(pickle.load(f))
+            except EOFError:
+                break
+    return pd.concat(chunks)
+
+# This function must be top-level defined so that in can be pickled and used
+# with the multiprocessing pool.
+def _match_partition_worker(task: Tuple[pd.DataFrame, Path, DecimalDegrees, Optional[Sequence[DecimalDegrees]]]) \
+        -> Tuple[pd.DataFrame, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Match the records of a catalog near a declination band against the components spilled
+    for that band. Returns the matched rows, the labels of the record and component in
+    each, which give their order in a single-pass match, and their separations.
+    """
+    catalog, path, radius, radii = task
+    components = _load_spilled(path)
+    record, component, separation = _match(catalog, components, radius)
+    return (_matched_rows(catalog, components, record, component, separation, radii),
+            catalog.index.to_numpy()[record],
+            components.index.to_numpy()[component],
+            separation)
+
+def cross_match_partitioned(catalog: pd.DataFrame,
+                            components_path: Path,
+                            epoch: int,
+                            radius: DecimalDegrees = CROSS_MATCH_RADIUS,
+                            num_processes: int = 12,
+                            memory_budget: int = PARTITION_MEMORY_BUDGET,
+                            band_height: DecimalDegrees = PARTITION_BAND_HEIGHT,
+                            chunk_rows: int = PARTITION_CHUNK_ROWS,
+                            spill_dir: Optional[Path] = None,
+                            radii: Optional[Sequence[DecimalDegrees]] = None,
+                            best: bool = False) -> pd.DataFrame:
+    """
+    Give the same result as `cross_match(catalog, read_table(components_path), epoch, radius)`,
+    without ever holding all of the components in memory. If `radii` are given, `radius` is
+    ignored and the result is the same as `cross_match_radii` instead. If `best` is set, the
+    result is the same as `cross_match_best`.
+
+    The components are streamed from disk and split into declination bands, which are
+    spilled to `spill_dir` (a temporary directory by default). Each band is then matched in
+    a pool of `num_processes` processes against the records within `radius` of it. Records
+    near the edge of a band are matched in both bands, but each component is in only one,
+    so no match is missed or found twice.
+
+    Bands are handed out largest first, and only as long as the bands being matched fit in
+    `memory_budget` bytes (see `PARTITION_MEMORY_FACTOR`). A band that doesn't fit on its
+    own is still matched, alone.
+    """
+    if radii is not None:
+        if best:
+            raise Exception("Can't cross match with several radii and keep only the best matches")
+        radius = _largest(radii)
+
+    # The labels of the records are their positions, which is the order of the matches.
+    catalog = epoch_catalog(catalog, epoch).reset_index(drop=True)
+    dec = pd.to_numeric(catalog["declination"]).to_numpy(dtype=np.float64)
+    h = band_height.degrees
+
+    with TemporaryDirectory(dir=spill_dir) as tmp:
+        paths, empty = _spill(components_path, epoch, h, Path(tmp), chunk_rows)
+
+        # A record can match components in any band within `radius` of it.
+        lowest = _bands(dec - radius.degrees, h)
+        highest = _bands(dec + radius.degrees, h)
+
+        tasks = sorted(((catalog[(lowest <= band) & (band <= highest)], path, radius, radii, path.stat().st_size)
+                            for band, path in paths.items()), key=lambda task: task[-1], reverse=True)
+
+        results: list[Tuple[pd.DataFrame, np.ndarray, np.ndarray, np.ndarray]] = []
+        errors: list[BaseException] = []
+        in_flight = [0]
+        done = Condition()
+
+        with Pool(num_processes) as pool:
+            def submit(task: Tuple[pd.DataFrame, Path, DecimalDegrees, Optional[Sequence[DecimalDegrees]], int]) -> None:
+                *args, size = task
+                cost = size * PARTITION_MEMORY_FACTOR
+
+                def finished(result: Any) -> None:
+                    with done:
+                        if isinstance(result, BaseException):
+                            errors.append(result)
+                        else:
+                            results.append(result)
+                        in_flight[0] -= cost
+                        done.notify()
+
+                with done:
+                    # Wait for room in the budget. Something must always be running, though.
+                    done.wait_for(lambda: in_flight[0] == 0 or in_flight[0] + cost <= memory_budget or bool(errors))
+                    in_flight[0] += cost
+                pool.apply_async(_match_partition_worker, (tuple(args),), callback=finished, error_callback=finished)
+
+            for task in tasks:
+                if errors:
+                    break
+                submit(task)
+            with done:
+                done.wait_for(lambda: in_flight[0] == 0)
+
+        if errors:
+            raise errors[0]
+
+    if empty is None:
+        raise Exception(f"{components_path} is empty")
+
+    if not results:
+        none = np.empty(0, dtype=np.intp)
+        if best:
+            return _best_rows(catalog, empty, none, none, np.empty(0, dtype=np.float64))
+        return _matched_rows(catalog, empty, none, none, np.empty(0, dtype=np.float64), radii)
+
+    rows = pd.concat([rows for (rows, _, _, _) in results], ignore_index=True)
+    record = np.concatenate([record for (_, record, _, _) in results])
+    component = np.concatenate([component for (_, _, component, _) in results])
+
+    if best:
+        # The catalog's index was reset, so its labels are the records' positions. The
+        # component columns come right after the record columns.
+        separation = np.concatenate([separation for (_, _, _, separation) in results])
+        matched = rows.iloc[:, len(catalog.columns):len(catalog.columns) + len(empty.columns)]
+        return _best_rows(catalog, matched, record, component, separation)
+
+    # Put the matches in the same order as a single pass would.
+    order = np.lexsort((component, record))
+    return rows.iloc[order].reset_index(drop=True)
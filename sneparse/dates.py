@@ -0,0 +1,204 @@
+from typing import Optional, Callable, Iterable
+from datetime import datetime, timedelta
+import re
+
+import numpy as np
+
+# `datetime`s have microsecond resolution, so storing dates in
+# microseconds loses nothing.
+DATE_DTYPE = np.dtype("datetime64[us]")
+
+# The format of TNS discovery dates, which is also how dates are written to csv files
+# (see `SneRecord.as_row`), e.g. '2021-03-04 05:06:07.890'.
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+# The "shape" of a string is the string with every ascii digit replaced by a '9'.
+# Strings with the same shape can be parsed the same way, so the parser to use
+# for each shape is only worked out once.
+_SHAPE_TABLE = str.maketrans("0123456789", "9999999999")
+
+def shape(s: str) -> str:
+    return s.translate(_SHAPE_TABLE)
+
+# Fast parsers for the common shapes of OAC dates. Each returns `None` when it can't
+# be sure it would give the same result as `_try_parse_date_slow`, which is then used
+# instead. That includes every case where `_try_parse_date_slow` would raise.
+def _parse_year(s: str) -> Optional[datetime]:
+    year = int(s)
+    return datetime(year, 1, 1) if year > 31 else None
+
+def _parse_year_month(s: str) -> Optional[datetime]:
+    year, month = int(s[:4]), int(s[5:])
+    return datetime(year, month, 1) if year > 31 and 1 <= month <= 12 else None
+
+def _parse_year_month_day(s: str) -> Optional[datetime]:
+    y, m, d = s.split("/")
+    year, month = int(y), int(m)
+    if year <= 31 or not 1 <= month <= 12:
+        return None
+
+    # Fractional days are handled exactly like in `_try_parse_date_slow`.
+    day = float(d)
+    try:
+        return datetime(year, month, int(day)) + timedelta(days=day % 1)
+    except ValueError:
+        return None
+
+OAC_SHAPES: list[tuple[re.Pattern[str], Callable[[str], Optional[datetime]]]] = [
+    (re.compile(r"9999"),                          _parse_year),
+    (re.compile(r"9999/99?"),                      _parse_year_month),
+    (re.compile(r"9{2,4}/99?/99?(?:\.9+)?"),       _parse_year_month_day),
+]
+
+_oac_parsers: dict[str, Optional[Callable[[str], Optional[datetime]]]] = {}
+
+def _oac_parser(s: str) -> Optional[Callable[[str], Optional[datetime]]]:
+    key = shape(s)
+    try:
+        return _oac_parsers[key]
+    except KeyError:
+        parser = next((p for (r, p) in OAC_SHAPES if r.fullmatch(key)), None)
+        _oac_parsers[key] = parser
+        return parser
+
+def try_parse_date(s: str) -> datetime:
+    """
+    Try to get a datetime value out of a string, `s`.
+    Note that OAC dates appear in multiple formats:
+    `yyyy/mm/dd` (with the possibility of fractional days),
+    `yyyy/mm`, or `yyyy`. This function will try to
+    each one until it successful parses a date, or it will
+    raise an exception.
+
+    Dates of the usual shapes are parsed directly. Anything else goes through the
+    original, slower algorithm (see `_try_parse_date_slow`), so the results are
+    always the same.
+    """
+    parser = _oac_parser(s)
+    if parser is not None and (d := parser(s)) is not None:
+        return d
+    return _try_parse_date_slow(s)
+
+def _try_parse_date_slow(s: str) -> datetime:
+    # Some dates may be before 1000 AD. We need to pad them
+    # with zeros on the left so that they are 4-digits and
+    # parsable by datetime.
+    #
+    # But wait! There's at least one record--
+    # and by at least one I mean exactly one ('SN1667A'
+    # from the pre-1990 datatest) as far as I can tell--
+    # where the date is stored as mm/dd/yyyy. Great.
+    #
+    # How can we even distinguish between yyyy/mm/dd and
+    # mm/dd/yyyy then? Well, we can't--if the year is before
+    # 32 AD. Otherwise, we can check if the first value is
+    # greater than 31 and figure out the format from there.
+    #
+    # Hopefully there are no supernovae between 0 and 31 AD
+    # recorded in the OAC catalog.
+    #
+    # Oh, and this of course means any dd/mm/yyyy style
+    # dates with dd <= 12 are completely ambiguous with
+    # the mm/dd/yyyy dates. Are there any such dates
+    # in the OAC catalog? It's literally impossible to know
+    # without reference another catalog.
+    #
+    # And by the way, we ignore the possibility of fractional
+    # days for the few mm/dd/yyyy dates. It doesn't look
+    # like there are any in the OAC catalog.
+    #
+    # Why can't everyone just agree on one format...
+    split = s.split("/")
+    if int(split[0]) > 31:
+        split[0] = split[0].zfill(4)
+    else:
+        split[2] = split[2].zfill(4)
+
+    # Now we need to handle dates with fractional days,
+    # like '2022/11/11.52435'.
+    dt = timedelta(0)
+    try:
+        # Try to split the string assuming it is yyyy/mm/dd.
+        # This will fail if that's not the case, but that just
+        # means we don't have to handle fractional days (since
+        # no day is even reported).
+        year, month, day = split
+
+        # Get the fractional part of the day and turn it into a time span.
+        # This will stay zero if the day is an integer. This time span
+        # will be later added back to the datetime.
+        dt = timedelta(days=float(day) % 1)
+
+        # Recast the string to exclude the fractional part of the day.
+        # TODO: there has to be a prettier way than str(int(float(...)))
+        base = int(float(day))
+        s = "/".join((year, month, str(base)))
+    except ValueError:
+        pass
+
+    # Try each possible format.
+    # Note that mm/dd/yyyy is tried last, to account for the
+    # schema-noncompliant date(s) (I'm looking at you, 'SN1667A').
+    for fmt in ("%Y/%m/%d", "%Y/%m", "%Y", "%m/%d/%Y"):
+        try:
+            return datetime.strptime(s, fmt) + dt
+        except ValueError:
+            pass
+    raise Exception(f"Unable to parse date '{s}'")
+
+# 'yyyy-mm-dd HH:MM:SS.f', with 1 to 6 digits of fractional seconds.
+TIMESTAMP_SHAPE_RE = re.compile(r"9999-99-99 99:99:99\.9{1,6}")
+
+_timestamp_shapes: dict[str, bool] = {}
+
+def _is_timestamp_shape(s: str) -> bool:
+    key = shape(s)
+    try:
+        return _timestamp_shapes[key]
+    except KeyError:
+        matched = _timestamp_shapes[key] = TIMESTAMP_SHAPE_RE.fullmatch(key) is not None
+        return matched
+
+def parse_timestamp(s: str) -> datetime:
+    """
+    Parse a date in `TIMESTAMP_FORMAT`. This gives exactly the same result
+    as `datetime.strptime(s, TIMESTAMP_FORMAT)`, only faster.
+    """
+    if _is_timestamp_shape(s):
+        try:
+            return datetime(int(s[0:4]), int(s[5:7]), int(s[8:10]),
+                            int(s[11:13]), int(s[14:16]), int(s[17:19]), int(s[20:].ljust(6, "0")))
+        except ValueError:
+            # Let `strptime` raise its usual error.
+            pass
+    return datetime.strptime(s, TIMESTAMP_FORMAT)
+
+def to_datetime64(dates: Iterable[Optional[datetime]]) -> np.ndarray:
+    """
+    Convert some dates to an array of `DATE_DTYPE`, with `None`s as NaT.
+    """
+    return np.array(list(dates), dtype=DATE_DTYPE)
+
+def _parse_many(values: Iterable[Optional[str]], parse: Callable[[str], datetime]) -> np.ndarray:
+    def parsed(s: Optional[str]) -> Optional[datetime]:
+        if s is None or s == "":
+            return None
+        try:
+            return parse(s)
+        except Exception:
+            return None
+    return to_datetime64(map(parsed, values))
+
+def try_parse_dates(values: Iterable[Optional[str]]) -> np.ndarray:
+    """
+    Parse some OAC dates (see `try_parse_date`) into an array of `DATE_DTYPE`.
+    Missing (`None` or empty) and unparsable dates are NaT.
+    """
+    return _parse_many(values, try_parse_date)
+
+def parse_timestamps(values: Iterable[Optional[str]]) -> np.ndarray:
+    """
+    Parse some dates in `TIMESTAMP_FORMAT` into an array of `DATE_DTYPE`.
+    Missing (`None` or empty) and unparsable dates are NaT.
+    """
+    return _parse_many(values, parse_timestamp)
@@ -11,6 +11,11 @@ MASTER_TABLE_NAME  = "oac_tns_all_sne"
 CLEANED_TABLE_NAME = "oac_tns_cleaned_sne"
 TDE_TABLE_NAME = "oac_tde"
 
+# The persistent, q3c indexed copies of the VLASS components of each epoch, and the
+# table keeping track of them. See `sneparse.db.util.epoch_components_table`.
+EPOCH_COMPONENTS_TABLE_NAME = "pybdsf_gaussian_epoch{epoch}"
+EPOCH_COMPONENTS_MANIFEST_TABLE_NAME = "pybdsf_gaussian_epochs"
+
 class Base(DeclarativeBase):
     """
     Base class for declarative ORM.
@@ -79,3 +84,16 @@ class TdeRecord(Base):
     claimed_type   : Mapped[Optional[str]]
     id: Mapped[int] = mapped_column(primary_key=True)
 
+
+@dataclass
+class EpochComponents(Base):
+    """
+    A row in the manifest of the per-epoch copies of the VLASS components: which table
+    holds the components of an epoch, how many there were when it was built, and when.
+    """
+    __tablename__ = EPOCH_COMPONENTS_MANIFEST_TABLE_NAME
+
+    epoch     : Mapped[int] = mapped_column(primary_key=True)
+    table_name: Mapped[str]
+    row_count : Mapped[int]
+    built     : Mapped[datetime]
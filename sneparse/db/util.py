@@ -1,28 +1,81 @@
 from typing import Any
+from datetime import datetime
 
-from sqlalchemy import text
+from sqlalchemy import inspect, text
 from sqlalchemy.orm.session import Session
 
 from sneparse.record import SneRecord
 from sneparse.coordinates import DecimalDegrees
+from sneparse.db.models import EPOCH_COMPONENTS_TABLE_NAME, EpochComponents
 
 def paramterize(r: SneRecord) -> dict[str, Any]:
     """
     Construct the dictionary to be used as the parameters for the __init__ of
-    an SQLAlchemy row class. Essentialy just `vars(r)` but converts the
+    an SQLAlchemy row class. Essentialy just `r.as_dict()` but converts the
     fields of type `DecimalDegrees` to `float`.
     """
-    return {k: (v.degrees if isinstance(v, DecimalDegrees) else v) for k, v in vars(r).items()}
+    return {k: (v.degrees if isinstance(v, DecimalDegrees) else v) for k, v in r.as_dict().items()}
 
-def prepare_q3c_index(table_name: str, session: Session) -> None:
+def prepare_q3c_index(table_name: str,
+                      session: Session,
+                      ra_column: str = "right_ascension",
+                      dec_column: str = "declination") -> None:
     """
     Prepare `table_name` for fast cross matching
     """
     session.execute(text(
         f"""
-        CREATE INDEX ON {table_name} (q3c_ang2ipix(right_ascension, declination));
+        CREATE INDEX ON {table_name} (q3c_ang2ipix({ra_column}, {dec_column}));
         CLUSTER {table_name}_q3c_ang2ipix_idx ON {table_name};
         ANALYZE {table_name};
         """
     ))
 
+
+def epoch_components_table(session: Session, epoch: int, rebuild: bool = False) -> str:
+    """
+    The name of a persistent table holding the VLASS components (from `pybdsf_gaussian`)
+    of a given `epoch`, prepared for fast cross matching.
+
+    The table is built once, and recorded in the manifest (see `EpochComponents`) along
+    with its number of rows. Later calls reuse it as long as `pybdsf_gaussian` still has
+    that many components of the epoch. Otherwise, or if `rebuild` is set (e.g. after
+    components were changed in place), it's built again.
+    """
+    table_name = EPOCH_COMPONENTS_TABLE_NAME.format(epoch=epoch)
+    EpochComponents.__table__.create(session.connection(), checkfirst=True) # type: ignore
+
+    # Counting the components is much cheaper than copying, indexing and clustering them.
+    like = f"VLASS{epoch}%"
+    count = session.execute(text(
+        f"SELECT count(*) FROM pybdsf_gaussian WHERE file_name LIKE '{like}';"
+    )).scalar_one()
+
+    manifest = session.get(EpochComponents, epoch)
+    if not rebuild and manifest is not None and manifest.table_name == table_name \
+            and inspect(session.connection()).has_table(table_name):
+        if manifest.row_count == count:
+            print(f"Reusing {table_name} ({count} components, built {manifest.built})")
+            return table_name
+        print(f"{table_name} has {manifest.row_count} components, but there are {count} now, rebuilding it")
+
+    drop = text(f"DROP TABLE IF EXISTS {table_name};")
+    print(drop)
+    session.execute(drop)
+
+    create = text(
+        f"CREATE TABLE {table_name} AS                                    \n"
+        f"    SELECT * FROM pybdsf_gaussian WHERE file_name LIKE '{like}';\n"
+    )
+    print(create)
+    session.execute(create)
+    prepare_q3c_index(table_name, session, ra_column="ra", dec_column="decl")
+
+    # The new table is much smaller than `pybdsf_gaussian`, and only counted once.
+    built = session.execute(text(f"SELECT count(*) FROM {table_name};")).scalar_one()
+    if built != count:
+        raise Exception(f"Built {table_name} with {built} components, but expected {count}")
+
+    session.merge(EpochComponents(epoch=epoch, table_name=table_name, row_count=built, built=datetime.now()))
+    session.commit()
+    return table_name
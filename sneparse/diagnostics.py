@@ -0,0 +1,165 @@
+from __future__ import annotations # for postponed annotation evaluation
+from typing import Any, Optional, TYPE_CHECKING
+from pathlib import Path
+from datetime import datetime
+from enum import Enum
+from threading import Thread
+from queue import SimpleQueue
+import json
+
+import numpy as np
+
+from sneparse.frame import SOURCES, MISSING_FIELDS
+
+if TYPE_CHECKING:
+    from sneparse.catalog import ParsedChunk
+
+class Detail(Enum):
+    """
+    How much of the individual incomplete records to write to the detail log.
+    """
+    NONE   = "none"
+    SAMPLE = "sample"
+    FULL   = "full"
+
+# With `Detail.SAMPLE`, one in this many incomplete records is written to the detail log.
+SAMPLE_EVERY = 100
+
+def pattern_name(mask: int) -> str:
+    """
+    Name a mask of missing fields (see `CatalogFrame.missing_fields`), e.g. 'declination+claimed_type'.
+    """
+    return "+".join(field for (bit, field) in enumerate(MISSING_FIELDS) if mask & (1 << bit))
+
+class ParseDiagnostics():
+    """
+    Collects the records with missing fields during a parse.
+
+    Incomplete records are only counted in memory, by pattern of missing fields, per
+    source and per file. `close` adds a summary of the counts to the JSON object in
+    `summary_path`, keyed by `run` (the time the parse started and its `description`),
+    so several parses sharing a log (e.g. those of one `Catalog`) don't overwrite each
+    other. A `summary_path` that can't be read is replaced.
+
+    The individual records can also be appended to `detail_path`, after a line naming
+    the parse, either all of them or a sample (see `Detail`). The detail log is written
+    by a background thread, so the parse never waits on it.
+    """
+    def __init__(self,
+                 summary_path: Path,
+                 detail_path: Path,
+                 detail: Detail = Detail.NONE,
+                 description: str = "") -> None:
+        self.summary_path = summary_path
+        self.detail_path = detail_path
+        self.detail = detail
+        self.description = description
+        self.run = f"[{datetime.now()}] {description}"
+
+        self.records = 0
+        self.incomplete = 0
+        self.by_source: dict[str, dict[int, int]] = {}
+        self.by_file: dict[str, dict[int, int]] = {}
+
+        self._queue: SimpleQueue[Optional[list[tuple[str, str, int]]]] = SimpleQueue()
+        self._writer: Optional[Thread] = None
+        if detail is not Detail.NONE:
+            self._writer = Thread(target=self._write_details, daemon=True)
+            self._writer.start()
+
+    def __enter__(self) -> ParseDiagnostics:
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        self.close()
+
+    def add(self, chunk: ParsedChunk) -> None:
+        """
+        Count the incomplete records in a newly parsed `chunk`.
+        """
+        self.records += len(chunk)
+        incomplete = np.flatnonzero(chunk.warnings)
+        if len(incomplete) == 0:
+            return
+        self.incomplete += len(incomplete)
+
+        masks = chunk.warnings[incomplete].astype(np.int64)
+
+        # Count each (source, mask) and (file, mask) pair at once, by packing
+        # the pair into a single integer key.
+        keys = chunk.frame.source[incomplete].astype(np.int64) << len(MISSING_FIELDS) | masks
+        for key, n in zip(*np.unique(keys, return_counts=True)):
+            counts = self.by_source.setdefault(SOURCES[key >> len(MISSING_FIELDS)].value, {})
+            mask = int(key) & ((1 << len(MISSING_FIELDS)) - 1)
+            counts[mask] = counts.get(mask, 0) + int(n)
+
+        keys = chunk.path_index[incomplete].astype(np.int64) << len(MISSING_FIELDS) | masks
+        for key, n in zip(*np.unique(keys, return_counts=True)):
+            counts = self.by_file.setdefault(str(chunk.paths[key >> len(MISSING_FIELDS)]), {})
+            mask = int(key) & ((1 << len(MISSING_FIELDS)) - 1)
+            counts[mask] = counts.get(mask, 0) + int(n)
+
+        match self.detail:
+            case Detail.NONE:
+                return
+            case Detail.SAMPLE:
+                # Take every `SAMPLE_EVERY`th incomplete record of the whole parse,
+                # not of each chunk, so small chunks aren't oversampled.
+                first = -(self.incomplete - len(incomplete)) % SAMPLE_EVERY
+                selected = np.arange(first, len(incomplete), SAMPLE_EVERY)
+            case Detail.FULL:
+                selected = np.arange(len(incomplete))
+
+        # The chunk may be backed by memory that is released once the parse moves on,
+        # so only plain Python objects go to the writer.
+        self._queue.put([(str(chunk.paths[chunk.path_index[incomplete[j]]]),
+                          chunk.frame.names[incomplete[j]],
+                          int(masks[j])) for j in selected])
+
+    def _write_details(self) -> None:
+        with open(self.detail_path, "a") as f:
+            f.write(f"[{datetime.now().time()}] Parsing {self.description}\n")
+            while (details := self._queue.get()) is not None:
+                for (path, name, mask) in details:
+                    f.write(f"[{datetime.now().time()}] Warning: In '{path}', "
+                            f"'{name}' is missing {pattern_name(mask).replace('+', ', ')}\n")
+
+    def summary(self) -> dict[str, Any]:
+        """
+        The counts of incomplete records, keyed by the names of their patterns of missing fields.
+        """
+        def named(counts: dict[int, int]) -> dict[str, int]:
+            return { pattern_name(mask): n for (mask, n) in sorted(counts.items()) }
+
+        return {
+            "records"   : self.records,
+            "incomplete": self.incomplete,
+            "by_source" : { source: named(counts) for (source, counts) in sorted(self.by_source.items()) },
+            "by_file"   : { path: named(counts) for (path, counts) in sorted(self.by_file.items()) },
+        }
+
+    def close(self) -> None:
+        """
+        Finish writing the detail log, if any, and add the summary to the summaries
+        of earlier parses.
+        """
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join()
+            self._writer = None
+
+        # Whatever can't be read (e.g. after an interrupted write) can't be added to,
+        # but it's no reason to fail a parse that already finished. It's replaced.
+        summaries: Any = {}
+        if self.summary_path.exists():
+            try:
+                with open(self.summary_path) as f:
+                    summaries = json.load(f)
+            except ValueError:
+                summaries = {}
+        if not isinstance(summaries, dict):
+            summaries = {}
+        summaries[self.run] = self.summary()
+
+        with open(self.summary_path, "w") as f:
+            json.dump(summaries, f, indent=4)
@@ -0,0 +1,117 @@
+from __future__ import annotations # for postponed annotation evaluation
+from typing import Any, BinaryIO, Iterator, Optional, Sequence
+from contextlib import contextmanager
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import gzip
+
+from sneparse.crossmatch import PARTITION_CHUNK_ROWS, iter_table
+
+# The formats a query can be exported to, by the suffix of the output file.
+EXPORT_FORMATS = {
+    "csv"    : ".csv",
+    "gzip"   : ".csv.gz",
+    "zstd"   : ".csv.zst",
+    "parquet": ".parquet",
+}
+
+def export_path(path: Path, format: str) -> Path:
+    """
+    The path to export to in a given `format` (see `EXPORT_FORMATS`), given the path of
+    the plain csv file, e.g. 'epoch1_cross_matches.csv' -> 'epoch1_cross_matches.csv.gz'.
+    """
+    return path.with_name(path.name.removesuffix(".csv") + EXPORT_FORMATS[format])
+
+def quote_identifier(name: str) -> str:
+    """
+    Quote a column name for SQL, so any name (even one with quotes in it) is taken as is.
+    """
+    return '"' + name.replace('"', '""') + '"'
+
+def select_list(columns_a: Optional[Sequence[str]], columns_b: Optional[Sequence[str]]) -> str:
+    """
+    The select list of a join of tables `a` and `b`, keeping only the given columns of each.
+    All the columns of a table are kept if its columns are `None`.
+
+    A column kept from both tables would appear twice in the result, which a table can't
+    hold, so the one from `b` is renamed to `b_{name}`.
+    """
+    both = set(columns_a or ()) & set(columns_b or ())
+
+    def projected(table: str, columns: Optional[Sequence[str]]) -> list[str]:
+        if columns is None:
+            return [f"{table}.*"]
+        return [f"{table}.{quote_identifier(column)}" +
+                    (f" AS {quote_identifier(f'{table}_{column}')}" if table == "b" and column in both else "")
+                for column in columns]
+
+    return ", ".join(projected("a", columns_a) + projected("b", columns_b))
+
+@contextmanager
+def open_export(path: Path) -> Iterator[BinaryIO]:
+    """
+    Open a csv file for writing, compressed according to its suffix (see `EXPORT_FORMATS`).
+    Writing zstd-compressed files requires the `zstandard` package.
+    """
+    name = path.name
+    if name.endswith(EXPORT_FORMATS["gzip"]):
+        with gzip.open(path, "wb") as f:
+            yield f # type: ignore
+    elif name.endswith(EXPORT_FORMATS["zstd"]):
+        try:
+            import zstandard
+        except ImportError:
+            raise Exception(f"Writing {path} requires the `zstandard` package")
+
+        with open(path, "wb") as raw, zstandard.ZstdCompressor().stream_writer(raw) as f:
+            yield f # type: ignore
+    elif name.endswith(EXPORT_FORMATS["csv"]):
+        with open(path, "wb") as f:
+            yield f
+    else:
+        raise Exception(f"Unsupported export format: {path}")
+
+def csv_to_parquet(csv_path: Path, parquet_path: Path, chunk_rows: int = PARTITION_CHUNK_ROWS) -> None:
+    """
+    Convert a csv export to Parquet, `chunk_rows` rows at a time. The values are kept as
+    text, like `read_table` reads them. Requires the `pyarrow` package.
+    """
+    try:
+        import pyarrow as pa # type: ignore
+        import pyarrow.parquet as pq # type: ignore
+    except ImportError:
+        raise Exception(f"Writing {parquet_path} requires the `pyarrow` package")
+
+    writer: Optional[Any] = None
+    try:
+        for chunk in iter_table(csv_path, chunk_rows):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(parquet_path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+def copy_to(cursor: Any, table: str, path: Path, chunk_rows: int = PARTITION_CHUNK_ROWS) -> None:
+    """
+    Export a database `table` (or a parenthesized query) to `path`, as csv, compressed csv
+    or Parquet depending on its suffix (see `EXPORT_FORMATS`). `cursor` is a DB-API cursor
+    with `copy_expert`, like psycopg2's.
+
+    The rows are streamed from the cursor straight to disk, so only a buffer's worth of them
+    is ever in memory. Parquet is written from a temporary csv file next to `path`, converted
+    `chunk_rows` rows at a time.
+    """
+    copy = f"COPY {table} TO STDOUT WITH (FORMAT csv, HEADER);\n"
+    print(copy)
+
+    if path.name.endswith(EXPORT_FORMATS["parquet"]):
+        with TemporaryDirectory(dir=path.parent) as tmp:
+            csv_path = Path(tmp).joinpath(path.with_suffix(".csv").name)
+            with open(csv_path, "wb") as f:
+                cursor.copy_expert(copy, f)
+            csv_to_parquet(csv_path, path, chunk_rows)
+    else:
+        with open_export(path) as f:
+            cursor.copy_expert(copy, f)
@@ -0,0 +1,442 @@
+from __future__ import annotations # for postponed annotation evaluation
+from typing import Any, Iterable, Iterator, Optional, Union, Tuple
+from pathlib import Path
+from datetime import datetime
+import json
+import sys
+
+import numpy as np
+from scipy.spatial import KDTree
+
+from sneparse.record import SneRecord, Source
+from sneparse.coordinates import (DecimalDegrees, angular_separation_to_distance, distances_to_angular_separations,
+                                  to_cartesian)
+from sneparse.dates import DATE_DTYPE, to_datetime64
+
+# The `source` column holds the index of each record's source in this list.
+SOURCES: list[Source] = list(Source)
+SOURCE_CODES: dict[Source, int] = {s: i for i, s in enumerate(SOURCES)}
+
+# The `claimed_type` code of a record without a claimed type.
+NULL_CODE = -1
+
+# The fields that a record may be missing. In the masks returned by
+# `CatalogFrame.missing_fields`, bit `i` is set if the `i`th field is missing.
+MISSING_FIELDS = ("right_ascension", "declination", "discover_date", "claimed_type")
+
+# Snapshots (see `CatalogFrame.save`) start with this magic string, then the length
+# of the json header as a little-endian uint64, then the header. Each column starts
+# at a multiple of `SNAPSHOT_ALIGNMENT` bytes.
+SNAPSHOT_MAGIC = b"SNEPSNAP"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_ALIGNMENT = 64
+
+# `CatalogFrame.iter_close_pairs` searches for the pairs of this many records at a time.
+CLOSE_PAIRS_BLOCK_SIZE = 65536
+
+def _align(n: int) -> int:
+    return -(-n // SNAPSHOT_ALIGNMENT) * SNAPSHOT_ALIGNMENT
+
+class StringHeap():
+    """
+    An array of strings stored as a single buffer of utf-8 bytes (the heap),
+    where the `i`th string is `heap[offsets[i]:offsets[i + 1]]`. Unlike an
+    array of Python strings, this can be written to and mapped from a file as is.
+    """
+    def __init__(self, heap: np.ndarray, offsets: np.ndarray) -> None:
+        self.heap    = heap
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return bytes(self.heap[self.offsets[i]:self.offsets[i + 1]]).decode()
+
+    def __iter__(self) -> Iterator[str]:
+        return (self[i] for i in range(len(self)))
+
+    @classmethod
+    def from_strings(cls, strings: Iterable[str]) -> StringHeap:
+        encoded = [s.encode() for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return StringHeap(np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets)
+
+    @classmethod
+    def concat(cls, heaps: list[StringHeap]) -> StringHeap:
+        # The offsets of each heap are shifted by the total size of the heaps before it.
+        sizes = np.cumsum([0] + [h.offsets[-1] for h in heaps])
+        offsets = [h.offsets[:-1] + base for (h, base) in zip(heaps, sizes)]
+        return StringHeap(np.concatenate([h.heap[:h.offsets[-1]] for h in heaps] + [np.empty(0, np.uint8)]),
+                          np.concatenate(offsets + [sizes[-1:]]).astype(np.int64))
+
+    def take(self, indices: Iterable[int]) -> StringHeap:
+        return StringHeap.from_strings(self[i] for i in indices)
+
+class CatalogFrame():
+    """
+    A columnar (struct-of-arrays) representation of a collection of `SneRecord`s.
+
+    Rather than one Python object per record (each holding more Python objects), a
+    `CatalogFrame` stores each field in a single array:
+        * `names`: the (interned) names of the records, or a `StringHeap` of them
+        * `right_ascension` and `declination`: float64 decimal degrees, NaN if missing
+        * `discover_date`: datetime64[us], NaT if missing
+        * `claimed_type`: int32 codes into `claimed_types`, `NULL_CODE` if missing
+        * `source`: int8 codes into `SOURCES`
+
+    Converting between `SneRecord`s and a `CatalogFrame` is lossless.
+    """
+    def __init__(self,
+                 names: Union[np.ndarray, StringHeap],
+                 right_ascension: np.ndarray,
+                 declination: np.ndarray,
+                 discover_date: np.ndarray,
+                 claimed_type: np.ndarray,
+                 claimed_types: list[str],
+                 source: np.ndarray) -> None:
+        self.names           = names
+        self.right_ascension = right_ascension
+        self.declination     = declination
+        self.discover_date   = discover_date
+        self.claimed_type    = claimed_type
+        self.claimed_types   = claimed_types
+        self.source          = source
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __getitem__(self, i: int) -> SneRecord:
+        return self.record(i)
+
+    def __iter__(self) -> Iterator[SneRecord]:
+        return (self.record(i) for i in range(len(self)))
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # Pickle the names as a `StringHeap`, i.e. as two arrays rather than
+        # one Python string per record.
+        return (CatalogFrame, (self._name_heap(), self.right_ascension, self.declination, self.discover_date,
+                               self.claimed_type, self.claimed_types, self.source))
+
+    def _name_heap(self) -> StringHeap:
+        return self.names if isinstance(self.names, StringHeap) else StringHeap.from_strings(self.names)
+
+    @classmethod
+    def empty(cls) -> CatalogFrame:
+        return CatalogFrame.from_records([])
+
+    @classmethod
+    def concat(cls, frames: Iterable[CatalogFrame]) -> CatalogFrame:
+        """
+        Concatenate some frames into one, without creating any `SneRecord`s.
+        The result never shares memory with `frames`.
+        """
+        frames = list(frames)
+        if len(frames) == 0:
+            return CatalogFrame.empty()
+
+        # Each frame numbers its claimed types differently, so the codes of
+        # each frame are mapped to codes into the combined list of types.
+        claimed_types: list[str] = []
+        claimed_type_codes: dict[str, int] = {}
+        claimed_type_columns: list[np.ndarray] = []
+        for frame in frames:
+            mapping = np.empty(len(frame.claimed_types) + 1, dtype=np.int32)
+            for i, t in enumerate(frame.claimed_types):
+                if (code := claimed_type_codes.get(t)) is None:
+                    code = claimed_type_codes[t] = len(claimed_types)
+                    claimed_types.append(t)
+                mapping[i] = code
+            # `NULL_CODE` (-1) indexes the last element.
+            mapping[-1] = NULL_CODE
+            claimed_type_columns.append(mapping[frame.claimed_type])
+
+        names: Union[np.ndarray, StringHeap]
+        if all(isinstance(frame.names, np.ndarray) for frame in frames):
+            names = np.concatenate([frame.names for frame in frames])
+        else:
+            names = StringHeap.concat([frame._name_heap() for frame in frames])
+
+        return CatalogFrame(
+            names,
+            np.concatenate([frame.right_ascension for frame in frames]),
+            np.concatenate([frame.declination for frame in frames]),
+            np.concatenate([frame.discover_date for frame in frames]),
+            np.concatenate(claimed_type_columns),
+            claimed_types,
+            np.concatenate([frame.source for frame in frames])
+        )
+
+    def take(self, indices: Union[np.ndarray, slice]) -> CatalogFrame:
+        """
+        Get a new frame with only the records at `indices`.
+        """
+        names = self.names[indices] if isinstance(self.names, np.ndarray) \
+                    else self.names.take(np.arange(len(self))[indices])
+        return CatalogFrame(names, self.right_ascension[indices], self.declination[indices],
+                            self.discover_date[indices], self.claimed_type[indices], self.claimed_types,
+                            self.source[indices])
+
+    @classmethod
+    def from_records(cls, records: Iterable[SneRecord]) -> CatalogFrame:
+        """
+        Create a `CatalogFrame` from some `SneRecord`s.
+        """
+        names: list[str] = []
+        ras: list[float] = []
+        decs: list[float] = []
+        dates: list[Optional[datetime]] = []
+        type_codes: list[int] = []
+        source_codes: list[int] = []
+
+        claimed_types: list[str] = []
+        claimed_type_codes: dict[str, int] = {}
+
+        for r in records:
+            names.append(sys.intern(r.name))
+            ras.append(np.nan if r.right_ascension is None else r.right_ascension.degrees)
+            decs.append(np.nan if r.declination is None else r.declination.degrees)
+            dates.append(r.discover_date)
+
+            if r.claimed_type is None:
+                type_codes.append(NULL_CODE)
+            else:
+                if (code := claimed_type_codes.get(r.claimed_type)) is None:
+                    code = claimed_type_codes[r.claimed_type] = len(claimed_types)
+                    claimed_types.append(r.claimed_type)
+                type_codes.append(code)
+
+            source_codes.append(SOURCE_CODES[r.source])
+
+        name_array = np.empty(len(names), dtype=object)
+        name_array[:] = names
+
+        return CatalogFrame(
+            name_array,
+            np.array(ras, dtype=np.float64),
+            np.array(decs, dtype=np.float64),
+            to_datetime64(dates),
+            np.array(type_codes, dtype=np.int32),
+            claimed_types,
+            np.array(source_codes, dtype=np.int8)
+        )
+
+    def _fields(self, i: int) -> dict[str, Any]:
+        ra  = self.right_ascension[i]
+        dec = self.declination[i]
+        date = self.discover_date[i]
+        code = self.claimed_type[i]
+        return {
+            "name"           : self.names[i],
+            "right_ascension": None if np.isnan(ra) else float(ra),
+            "declination"    : None if np.isnan(dec) else float(dec),
+            "discover_date"  : None if np.isnat(date) else date.item(),
+            "claimed_type"   : None if code == NULL_CODE else self.claimed_types[code],
+            "source"         : SOURCES[self.source[i]],
+        }
+
+    def record(self, i: int) -> SneRecord:
+        """
+        Materialize the `i`th record as an `SneRecord`.
+        """
+        f = self._fields(i)
+        return SneRecord(f["name"], f["right_ascension"], f["declination"],
+                         f["discover_date"], f["claimed_type"], f["source"])
+
+    def to_records(self) -> list[SneRecord]:
+        return list(self)
+
+    def as_rows(self) -> Iterator[Iterator[str]]:
+        """
+        The csv rows of each record, exactly as `SneRecord.as_row` would write them.
+        """
+        for i in range(len(self)):
+            yield (("" if v is None else str(v)) if not isinstance(v, datetime) \
+                    else v.strftime("%Y-%m-%d %H:%M:%S.%f") for v in self._fields(i).values())
+
+    def params(self) -> Iterator[dict[str, Any]]:
+        """
+        The parameters of each record for an SQLAlchemy row class, exactly as
+        `sneparse.db.util.paramterize` would make them.
+        """
+        return (self._fields(i) for i in range(len(self)))
+
+    def missing_fields(self) -> np.ndarray:
+        """
+        A uint8 mask for each record of the fields it is missing. See `MISSING_FIELDS`.
+        """
+        missing = np.zeros(len(self), dtype=np.uint8)
+        for bit, is_missing in enumerate((np.isnan(self.right_ascension),
+                                          np.isnan(self.declination),
+                                          np.isnat(self.discover_date),
+                                          self.claimed_type == NULL_CODE)):
+            missing |= is_missing.astype(np.uint8) << bit
+        return missing
+
+    def has_position(self) -> np.ndarray:
+        """
+        A mask of the records with both a right ascension and a declination.
+        """
+        return ~(np.isnan(self.right_ascension) | np.isnan(self.declination))
+
+    def cartesian(self) -> np.ndarray:
+        """
+        The (N, 3) array of points on the unit sphere corresponding to each record's
+        position. See `Cartesian.from_angular`.
+        """
+        return to_cartesian(self.right_ascension, self.declination)
+
+    def find_close_pairs(self, threshold: DecimalDegrees) -> np.ndarray:
+        """
+        Find all pairs of records separated by no more than `threshold`. Returns
+        an (N, 2) array of indices into `self`. Records without a position are
+        never part of a pair.
+        """
+        pairs, _ = self.close_pairs(threshold)
+        return pairs
+
+    def close_pairs(self,
+                    threshold: DecimalDegrees,
+                    max_pairs: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Like `find_close_pairs`, but also returns the angular separation (in degrees)
+        of each pair.
+
+        If `max_pairs` is given, the pairs are found a block of records at a time (see
+        `iter_close_pairs`), and an exception is raised as soon as there are more than
+        `max_pairs` of them, rather than running out of memory on a dense field.
+        """
+        if max_pairs is not None:
+            pairs: list[np.ndarray] = [np.empty((0, 2), dtype=np.intp)]
+            separations: list[np.ndarray] = [np.empty(0, dtype=np.float64)]
+            n = 0
+            for block_pairs, block_separations in self.iter_close_pairs(threshold):
+                n += len(block_pairs)
+                if n > max_pairs:
+                    raise Exception(f"More than {max_pairs} pairs of records are within {threshold} of each other")
+                pairs.append(block_pairs)
+                separations.append(block_separations)
+            return (np.concatenate(pairs), np.concatenate(separations))
+
+        valid = np.flatnonzero(self.has_position())
+        points = self.cartesian()[valid]
+        kd_tree = KDTree(points)
+        pairs_ = kd_tree.query_pairs(angular_separation_to_distance(threshold), output_type="ndarray").reshape(-1, 2)
+        distances = np.linalg.norm(points[pairs_[:, 0]] - points[pairs_[:, 1]], axis=1)
+        return (valid[pairs_], distances_to_angular_separations(distances))
+
+    def iter_close_pairs(self,
+                         threshold: DecimalDegrees,
+                         block_size: int = CLOSE_PAIRS_BLOCK_SIZE) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Find the same pairs as `close_pairs`, a block of `block_size` records at a time.
+        Yields the (N, 2) array of indices and the array of angular separations (in degrees)
+        of the pairs whose first record is in each block, so only one block's pairs are
+        in memory at once. Every pair is yielded exactly once, with `i < j`.
+        """
+        valid = np.flatnonzero(self.has_position())
+        points = self.cartesian()[valid]
+        kd_tree = KDTree(points)
+        distance = angular_separation_to_distance(threshold)
+
+        for start in range(0, len(valid), block_size):
+            block_tree = KDTree(points[start:start + block_size])
+            found = block_tree.sparse_distance_matrix(kd_tree, distance, output_type="ndarray")
+
+            # Each pair is found from both of its records (and each record is paired with
+            # itself), so only keep the pairs whose first record is the lower one.
+            i = found["i"] + start
+            j = found["j"]
+            keep = i < j
+            yield (np.column_stack((valid[i[keep]], valid[j[keep]])),
+                   distances_to_angular_separations(found["v"][keep]))
+
+    def columns(self) -> dict[str, np.ndarray]:
+        """
+        The fields of `self` as flat, fixed-width arrays, e.g. for writing out as is.
+        The frame can be recreated from them with `from_columns`.
+        """
+        names = self._name_heap()
+        return {
+            "right_ascension": self.right_ascension,
+            "declination"    : self.declination,
+            "discover_date"  : self.discover_date.view(np.int64),
+            "claimed_type"   : self.claimed_type,
+            "source"         : self.source,
+            "name_offsets"   : names.offsets,
+            "name_heap"      : names.heap,
+        }
+
+    @classmethod
+    def from_columns(cls, columns: dict[str, np.ndarray], claimed_types: list[str]) -> CatalogFrame:
+        """
+        Create a `CatalogFrame` from the arrays returned by `columns`, without copying them.
+        """
+        return CatalogFrame(
+            StringHeap(columns["name_heap"], columns["name_offsets"]),
+            columns["right_ascension"],
+            columns["declination"],
+            columns["discover_date"].view(DATE_DTYPE),
+            columns["claimed_type"],
+            claimed_types,
+            columns["source"]
+        )
+
+    def save(self, path: Path) -> None:
+        """
+        Write `self` to a snapshot file at `path`, which can be loaded with `load`.
+        """
+        columns = self.columns()
+
+        # Column offsets are relative to the (aligned) end of the header.
+        layout: dict[str, dict[str, Any]] = {}
+        offset = 0
+        for name, column in columns.items():
+            layout[name] = { "dtype": column.dtype.str, "offset": offset, "length": len(column) }
+            offset = _align(offset + column.nbytes)
+
+        header = json.dumps({
+            "version"      : SNAPSHOT_VERSION,
+            "length"       : len(self),
+            "claimed_types": self.claimed_types,
+            "sources"      : [s.value for s in SOURCES],
+            "columns"      : layout,
+        }).encode()
+
+        with open(path, "wb") as f:
+            f.write(SNAPSHOT_MAGIC)
+            f.write(np.uint64(len(header)).astype("<u8").tobytes())
+            f.write(header)
+            start = _align(f.tell())
+
+            for name, column in columns.items():
+                f.seek(start + layout[name]["offset"])
+                f.write(np.ascontiguousarray(column).tobytes())
+
+    @classmethod
+    def load(cls, path: Path) -> CatalogFrame:
+        """
+        Load a snapshot written by `save`. The snapshot is memory-mapped rather than read,
+        so loading is nearly instant, and processes loading the same snapshot share its pages.
+        """
+        m = np.memmap(path, dtype=np.uint8, mode="r")
+        if bytes(m[:len(SNAPSHOT_MAGIC)]) != SNAPSHOT_MAGIC:
+            raise Exception(f"{path} is not a catalog snapshot")
+
+        header_start = len(SNAPSHOT_MAGIC) + 8
+        header_length = int(m[len(SNAPSHOT_MAGIC):header_start].view("<u8")[0])
+        header = json.loads(bytes(m[header_start:header_start + header_length]))
+        if header["version"] != SNAPSHOT_VERSION:
+            raise Exception(f"Unsupported snapshot version {header['version']} in {path}")
+        if header["sources"] != [s.value for s in SOURCES]:
+            raise Exception(f"Snapshot {path} was written with different sources: {header['sources']}")
+
+        start = _align(header_start + header_length)
+        columns: dict[str, np.ndarray] = {}
+        for name, column in header["columns"].items():
+            dtype = np.dtype(column["dtype"])
+            offset = start + column["offset"]
+            columns[name] = m[offset:offset + column["length"] * dtype.itemsize].view(dtype)
+
+        return CatalogFrame.from_columns(columns, header["claimed_types"])
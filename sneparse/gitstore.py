@@ -0,0 +1,94 @@
+from __future__ import annotations # for postponed annotation evaluation
+from typing import Any, Tuple
+from pathlib import Path, PurePosixPath
+import subprocess
+
+def _git(repo: Path, *args: str) -> bytes:
+    return subprocess.run(["git", "-C", str(repo), *args], stdout=subprocess.PIPE, check=True).stdout
+
+def list_blobs(repo: Path, commit: str = "HEAD", suffix: str = ".json") -> list[Tuple[str, str]]:
+    """
+    List the `(object id, path)` of every blob with the given `suffix` in the tree of `commit`.
+    """
+    blobs: list[Tuple[str, str]] = []
+
+    # Each entry is formatted as "<mode> <type> <object id>\t<path>\0".
+    for entry in _git(repo, "ls-tree", "-r", "-z", commit).split(b"\0"):
+        if not entry:
+            continue
+        meta, path = entry.decode().split("\t", 1)
+        _, type_, oid = meta.split(" ")
+        if type_ == "blob" and PurePosixPath(path).suffix == suffix:
+            blobs.append((oid, path))
+
+    return blobs
+
+def changed_blobs(repo: Path, since: str, commit: str = "HEAD", suffix: str = ".json") -> list[Tuple[str, str]]:
+    """
+    List the `(object id, path)` of every blob with the given `suffix` that was added
+    or modified between `since` and `commit`. Deleted blobs are not listed.
+    """
+    blobs: list[Tuple[str, str]] = []
+
+    # With -z, each change is formatted as
+    # ":<old mode> <new mode> <old object id> <new object id> <status>\0<path>\0".
+    # Renames are reported as a deletion and an addition.
+    fields = _git(repo, "diff-tree", "-r", "-z", "--no-renames", "--diff-filter=d", since, commit).split(b"\0")
+    for meta, path in zip(fields[0::2], fields[1::2]):
+        _, _, _, oid, _ = meta.decode().split(" ")
+        if PurePosixPath(path.decode()).suffix == suffix:
+            blobs.append((oid, path.decode()))
+
+    return blobs
+
+class CatFileBatch():
+    """
+    A long-lived `git cat-file --batch` process, for reading many blobs out of a
+    repository's object store without spawning a process (or opening a file) per blob.
+    """
+    def __init__(self, repo: Path) -> None:
+        self.repo = repo
+        self._process = subprocess.Popen(["git", "-C", str(repo), "cat-file", "--batch"],
+                                         stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def __enter__(self) -> CatFileBatch:
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        self.close()
+
+    def read(self, oid: str) -> bytes:
+        """
+        Read the contents of the object `oid`.
+        """
+        stdin, stdout = self._process.stdin, self._process.stdout
+        assert stdin is not None and stdout is not None
+
+        stdin.write(oid.encode() + b"\n")
+        stdin.flush()
+
+        # The header is "<object id> <type> <size>\n", or "<object id> missing\n".
+        header = stdout.readline().split()
+        if len(header) != 3:
+            raise Exception(f"Object {oid} not found in {self.repo}")
+
+        # The contents are followed by a newline.
+        contents = stdout.read(int(header[2]) + 1)
+        return contents[:-1]
+
+    def close(self) -> None:
+        if self._process.stdin is not None:
+            self._process.stdin.close()
+        self._process.wait()
+
+# Each worker process reads blobs through its own `CatFileBatch` for each repository.
+_cat_files: dict[Path, CatFileBatch] = {}
+
+def read_blob(repo: Path, oid: str) -> bytes:
+    """
+    Read a blob from the repository at `repo`, through a `CatFileBatch` that is
+    started the first time this process reads from that repository.
+    """
+    if (cat_file := _cat_files.get(repo)) is None:
+        cat_file = _cat_files[repo] = CatFileBatch(repo)
+    return cat_file.read(oid)
@@ -0,0 +1,114 @@
+from __future__ import annotations # for postponed annotation evaluation
+from typing import Optional, Sequence, Tuple
+from datetime import timedelta
+
+import numpy as np
+from scipy.spatial import KDTree
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+from sneparse.coordinates import DecimalDegrees, angular_separation_to_distance, to_cartesian
+from sneparse.dates import DATE_DTYPE
+
+# Records discovered less than this far apart may be the same source.
+DEFAULT_TIME_WINDOW = timedelta(days=1)
+
+def label_components(n: int, pairs: np.ndarray) -> np.ndarray:
+    """
+    Label each of `n` items with the connected component it belongs to, given the (N, 2)
+    array of `pairs` of linked items. Items in the same component get the same label, and
+    the labels are 0, 1, 2, ... Items that aren't part of any pair get a label of their own.
+    """
+    graph = coo_matrix((np.ones(len(pairs), dtype=np.int8), (pairs[:, 0], pairs[:, 1])), shape=(n, n))
+    _, labels = connected_components(graph, directed=False)
+    return labels
+
+class FriendsOfFriends():
+    """
+    Groups records that are likely the same source, using a spatio-temporal
+    friends-of-friends algorithm: two records are linked if they are separated by no
+    more than the spatial linking length, and discovered less than `time_window` apart.
+    The groups are the connected components of the links.
+
+    Records without a position, or without a discovery date (NaT), are never linked. If
+    `time_window` is `None`, discovery dates are ignored altogether. If `names` is given,
+    records with the same name are never linked directly (like the records of the same
+    source from different files).
+
+    The KD-tree of positions is built once, so grouping the same records with several
+    linking lengths (see `sweep`) doesn't rebuild it.
+    """
+    def __init__(self,
+                 right_ascension: np.ndarray,
+                 declination: np.ndarray,
+                 discover_date: np.ndarray,
+                 time_window: Optional[timedelta] = DEFAULT_TIME_WINDOW,
+                 names: Optional[Sequence[str]] = None) -> None:
+        right_ascension = np.asarray(right_ascension, dtype=np.float64)
+        declination = np.asarray(declination, dtype=np.float64)
+
+        self.n = len(right_ascension)
+        self.discover_date = np.asarray(discover_date, dtype=DATE_DTYPE)
+        self.time_window = time_window
+        self.names = names
+
+        # Names are compared as integer codes, so whole arrays of pairs can be filtered at once.
+        self._name_codes: Optional[np.ndarray] = None
+        if names is not None:
+            _, self._name_codes = np.unique(np.asarray(names, dtype=object), return_inverse=True)
+
+        self._valid = np.flatnonzero(~(np.isnan(right_ascension) | np.isnan(declination)))
+        self._points = to_cartesian(right_ascension[self._valid], declination[self._valid])
+        self._kd_tree = KDTree(self._points)
+
+    def pairs(self, linking_length: DecimalDegrees) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find every linked pair of records for a given spatial `linking_length`. Returns the
+        (N, 2) array of indices of the pairs, and the distance between the pair's points on
+        the unit sphere (see `angular_separation_to_distance`).
+        """
+        found = self._kd_tree.query_pairs(angular_separation_to_distance(linking_length),
+                                          output_type="ndarray").reshape(-1, 2)
+        distances = np.linalg.norm(self._points[found[:, 0]] - self._points[found[:, 1]], axis=1)
+        pairs = self._valid[found]
+
+        keep = np.ones(len(pairs), dtype=bool)
+        if self.time_window is not None:
+            # NaT never compares as less than anything, so pairs with a missing date are dropped.
+            dates = self.discover_date
+            keep &= np.abs(dates[pairs[:, 0]] - dates[pairs[:, 1]]) < np.timedelta64(self.time_window)
+        if self._name_codes is not None:
+            codes = self._name_codes
+            keep &= codes[pairs[:, 0]] != codes[pairs[:, 1]]
+
+        return (pairs[keep], distances[keep])
+
+    def groups(self, linking_length: DecimalDegrees) -> np.ndarray:
+        """
+        Label each record with its group for a given spatial `linking_length`.
+        See `label_components`.
+        """
+        return self.sweep([linking_length])[0]
+
+    def sweep(self, linking_lengths: Sequence[DecimalDegrees]) -> list[np.ndarray]:
+        """
+        Label each record with its group for each of several spatial `linking_lengths`.
+
+        The pairs are only searched for once, with the largest linking length. The links
+        for the smaller ones are a subset of those.
+        """
+        if len(linking_lengths) == 0:
+            return []
+
+        pairs, distances = self.pairs(max(linking_lengths, key=lambda length: length.degrees))
+        return [label_components(self.n, pairs[distances <= angular_separation_to_distance(length)])
+                    for length in linking_lengths]
+
+def group_members(labels: np.ndarray) -> list[np.ndarray]:
+    """
+    The indices of the members of each group with more than one member, given the
+    labels returned by `FriendsOfFriends.groups`.
+    """
+    order = np.argsort(labels, kind="stable")
+    starts = np.flatnonzero(np.diff(labels[order], prepend=-1))
+    return [members for members in np.split(order, starts[1:]) if len(members) > 1]
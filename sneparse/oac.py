@@ -0,0 +1,133 @@
+from typing import Any, Tuple
+from json.decoder import JSONDecoder, scanstring
+import json
+import re
+
+# The keys of an OAC event that `SneRecord.from_oac` actually reads. Of the
+# keys holding lists, only the first item is ever used.
+OAC_NAME_KEY = "name"
+OAC_LIST_KEYS = frozenset(("ra", "dec", "discoverdate", "claimedtype"))
+
+# Regular expressions used to step over parts of a document without decoding them.
+# The patterns are "unrolled" (no nested quantifiers that can match the same text) and
+# possessive, so they can't backtrack catastrophically on unexpected input.
+_STRING = r'"[^"\\]*+(?:\\.[^"\\]*+)*+"'
+_NO_BRACKETS = r'[^"\[\]{}]*+(?:' + _STRING + r'[^"\[\]{}]*+)*+'
+
+WHITESPACE_RE = re.compile(r"[ \t\n\r]*")
+STRING_RE     = re.compile(_STRING)
+SCALAR_RE     = re.compile(r"[^,\]}\s]+")
+# Everything up to the next bracket, skipping over strings (which may contain brackets).
+NO_BRACKETS_RE = re.compile(_NO_BRACKETS)
+# A run of sibling containers with no containers inside them, e.g. a list of photometry points.
+FLAT_CONTAINERS_RE = re.compile(r"(?:[\[{]" + _NO_BRACKETS + r"[\]}][\s,]*+)++")
+
+_decoder = JSONDecoder()
+
+def _skip_whitespace(s: str, pos: int) -> int:
+    return WHITESPACE_RE.match(s, pos).end() # type: ignore
+
+def _expect(s: str, pos: int, c: str) -> int:
+    if s[pos] != c:
+        raise ValueError(f"Expected '{c}' at position {pos}")
+    return _skip_whitespace(s, pos + 1)
+
+def _read_key(s: str, pos: int) -> Tuple[str, int]:
+    """
+    Read an object key and the colon after it. Returns the key and the position of its value.
+    """
+    if s[pos] != '"':
+        raise ValueError(f"Expected a key at position {pos}")
+    key, pos = scanstring(s, pos + 1)
+    return key, _expect(s, _skip_whitespace(s, pos), ":")
+
+def _skip_nested(s: str, pos: int, depth: int) -> int:
+    """
+    Skip to the end of `depth` open containers, where `pos` is somewhere inside
+    the innermost one. Returns the position just after the outermost one closes.
+    """
+    while depth > 0:
+        pos = NO_BRACKETS_RE.match(s, pos).end() # type: ignore
+        c = s[pos]
+        if c in "[{":
+            # Most of a large document is long lists of flat containers (e.g. photometry
+            # points), and a whole list of them can be skipped with a single match.
+            if (m := FLAT_CONTAINERS_RE.match(s, pos)) is not None:
+                pos = m.end()
+            else:
+                depth += 1
+                pos += 1
+        elif c in "]}":
+            depth -= 1
+            pos += 1
+        else:
+            raise ValueError(f"Unterminated string at position {pos}")
+    return pos
+
+def _skip_value(s: str, pos: int) -> int:
+    c = s[pos]
+    if c in "[{":
+        return _skip_nested(s, pos + 1, 1)
+    m = (STRING_RE if c == '"' else SCALAR_RE).match(s, pos)
+    if m is None:
+        raise ValueError(f"Expected a value at position {pos}")
+    return m.end()
+
+def _extract_event(s: str, pos: int) -> dict[str, Any]:
+    """
+    Extract the keys used by `SneRecord.from_oac` from the event object starting at `pos`.
+    """
+    event: dict[str, Any] = {}
+    pos = _expect(s, pos, "{")
+    if s[pos] == "}":
+        return event
+
+    while True:
+        key, pos = _read_key(s, pos)
+
+        if key == OAC_NAME_KEY:
+            event[key], pos = _decoder.raw_decode(s, pos)
+        elif key in OAC_LIST_KEYS and s[pos] == "[":
+            pos = _skip_whitespace(s, pos + 1)
+            if s[pos] == "]":
+                event[key] = []
+                pos += 1
+            else:
+                first, pos = _decoder.raw_decode(s, pos)
+                event[key] = [first]
+                pos = _skip_nested(s, pos, 1)
+        elif key in OAC_LIST_KEYS:
+            event[key], pos = _decoder.raw_decode(s, pos)
+        else:
+            pos = _skip_value(s, pos)
+
+        # OAC documents are written out from dictionaries, so keys are never repeated
+        # and we can stop as soon as we have everything.
+        if len(event) == len(OAC_LIST_KEYS) + 1:
+            return event
+
+        pos = _skip_whitespace(s, pos)
+        if s[pos] == "}":
+            return event
+        pos = _expect(s, pos, ",")
+
+def extract_oac_fields(s: str) -> dict[str, Any]:
+    """
+    A drop-in replacement for `json.loads` on an OAC Schema v1 document, for use
+    with `SneRecord.from_oac`.
+
+    Only the event's name and the first item of its `ra`, `dec`, `discoverdate` and
+    `claimedtype` lists are decoded. Everything else (e.g. the often huge `photometry`
+    and `spectra` lists) is stepped over without building any Python objects, so
+    `SneRecord.from_oac` gives exactly the same record for a fraction of the work.
+    """
+    try:
+        pos = _expect(s, _skip_whitespace(s, 0), "{")
+        if s[pos] == "}":
+            return {}
+        event_name, pos = _read_key(s, pos)
+        return {event_name: _extract_event(s, pos)}
+    except (ValueError, IndexError):
+        # The document isn't what we expected. Let the real parser deal with it,
+        # which also raises the usual errors if it's not valid json.
+        return json.loads(s)
@@ -1,11 +1,12 @@
 from __future__ import annotations # for postponed annotation evaluation
-from typing import Optional, Any, Iterator, Union
-from datetime import (datetime, timedelta)
+from typing import Optional, Any, Iterator, Tuple, Union
+from datetime import datetime
 from enum import Enum
 import csv
 import re
 
 from sneparse.coordinates import DecimalDegrees, DegreesMinutesSeconds, HoursMinutesSeconds
+from sneparse.dates import try_parse_date, parse_timestamp
 
 ra_units  = Optional[Union[float, DecimalDegrees, HoursMinutesSeconds]]
 dec_units = Optional[Union[float, DecimalDegrees, DegreesMinutesSeconds]]
@@ -41,6 +42,9 @@ class SneRecord():
     or the Transient Name Server).
 
     """
+    # Records are created by the hundreds of thousands, so avoid a per-instance `__dict__`.
+    __slots__ = ("name", "right_ascension", "declination", "discover_date", "claimed_type", "source")
+
     def __init__(self, name: str, ra: ra_units, dec: dec_units,
                  discover_date: Optional[datetime], claimed_type: Optional[str], source: Source) -> None:
         self.name = name
@@ -88,11 +92,26 @@ class SneRecord():
                 and self.source == other.source
 
     def __hash__(self) -> int:
-        return hash(repr(self))
+        return hash(self.key())
+
+    def key(self) -> Tuple[str, Optional[datetime], Optional[str], Source]:
+        """
+        A cheap identity key for the record. Coordinates are compared with a
+        tolerance in `__eq__`, so they are left out of the key. Otherwise two
+        records could be equal and still have different hashes.
+        """
+        return (self.name, self.discover_date, self.claimed_type, self.source)
+
+    def as_dict(self) -> dict[str, Any]:
+        """
+        The fields of the record, by name, in the order they are defined.
+        This is what `vars(self)` would be if the record had a `__dict__`.
+        """
+        return {k: getattr(self, k) for k in self.__slots__}
 
     def as_row(self) -> Iterator[str]:
         # TODO: rewrite this
-        return (("" if v is None else str(v)) if not isinstance(v, datetime) else v.strftime("%Y-%m-%d %H:%M:%S.%f") for _, v in vars(self).items())
+        return (("" if v is None else str(v)) if not isinstance(v, datetime) else v.strftime("%Y-%m-%d %H:%M:%S.%f") for v in self.as_dict().values())
 
     @classmethod
     def from_oac(cls, oac_record: dict[str, Any]) -> SneRecord:
@@ -188,7 +207,7 @@ class SneRecord():
             except KeyError:
                 discover_date = None
             else:
-                discover_date = datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S.%f")
+                discover_date = parse_timestamp(date_str)
 
             # Claimed type does not always exist
             claimed_type: Optional[str]
@@ -200,78 +219,3 @@ class SneRecord():
             source = Source.TNS
             records.append(SneRecord(name, ra, dec, discover_date, claimed_type, source))
         return records
-
-def try_parse_date(s: str) -> datetime:
-    """
-    Try to get a datetime value out of a string, `s`.
-    Note that OAC dates appear in multiple formats:
-    `yyyy/mm/dd` (with the possibility of fractional days),
-    `yyyy/mm`, or `yyyy`. This function will try to
-    each one until it successful parses a date, or it will
-    raise an exception.
-    """
-    # Some dates may be before 1000 AD. We need to pad them
-    # with zeros on the left so that they are 4-digits and
-    # parsable by datetime.
-    #
-    # But wait! There's at least one record--
-    # and by at least one I mean exactly one ('SN1667A'
-    # from the pre-1990 datatest) as far as I can tell--
-    # where the date is stored as mm/dd/yyyy. Great.
-    #
-    # How can we even distinguish between yyyy/mm/dd and
-    # mm/dd/yyyy then? Well, we can't--if the year is before
-    # 32 AD. Otherwise, we can check if the first value is
-    # greater than 31 and figure out the format from there.
-    #
-    # Hopefully there are no supernovae between 0 and 31 AD
-    # recorded in the OAC catalog.
-    #
-    # Oh, and this of course means any dd/mm/yyyy style
-    # dates with dd <= 12 are completely ambiguous with
-    # the mm/dd/yyyy dates. Are there any such dates
-    # in the OAC catalog? It's literally impossible to know
-    # without reference another catalog.
-    #
-    # And by the way, we ignore the possibility of fractional
-    # days for the few mm/dd/yyyy dates. It doesn't look
-    # like there are any in the OAC catalog.
-    #
-    # Why can't everyone just agree on one format...
-    split = s.split("/")
-    if int(split[0]) > 31:
-        split[0] = split[0].zfill(4)
-    else:
-        split[2] = split[2].zfill(4)
-
-    # Now we need to handle dates with fractional days,
-    # like '2022/11/11.52435'.
-    dt = timedelta(0)
-    try:
-        # Try to split the string assuming it is yyyy/mm/dd.
-        # This will fail if that's not the case, but that just
-        # means we don't have to handle fractional days (since
-        # no day is even reported).
-        year, month, day = split
-
-        # Get the fractional part of the day and turn it into a time span.
-        # This will stay zero if the day is an integer. This time span
-        # will be later added back to the datetime.
-        dt = timedelta(days=float(day) % 1)
-
-        # Recast the string to exclude the fractional part of the day.
-        # TODO: there has to be a prettier way than str(int(float(...)))
-        base = int(float(day))
-        s = "/".join((year, month, str(base)))
-    except ValueError:
-        pass
-
-    # Try each possible format.
-    # Note that mm/dd/yyyy is tried last, to account for the
-    # schema-noncompliant date(s) (I'm looking at you, 'SN1667A').
-    for fmt in ("%Y/%m/%d", "%Y/%m", "%Y", "%m/%d/%Y"):
-        try:
-            return datetime.strptime(s, fmt) + dt
-        except ValueError:
-            pass
-    raise Exception(f"Unable to parse date '{s}'")
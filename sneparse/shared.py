@@ -0,0 +1,67 @@
+from typing import Any, Tuple
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+# Each column starts at a multiple of this many bytes into its segment.
+COLUMN_ALIGNMENT = 64
+
+def _align(n: int) -> int:
+    return -(-n // COLUMN_ALIGNMENT) * COLUMN_ALIGNMENT
+
+def write_columns(name: str, columns: dict[str, np.ndarray]) -> dict[str, dict[str, Any]]:
+    """
+    Copy some 1-d `columns` into a new shared memory segment called `name`. Returns the
+    layout of the columns in the segment, which `read_columns` needs to find them.
+
+    The segment is left for the process that reads it to unlink. It's unregistered
+    from this process's resource tracker, so it isn't "cleaned up" when this
+    process exits.
+    """
+    layout: dict[str, dict[str, Any]] = {}
+    size = 0
+    for column_name, column in columns.items():
+        layout[column_name] = { "dtype": column.dtype.str, "offset": size, "length": len(column) }
+        size = _align(size + column.nbytes)
+
+    # Segments can't be empty.
+    try:
+        shm = SharedMemory(name, create=True, size=max(size, 1))
+    except FileExistsError:
+        # Names are never reused while their segments are in use, so this one was left
+        # behind by a process that was killed. It's safe to replace.
+        unlink(name)
+        shm = SharedMemory(name, create=True, size=max(size, 1))
+    try:
+        resource_tracker.unregister(shm._name, "shared_memory") # type: ignore
+        for column_name, column in columns.items():
+            view = np.ndarray(len(column), column.dtype, shm.buf, layout[column_name]["offset"])
+            view[:] = column
+            del view
+    finally:
+        shm.close()
+
+    return layout
+
+def read_columns(name: str, layout: dict[str, dict[str, Any]]) -> Tuple[SharedMemory, dict[str, np.ndarray]]:
+    """
+    Map the columns written by `write_columns` to the segment called `name`, without
+    copying them. The columns are only valid until the returned segment is closed.
+    """
+    shm = SharedMemory(name)
+    return (shm, {
+        column_name: np.ndarray(column["length"], np.dtype(column["dtype"]), shm.buf, column["offset"])
+            for column_name, column in layout.items()
+    })
+
+def unlink(name: str) -> None:
+    """
+    Remove the segment called `name`, if it exists.
+    """
+    try:
+        shm = SharedMemory(name)
+    except FileNotFoundError:
+        return
+    shm.close()
+    shm.unlink()
@@ -0,0 +1,500 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from datetime import datetime
+import subprocess
+import os
+import tarfile
+import zipfile
+import unittest
+import pickle
+import json
+
+import numpy as np
+
+from sneparse.catalog import Catalog, SharedSegments, BATCH_BYTES, _batched, _parse_dir_oac_worker
+from sneparse import shared
+from sneparse import cache as cache_module
+from sneparse.cache import ParseCache
+from sneparse.diagnostics import Detail
+from sneparse.frame import CatalogFrame
+from sneparse.record import SneRecord, Source
+from sneparse.coordinates import DegreesMinutesSeconds, HoursMinutesSeconds, DecimalDegrees, angular_separation
+from sneparse.db.util import paramterize
+from sneparse.util import unwrap
+
+TNS_HEADER = "\t".join(("ID", "Name", "RA", "DEC", "Obj. Type", "Discovery Date (UT)"))
+
+def oac_document(name: str, ra: str, dec: str, date: str, claimed_type: str) -> dict:
+    return {
+        name: {
+            "name": name,
+            "ra": [{ "value": ra, "u_value": "hours" }],
+            "dec": [{ "value": dec, "u_value": "degrees" }],
+            "discoverdate": [{ "value": date }],
+            "claimedtype": [{ "value": claimed_type }],
+        }
+    }
+
+def make_data_dirs(root: Path, count: int) -> tuple[Path, Path]:
+    """
+    Write `count` OAC json files and one TNS tsv file with `count` rows under `root`.
+    """
+    oac_dir = root.joinpath("oac-data", "sne-2020-2024")
+    oac_dir.mkdir(parents=True)
+    tns_dir = root.joinpath("tns-data")
+    tns_dir.mkdir()
+
+    rows = [TNS_HEADER]
+    for i in range(count):
+        with open(oac_dir.joinpath(f"SN2020a{i}.json"), "w") as f:
+            json.dump(oac_document(f"SN2020a{i}", f"00:54:{i % 60:02}.189", "-51:30:39.47",
+                                   "2020/01/15", "Candidate"), f)
+        rows.append("\t".join((str(i), f"2021b{i}", f"12:03:{i % 60:02}.5", "+12:03:23.5",
+                               "" if i % 2 else "SN Ia", "2021-03-04 05:06:07.890")))
+
+    with open(tns_dir.joinpath("TNSc_2021_03.tsv"), "w") as f:
+        f.write("\n".join(rows) + "\n")
+
+    return oac_dir, tns_dir
+
+def crash(_):
+    os._exit(1)
+
+class CatalogParsingTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.oac_dir, self.tns_dir = make_data_dirs(self.root, 50)
+        self.catalog = Catalog(str(self.root.joinpath("log.txt")))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_iter_dir(self):
+        records = list(self.catalog.iter_dir(self.oac_dir, Source.OAC, 2, max_pending=1))
+        self.assertEqual(len(records), 50)
+        self.assertEqual(len(self.catalog.records), 0)
+        self.assertIn(SneRecord("SN2020a7",
+                                HoursMinutesSeconds.from_str("00:54:07.189"),
+                                DegreesMinutesSeconds.from_str("-51:30:39.47"),
+                                datetime(2020, 1, 15),
+                                "Candidate",
+                                Source.OAC), records)
+
+        records = list(self.catalog.iter_dir(self.tns_dir, Source.TNS, 2))
+        self.assertEqual(len(records), 50)
+        self.assertEqual(sum(1 for r in records if r.claimed_type is None), 25)
+
+    def test_iter_dir_early_exit(self):
+        records = self.catalog.iter_dir(self.oac_dir, Source.OAC, 2, max_pending=1)
+        self.assertIsInstance(next(records), SneRecord)
+        records.close()
+
+    def test_parse_dir(self):
+        self.catalog.parse_dir(self.oac_dir, Source.OAC, 2)
+        self.catalog.parse_dir(self.tns_dir, Source.TNS, 2)
+        self.assertEqual(len(self.catalog.records), 100)
+
+    def test_parse_dir_shared_memory(self):
+        self.catalog.parse_dir(self.oac_dir, Source.OAC, 2, shared_memory=True)
+        self.catalog.parse_dir(self.tns_dir, Source.TNS, 2, shared_memory=True)
+
+        expected = Catalog(str(self.root.joinpath("log.txt")))
+        expected.parse_dir(self.oac_dir, Source.OAC, 2)
+        expected.parse_dir(self.tns_dir, Source.TNS, 2)
+        self.assertEqual(sorted(self.catalog.records, key=str), sorted(expected.records, key=str))
+        self.assertEqual(list(Path("/dev/shm").glob(f"sneparse_{os.getpid()}_*")), [])
+
+        # Segments are cleaned up when parsing fails, too.
+        with open(self.oac_dir.joinpath("broken.json"), "w") as f:
+            f.write("{")
+        with self.assertRaises(json.JSONDecodeError):
+            self.catalog.parse_dir(self.oac_dir, Source.OAC, 2, shared_memory=True)
+        self.assertEqual(list(Path("/dev/shm").glob(f"sneparse_{os.getpid()}_*")), [])
+
+    def test_worker_crash(self):
+        # A worker dying mid-batch fails the parse, instead of leaving it waiting forever.
+        tasks = [((crash, None), 0)]
+        with SharedSegments() as segments:
+            with self.assertRaisesRegex(Exception, "worker process died"):
+                list(self.catalog._iter_chunks("crash", tasks, 2, segments=segments))
+        self.assertEqual(list(Path("/dev/shm").glob(f"sneparse_{os.getpid()}_*")), [])
+
+        # A long-lived pool is replaced.
+        with Catalog(str(self.root.joinpath("log.txt"))) as c:
+            c.parse_dir(self.tns_dir, Source.TNS, 2)
+            with self.assertRaisesRegex(Exception, "worker process died"):
+                list(c._iter_chunks("crash", tasks, 2))
+            self.assertIsNone(c._pool)
+            c.parse_dir(self.tns_dir, Source.TNS, 2, shared_memory=True)
+            self.assertEqual(len(c.records), 100)
+
+    def test_worker_crash_after_early_exit(self):
+        # The consumer stops after the first chunk, while the batch of a worker that
+        # dies is still out. Waiting for it would never end, so the pool is replaced.
+        tasks = [((_parse_dir_oac_worker, self.oac_dir.joinpath("SN2020a0.json")), BATCH_BYTES),
+                 ((crash, None), BATCH_BYTES)]
+        with Catalog(str(self.root.joinpath("log.txt"))) as c:
+            chunks = c._iter_chunks("crash", tasks, 2)
+            self.assertEqual(len(next(chunks)), 1)
+            chunks.close()
+            self.assertIsNone(c._pool)
+            c.parse_dir(self.tns_dir, Source.TNS, 2)
+            self.assertEqual(len(c.records), 50)
+
+    def test_stale_segment(self):
+        # A segment left behind with the same name is replaced.
+        with SharedSegments() as segments:
+            name = segments.new_name()
+            shared.write_columns(name, { "x": np.arange(3) })
+            layout = shared.write_columns(name, { "x": np.arange(5) })
+            shm, columns = shared.read_columns(name, layout)
+            self.assertEqual(list(columns["x"]), [0, 1, 2, 3, 4])
+            del columns
+            shm.close()
+        self.assertEqual(list(Path("/dev/shm").glob(f"sneparse_{os.getpid()}_*")), [])
+
+    def test_persistent_pool(self):
+        with Catalog(str(self.root.joinpath("log.txt"))) as c:
+            records = c.iter_dir(self.oac_dir, Source.OAC, 2, max_pending=1)
+            self.assertIsInstance(next(records), SneRecord)
+            records.close()
+            pool = c._pool
+            self.assertIsNotNone(pool)
+
+            # Both inputs go through the same pool, which outlives each call.
+            c.parse_dirs([(self.oac_dir, Source.OAC), (self.tns_dir, Source.TNS)], 2)
+            self.assertIs(c._pool, pool)
+            c.parse_dir(self.tns_dir, Source.TNS, 2, shared_memory=True)
+            self.assertIs(c._pool, pool)
+            self.assertEqual(len(c.records), 150)
+        self.assertIsNone(c._pool)
+
+    def test_iter_dir_chunks(self):
+        chunks = list(self.catalog.iter_dir_chunks(self.tns_dir, Source.TNS, 2))
+        self.assertEqual(len(chunks), 1)
+        self.assertEqual(chunks[0].paths, [self.tns_dir.joinpath("TNSc_2021_03.tsv")])
+        # Every other TNS row is missing its claimed type.
+        self.assertEqual(list(chunks[0].warnings[:4]), [0, 8, 0, 8])
+
+        chunks = list(self.catalog.iter_dir_chunks(self.oac_dir, Source.OAC, 2))
+        self.assertEqual(sum(len(chunk) for chunk in chunks), 50)
+        for chunk in chunks:
+            for path, frame in chunk.split():
+                self.assertEqual(frame.to_records()[0].name, path.stem)
+
+    def test_largest_first(self):
+        # The TNS file is far larger than any OAC file, so it goes out first.
+        inputs = [(self.oac_dir, Source.OAC), (self.tns_dir, Source.TNS)]
+        chunks = list(self.catalog.iter_dirs_chunks(inputs, 1))
+        self.assertEqual(chunks[0].paths[0], self.tns_dir.joinpath("TNSc_2021_03.tsv"))
+
+        stats = self.catalog.worker_stats
+        self.assertEqual(len(stats), 1)
+        self.assertEqual(stats[0].files, 51)
+        self.assertEqual(stats[0].batches, len(chunks))
+        self.assertGreater(stats[0].busy, 0)
+
+    def test_diagnostics(self):
+        c = Catalog(str(self.root.joinpath("log.txt")), Detail.FULL)
+        c.parse_dirs([(self.oac_dir, Source.OAC), (self.tns_dir, Source.TNS)], 2)
+
+        diagnostics = unwrap(c.diagnostics)
+        with open(diagnostics.summary_path) as f:
+            summary = json.load(f)[diagnostics.run]
+        self.assertEqual(summary["records"], 100)
+        self.assertEqual(summary["incomplete"], 25)
+        self.assertEqual(summary["by_source"], { "TNS": { "claimed_type": 25 } })
+        self.assertEqual(summary["by_file"], { str(self.tns_dir.joinpath("TNSc_2021_03.tsv")): { "claimed_type": 25 } })
+
+        with open(diagnostics.detail_path) as f:
+            lines = f.readlines()
+        self.assertEqual(len(lines), 26)
+        self.assertIn(f"Parsing {self.oac_dir}, {self.tns_dir}", lines[0])
+        self.assertIn("'2021b1' is missing claimed_type", lines[1])
+
+        # Later parses of the same catalog add to the diagnostics.
+        first = diagnostics.run
+        c.parse_dir(self.tns_dir, Source.TNS, 2)
+        with open(diagnostics.summary_path) as f:
+            summaries = json.load(f)
+        self.assertEqual(list(summaries), [first, unwrap(c.diagnostics).run])
+        self.assertEqual([s["incomplete"] for s in summaries.values()], [25, 25])
+        with open(diagnostics.detail_path) as f:
+            self.assertEqual(len(f.readlines()), 52)
+
+        # A new catalog with the same log starts over, like the log itself. A summary
+        # that can't be read doesn't fail the parse.
+        other = Catalog(str(self.root.joinpath("log.txt")), Detail.FULL)
+        self.assertFalse(diagnostics.summary_path.exists())
+        self.assertFalse(diagnostics.detail_path.exists())
+        diagnostics.summary_path.write_text("{ truncated")
+        other.parse_dir(self.tns_dir, Source.TNS, 2)
+        with open(diagnostics.summary_path) as f:
+            self.assertEqual(list(json.load(f)), [unwrap(other.diagnostics).run])
+
+    def test_batched(self):
+        tasks = [(i, size) for i, size in enumerate([5, 1, 1, 1, 1, 1, 8, 1])]
+        self.assertEqual(list(_batched(tasks, 3, 6)), [[0, 1], [2, 3, 4], [5, 6], [7]])
+
+    def test_parse_cache(self):
+        cache_path = self.root.joinpath("cache", "parse_cache.sqlite")
+        uncached = list(self.catalog.iter_dir(self.oac_dir, Source.OAC, 2))
+
+        with ParseCache(cache_path) as cache:
+            self.assertEqual(sorted(self.catalog.iter_dir(self.oac_dir, Source.OAC, 2, cache=cache), key=str),
+                             sorted(uncached, key=str))
+            self.assertEqual((cache.hits, len(cache)), (0, 50))
+
+        # Change one file. Only that file should be parsed again.
+        changed = self.oac_dir.joinpath("SN2020a3.json")
+        with open(changed, "w") as f:
+            json.dump(oac_document("SN2020a3", "01:00:00.0", "+10:00:00.0", "2020/02/01", "Ia"), f)
+
+        with ParseCache(cache_path) as cache:
+            records = list(self.catalog.iter_dir(self.oac_dir, Source.OAC, 2, cache=cache))
+            self.assertEqual((cache.hits, len(cache)), (49, 50))
+            self.assertEqual(len(records), 50)
+            self.assertIn("Ia", [r.claimed_type for r in records])
+
+        # Cached records are thrown away when the cache version changes.
+        version = cache_module.CACHE_VERSION
+        cache_module.CACHE_VERSION = version + 1
+        try:
+            with ParseCache(cache_path) as cache:
+                self.assertEqual(len(cache), 0)
+        finally:
+            cache_module.CACHE_VERSION = version
+
+class ArchiveParsingTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.oac_dir, self.tns_dir = make_data_dirs(self.root, 20)
+        self.catalog = Catalog(str(self.root.joinpath("log.txt")))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def check_archive(self, archive_path: Path, source_dir: Path, source: Source):
+        records = sorted(self.catalog.iter_dir(archive_path, source, 2), key=str)
+        self.assertEqual(records, sorted(self.catalog.iter_dir(source_dir, source, 2), key=str))
+        self.assertEqual(len(records), 20)
+
+    def test_tar(self):
+        for suffix, mode in ((".tar", "w"), (".tar.gz", "w:gz")):
+            for source_dir, source in ((self.oac_dir, Source.OAC), (self.tns_dir, Source.TNS)):
+                archive_path = self.root.joinpath(f"{source.value}{suffix}")
+                with tarfile.open(archive_path, mode) as tar:
+                    tar.add(source_dir, arcname=source_dir.name)
+                self.check_archive(archive_path, source_dir, source)
+
+    def test_archive_with_cache(self):
+        archive_path = self.root.joinpath("oac.tar.gz")
+        with tarfile.open(archive_path, "w:gz") as tar:
+            tar.add(self.oac_dir, arcname=self.oac_dir.name)
+
+        # Archives are parsed, but not cached, alongside directories that are.
+        inputs = [(archive_path, Source.OAC), (self.tns_dir, Source.TNS)]
+        with ParseCache(self.root.joinpath("parse_cache.sqlite")) as cache:
+            records = list(self.catalog.iter_dirs(inputs, 2, cache=cache))
+            self.assertEqual(len(records), 40)
+            self.assertEqual(len(cache), 1)
+
+        with ParseCache(self.root.joinpath("parse_cache.sqlite")) as cache:
+            self.assertEqual(sorted(self.catalog.iter_dirs(inputs, 2, cache=cache), key=str), sorted(records, key=str))
+            self.assertEqual(cache.hits, 1)
+
+    def test_zip(self):
+        for source_dir, source in ((self.oac_dir, Source.OAC), (self.tns_dir, Source.TNS)):
+            archive_path = self.root.joinpath(f"{source.value}.zip")
+            with zipfile.ZipFile(archive_path, "w") as z:
+                for path in source_dir.iterdir():
+                    z.write(path, f"{source_dir.name}/{path.name}")
+            self.check_archive(archive_path, source_dir, source)
+
+def git(repo: Path, *args: str) -> str:
+    return subprocess.run(["git", "-C", str(repo), "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+                          stdout=subprocess.PIPE, check=True, text=True).stdout.strip()
+
+class GitParsingTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.oac_dir, _ = make_data_dirs(self.root, 30)
+        self.catalog = Catalog(str(self.root.joinpath("log.txt")))
+
+        git(self.oac_dir, "init", "-q")
+        git(self.oac_dir, "add", ".")
+        git(self.oac_dir, "commit", "-q", "-m", "first")
+        self.first = git(self.oac_dir, "rev-parse", "HEAD")
+
+        # Modify one event, add one and delete one.
+        with open(self.oac_dir.joinpath("SN2020a1.json"), "w") as f:
+            json.dump(oac_document("SN2020a1", "01:00:00.0", "+10:00:00.0", "2020/02/01", "Ia"), f)
+        with open(self.oac_dir.joinpath("SN2020z.json"), "w") as f:
+            json.dump(oac_document("SN2020z", "02:00:00.0", "+20:00:00.0", "2020/03/01", "II"), f)
+        git(self.oac_dir, "rm", "-q", "SN2020a2.json")
+        git(self.oac_dir, "add", ".")
+        git(self.oac_dir, "commit", "-q", "-m", "second")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_iter_git(self):
+        # Records at the first commit, which is no longer checked out.
+        records = list(self.catalog.iter_git(self.oac_dir, self.first, num_processes=2))
+        self.assertEqual(sorted(r.name for r in records), sorted(f"SN2020a{i}" for i in range(30)))
+        self.assertIn(SneRecord("SN2020a7",
+                                HoursMinutesSeconds.from_str("00:54:07.189"),
+                                DegreesMinutesSeconds.from_str("-51:30:39.47"),
+                                datetime(2020, 1, 15),
+                                "Candidate",
+                                Source.OAC), records)
+
+        # Records at HEAD match those in the working tree.
+        self.catalog.parse_git(self.oac_dir, num_processes=2)
+        self.assertEqual(sorted(self.catalog.records, key=str),
+                         sorted(self.catalog.iter_dir(self.oac_dir, Source.OAC, 2), key=str))
+
+    def test_iter_git_since(self):
+        records = list(self.catalog.iter_git(self.oac_dir, since=self.first, num_processes=2))
+        self.assertEqual(sorted(r.name for r in records), ["SN2020a1", "SN2020z"])
+        self.assertEqual(sorted(r.claimed_type for r in records), ["II", "Ia"])
+
+    def test_iter_gits(self):
+        other = self.root.joinpath("other")
+        other.mkdir()
+        with open(other.joinpath("SN2019q.json"), "w") as f:
+            json.dump(oac_document("SN2019q", "03:00:00.0", "+30:00:00.0", "2019/03/01", "Ia"), f)
+        git(other, "init", "-q")
+        git(other, "add", ".")
+        git(other, "commit", "-q", "-m", "first")
+
+        # Both repositories are parsed in a single run.
+        records = list(self.catalog.iter_gits([self.oac_dir, other], num_processes=2))
+        self.assertEqual(len(records), 31)
+        self.assertIn("SN2019q", [r.name for r in records])
+        with open(self.catalog.log_file_path) as f:
+            self.assertEqual(sum("Parsing" in line for line in f), 1)
+
+def sample_records() -> list[SneRecord]:
+    return [
+        SneRecord("SN2020a", 10.0, -20.0, datetime(2020, 1, 15, 12, 30, 0, 123456), "Ia", Source.OAC),
+        SneRecord("2020b", 10.0001, -20.0001, datetime(2020, 1, 15), None, Source.TNS),
+        SneRecord("SN1667A", None, 5.5, datetime(1667, 1, 1), "Ia", Source.OAC),
+        SneRecord("SN2021c", 300.5, None, None, "II", Source.OAC),
+        SneRecord("2021d", 359.99999, 89.9, None, "", Source.TNS),
+        SneRecord("2021e", 0.00001, 89.9, None, "II", Source.TNS),
+    ]
+
+class CatalogFrameTests(unittest.TestCase):
+    def test_round_trip(self):
+        records = sample_records()
+        frame = CatalogFrame.from_records(records)
+        self.assertEqual(len(frame), len(records))
+        self.assertEqual(frame.to_records(), records)
+        self.assertEqual(list(frame.claimed_types), ["Ia", "II", ""])
+
+    def test_concat_and_take(self):
+        records = sample_records()
+        frames = [CatalogFrame.from_records(records[:2]),
+                  pickle.loads(pickle.dumps(CatalogFrame.from_records(records[2:]))),
+                  CatalogFrame.empty()]
+        frame = CatalogFrame.concat(frames)
+        self.assertEqual(frame.to_records(), records)
+        self.assertEqual(frame.take(slice(1, 3)).to_records(), records[1:3])
+        self.assertEqual(frame.take(np.array([4, 0])).to_records(), [records[4], records[0]])
+
+    def test_rows_and_params(self):
+        records = sample_records()
+        frame = CatalogFrame.from_records(records)
+        self.assertEqual([list(row) for row in frame.as_rows()], [list(r.as_row()) for r in records])
+        self.assertEqual(list(frame.params()), [paramterize(r) for r in records])
+
+    def test_find_close_pairs(self):
+        records = sample_records()
+        threshold = DecimalDegrees(0.001)
+
+        expected = set()
+        for i, u in enumerate(records):
+            for j, v in enumerate(records[i + 1:], start=i + 1):
+                if any(x is None for x in (u.right_ascension, u.declination, v.right_ascension, v.declination)):
+                    continue
+                if angular_separation(u.right_ascension, u.declination,
+                                      v.right_ascension, v.declination).degrees <= threshold.degrees:
+                    expected.add((i, j))
+
+        pairs = CatalogFrame.from_records(records).find_close_pairs(threshold)
+        self.assertEqual({(min(i, j), max(i, j)) for i, j in pairs}, expected)
+        self.assertEqual(len(expected), 2)
+
+    def test_close_pairs(self):
+        rng = np.random.default_rng(0)
+        records = [SneRecord(f"SN{i}", DecimalDegrees(ra), DecimalDegrees(dec), None, None, Source.OAC)
+                       for i, (ra, dec) in enumerate(zip(rng.uniform(10, 10.1, 300), rng.uniform(-5, -4.9, 300)))]
+        frame = CatalogFrame.from_records(records)
+        threshold = DecimalDegrees(0.01)
+
+        pairs, separations = frame.close_pairs(threshold)
+        self.assertGreater(len(pairs), 0)
+        for (i, j), separation in zip(pairs, separations):
+            u, v = records[i], records[j]
+            self.assertAlmostEqual(separation, angular_separation(u.right_ascension, u.declination,
+                                                                  v.right_ascension, v.declination).degrees)
+
+        def as_dict(pairs, separations):
+            return { (min(i, j), max(i, j)): s for (i, j), s in zip(pairs.tolist(), separations) }
+
+        expected = as_dict(pairs, separations)
+        blocks = list(frame.iter_close_pairs(threshold, block_size=64))
+        self.assertEqual(len(blocks), 5)
+        found = as_dict(np.concatenate([p for p, _ in blocks]), np.concatenate([s for _, s in blocks]))
+        self.assertEqual(found.keys(), expected.keys())
+        self.assertEqual(sum(len(p) for p, _ in blocks), len(pairs))
+
+        capped, _ = frame.close_pairs(threshold, max_pairs=len(pairs))
+        self.assertEqual(len(capped), len(pairs))
+        with self.assertRaises(Exception):
+            frame.close_pairs(threshold, max_pairs=len(pairs) - 1)
+
+class SnapshotTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip(self):
+        records = sample_records() + [SneRecord("SN2022ü", 1.0, 2.0, None, None, Source.OAC)]
+        c = Catalog(str(self.root.joinpath("log.txt")))
+        c.records = list(records)
+        c.save_snapshot(self.root.joinpath("sne.snapshot"))
+
+        loaded = Catalog.load_snapshot(self.root.joinpath("sne.snapshot"), str(self.root.joinpath("log.txt")))
+        frame = loaded.to_frame()
+        self.assertEqual([frame[i] for i in range(len(frame))], records)
+        self.assertEqual(sorted(loaded.find_close_pairs(DecimalDegrees(0.001)), key=str),
+                         sorted(c.find_close_pairs(DecimalDegrees(0.001)), key=str))
+
+        # Records are created on first access, after which the catalog can be modified.
+        self.assertEqual(loaded.records, records)
+        loaded.records.append(records[0])
+        self.assertEqual(len(loaded.to_frame()), len(records) + 1)
+
+    def test_empty(self):
+        c = Catalog(str(self.root.joinpath("log.txt")))
+        c.save_snapshot(self.root.joinpath("empty.snapshot"))
+        self.assertEqual(Catalog.load_snapshot(self.root.joinpath("empty.snapshot"),
+                                               str(self.root.joinpath("log.txt"))).records, [])
+
+    def test_not_a_snapshot(self):
+        path = self.root.joinpath("sne.csv")
+        with open(path, "w") as f:
+            f.write("name,ra,dec,discovery_date,claimed_type,source\n")
+        with self.assertRaises(Exception):
+            CatalogFrame.load(path)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,6 +3,7 @@ from pathlib import Path
 import pickle
 import unittest
 
+import numpy as np
 from tqdm import tqdm
 from astropy.coordinates import Angle
 
@@ -162,6 +163,35 @@ class BulkParsingTests(unittest.TestCase):
                 self.assertAlmostEqual(DecimalDegrees.from_dms(DegreesMinutesSeconds.from_str(dec)).degrees,
                                        Angle(f"{dec} d").degree)
 
+class ArrayParsingTests(unittest.TestCase):
+    VALUES = ["+12:03:23.5", "-00:10:59.7", "12:03:23.5", "12:023.5", "023.5", "-12.25", "+7",
+              "400.5", "-725", "12:03:23.", "12:03:.5", "12.5:03:23.5", "?12:03:23.5",
+              "-12.1:3?:23.5", "12:03:23.5.", "", " 12", "1e1", "nan", "+-12", "1:2:3:4"]
+
+    def check(self, parse, scalar):
+        degrees, valid = parse(self.VALUES)
+        for value, d, v in zip(self.VALUES, degrees, valid):
+            with self.subTest(value=value):
+                try:
+                    expected = scalar(value)
+                except Exception:
+                    self.assertFalse(v)
+                    self.assertTrue(np.isnan(d))
+                else:
+                    self.assertTrue(v)
+                    self.assertLess(abs(d - expected), FLOAT_EPSILON)
+
+    def test_parse_ra_array(self):
+        self.check(parse_ra_array, lambda s: DecimalDegrees.from_hms(HoursMinutesSeconds.from_str(s)).degrees)
+
+    def test_parse_dec_array(self):
+        self.check(parse_dec_array, lambda s: DecimalDegrees.from_dms(DegreesMinutesSeconds.from_str(s)).degrees)
+
+    def test_empty(self):
+        degrees, valid = parse_ra_array([])
+        self.assertEqual(len(degrees), 0)
+        self.assertEqual(len(valid), 0)
+
 class DistanceTests(unittest.TestCase):
     def test_angular_separation(self):
         self.assertEqual(angular_separation(DecimalDegrees(11.88804),
@@ -194,6 +224,38 @@ class DistanceTests(unittest.TestCase):
                                             DecimalDegrees(0.0)),
                          DecimalDegrees(0.0))
 
+    def test_angular_separations(self):
+        from astropy.coordinates import angular_separation as astropy_separation
+
+        rng = np.random.default_rng(0)
+        ra1, dec1 = rng.uniform(0, 360, 1000), rng.uniform(-90, 90, 1000)
+        ra2, dec2 = rng.uniform(0, 360, 1000), rng.uniform(-90, 90, 1000)
+        expected = np.degrees(astropy_separation(*np.radians((ra1, dec1, ra2, dec2))))
+        self.assertTrue(np.allclose(angular_separations(ra1, dec1, ra2, dec2), expected, rtol=0, atol=1e-10))
+
+        # A hundredth of an arcsecond apart, where the law of cosines is off by a lot.
+        tiny = 0.01 / 3600
+        separations = angular_separations(ra1, dec1, ra1, dec1 + np.where(dec1 > 0, -tiny, tiny))
+        self.assertTrue(np.allclose(separations, tiny, rtol=1e-6, atol=0))
+
+        # Scalars broadcast against arrays.
+        self.assertEqual(angular_separations(0.0, 0.0, np.array([0.0, 20.0]), 0.0).tolist(), [0.0, 20.0])
+
+    def test_pairwise_separations(self):
+        rng = np.random.default_rng(0)
+        ra, dec = rng.uniform(0, 360, 50), rng.uniform(-90, 90, 50)
+        expected = angular_separations(ra[:, np.newaxis], dec[:, np.newaxis], ra, dec)
+
+        blocks = list(iter_pairwise_separations(ra, dec, ra, dec, block_size=200))
+        self.assertEqual([start for start, _ in blocks], list(range(0, 50, 4)))
+        self.assertTrue(all(block.size <= 200 for _, block in blocks))
+        self.assertTrue(np.array_equal(np.concatenate([block for _, block in blocks]), expected))
+        self.assertTrue(np.array_equal(pairwise_separations(ra, dec, block_size=200), expected))
+
+        p, q = to_cartesian(ra, dec), to_cartesian(dec, ra)
+        self.assertTrue(np.allclose(angles_between(p, q), angular_separations(ra, dec, dec, ra)))
+        self.assertTrue(np.allclose(dist_sqrs(p, q), angular_separations_to_distances(angles_between(p, q)) ** 2))
+
     def test_dist_sqr(self):
         p = Cartesian(0.0, 0.0, 0.0)
         q = Cartesian(0.0, 0.0, 0.0)
@@ -224,5 +286,54 @@ class DistanceTests(unittest.TestCase):
         q = Cartesian(-5.0, -9.0, 4.0)
         self.assertAlmostEqual(angle_between(p, q).degrees, 150.189, places=3)
 
+class SkyIndexTests(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        n = 5000
+        self.ra = rng.uniform(0, 360, n)
+        self.dec = np.degrees(np.arcsin(rng.uniform(-1, 1, n)))
+        # Crowd some positions around RA 0 (where right ascension wraps) and the north pole.
+        self.ra[:300] = rng.uniform(-0.5, 0.5, 300) % 360
+        self.dec[:300] = rng.uniform(-2, 2, 300)
+        self.dec[300:400] = rng.uniform(89.7, 90, 100)
+        self.ra[400] = np.nan
+        self.points = to_cartesian(self.ra, self.dec)
+        self.index = SkyIndex(self.ra, self.dec)
+        self.radius = DecimalDegrees(0.2)
+
+    def within(self, point):
+        distances = np.linalg.norm(self.points - point, axis=1)
+        return set(np.flatnonzero(distances <= angular_separation_to_distance(self.radius)).tolist())
+
+    def test_sky_cells(self):
+        cells = sky_cells(np.array([10.0, 10.01, 350.0, 10.0, np.nan]), np.array([0.01, 0.01, 0.01, 0.2, 0.0]))
+        self.assertEqual(cells[0], cells[1])
+        self.assertLess(cells[0], cells[2])
+        self.assertLess(cells[2], cells[3])
+        self.assertEqual(cells[4], -1)
+
+        # Indexed positions are in cell order.
+        self.assertTrue(np.all(np.diff(self.index.cells()) >= 0))
+
+    def test_cone(self):
+        for i in [0, 150, 299, 300, 350, 1000, 2500, 4999]:
+            with self.subTest(i=i):
+                found = self.index.cone(DecimalDegrees(self.ra[i]), DecimalDegrees(self.dec[i]), self.radius)
+                self.assertEqual(found.tolist(), sorted(self.within(self.points[i])))
+
+    def test_join(self):
+        rng = np.random.default_rng(1)
+        ra = rng.uniform(-1, 1, 500) % 360
+        dec = np.concatenate((rng.uniform(-2, 2, 400), rng.uniform(89.8, 90, 100)))
+        i, j, separations = self.index.join(SkyIndex(ra, dec), self.radius)
+
+        other = to_cartesian(ra, dec)
+        expected = { (a, b) for b in range(len(ra)) for a in self.within(other[b]) }
+        self.assertEqual(set(zip(i.tolist(), j.tolist())), expected)
+        self.assertEqual(len(i), len(expected))
+        for a, b, separation in list(zip(i, j, separations))[:50]:
+            self.assertAlmostEqual(separation, angular_separation(DecimalDegrees(self.ra[a]), DecimalDegrees(self.dec[a]),
+                                                                  DecimalDegrees(ra[b]), DecimalDegrees(dec[b])).degrees)
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,155 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import csv
+import io
+import unittest
+
+import numpy as np
+
+from sneparse.coordinates import DecimalDegrees
+from sneparse.crossmatch import (read_table, cross_match, cross_match_radii, cross_match_partitioned,
+                                 cross_match_best, save_best_matches, load_best_matches, match_separations,
+                                 _bands)
+
+CATALOG = """id,name,right_ascension,declination,discover_date,claimed_type,source
+1,SN2019a,150.0,2.0,2019-05-06 00:00:00,SN Ia,TNS
+2,SN2019b,150.001,2.0,2019-06-01 12:30:00.5,,OAC
+3,SN2021c,150.0,2.0,2021-01-01 00:00:00,SN II,TNS
+4,SN2018d,359.9995,-10.0,2018-01-01 00:00:00,,OAC
+5,SN2018e,20.0,20.0,,,OAC
+"""
+
+COMPONENTS = """id,file_name,ra,decl,total_flux
+10,VLASS1.1.ql.T01.fits,150.0004,2.0,1.50
+11,VLASS2.1.ql.T01.fits,150.0004,2.0,2.00
+12,VLASS1.2.ql.T02.fits,0.0003,-10.0,3.25
+13,VLASS1.1.ql.T03.fits,20.0,20.0,4.00
+14,VLASS1.1.ql.T01.fits,150.01,2.0,5.00
+"""
+
+class CrossMatchTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        root = Path(self.tmp.name)
+        self.catalog_path = root.joinpath("catalog.csv")
+        self.catalog_path.write_text(CATALOG)
+        self.components_path = root.joinpath("components.csv")
+        self.components_path.write_text(COMPONENTS)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_cross_match(self):
+        matches = cross_match(read_table(self.catalog_path), read_table(self.components_path), 1)
+        rows = list(csv.reader(io.StringIO(matches.to_csv(index=False))))
+
+        # Like `SELECT *`, the columns of both tables are kept, even with the same names.
+        self.assertEqual(rows[0], ["id", "name", "right_ascension", "declination", "discover_date", "claimed_type",
+                                   "source", "id", "file_name", "ra", "decl", "total_flux"])
+
+        # SN2019b is about 2.2" from component 10, SN2018d is about 2.8" from component 12 across RA 0, SN2021c
+        # was discovered after the cutoff, SN2018e has no discovery date, component 11 is from
+        # epoch 2 and component 14 is too far away. Values are written as they were read.
+        self.assertEqual(rows[1:], [
+            ["1", "SN2019a", "150.0", "2.0", "2019-05-06 00:00:00", "SN Ia", "TNS",
+             "10", "VLASS1.1.ql.T01.fits", "150.0004", "2.0", "1.50"],
+            ["2", "SN2019b", "150.001", "2.0", "2019-06-01 12:30:00.5", "", "OAC",
+             "10", "VLASS1.1.ql.T01.fits", "150.0004", "2.0", "1.50"],
+            ["4", "SN2018d", "359.9995", "-10.0", "2018-01-01 00:00:00", "", "OAC",
+             "12", "VLASS1.2.ql.T02.fits", "0.0003", "-10.0", "3.25"],
+        ])
+        self.assertTrue(np.allclose(match_separations(matches) * 3600, [1.44, 2.16, 2.84], atol=0.01))
+
+    def test_epoch(self):
+        matches = cross_match(read_table(self.catalog_path), read_table(self.components_path), 2)
+        self.assertEqual(list(matches["name"]), ["SN2019a", "SN2019b", "SN2021c"])
+        self.assertEqual(set(matches["file_name"]), {"VLASS2.1.ql.T01.fits"})
+
+    def test_radii(self):
+        catalog, components = read_table(self.catalog_path), read_table(self.components_path)
+        radii = [DecimalDegrees(r / 3600) for r in (5, 1, 2.5, 40)]
+        matches = cross_match_radii(catalog, components, 1, radii)
+        # Component 14 is within 40" of SN2019a and SN2019b.
+        self.assertEqual([round(r * 3600, 6) for r in matches["match_radius"]], [2.5, 40, 2.5, 40, 5])
+        self.assertTrue(np.allclose(matches["separation"], match_separations(matches)))
+
+        # Each radius gives the same matches as a cross match with just that radius.
+        for radius in radii:
+            with self.subTest(radius=radius):
+                within = matches[matches["match_radius"] <= radius.degrees].drop(columns=["separation", "match_radius"])
+                self.assertEqual(within.to_csv(index=False),
+                                 cross_match(catalog, components, 1, radius).to_csv(index=False))
+
+    def test_bands(self):
+        # Missing declinations are in no band, rather than cast to a bogus one.
+        self.assertEqual(list(_bands(np.array([np.nan, -90.0, -89.5, 0.0, 90.0, np.inf]), 1.0)),
+                         [-1, 0, 0, 90, 179, -1])
+
+    def test_partitioned(self):
+        # Crowd everything around the edges of the 1 degree declination bands, and around RA 0.
+        rng = np.random.default_rng(0)
+        root = Path(self.tmp.name)
+
+        rows = ["id,name,right_ascension,declination,discover_date,claimed_type,source"]
+        for i in range(300):
+            dec = rng.integers(-3, 3) + rng.uniform(-0.01, 0.01)
+            rows.append(f"{i},SN{i},{(rng.uniform(0, 0.05) - 0.025) % 360},{dec},2019-01-01 00:00:00,,OAC")
+        catalog_path = root.joinpath("many.csv")
+        catalog_path.write_text("\n".join(rows) + "\n")
+
+        rows = ["id,file_name,ra,decl,total_flux"]
+        for i in range(3000):
+            dec = rng.integers(-3, 3) + rng.uniform(-0.01, 0.01)
+            rows.append(f"{i},VLASS{rng.integers(1, 3)}.1.ql.fits,{(rng.uniform(0, 0.05) - 0.025) % 360},{dec},{i / 8}")
+        components_path = root.joinpath("many_components.csv")
+        components_path.write_text("\n".join(rows) + "\n")
+
+        # Positions without a declination never match, in either table.
+        rows.append("3000,VLASS1.1.ql.fits,0.0,,1.0")
+        components_path.write_text("\n".join(rows) + "\n")
+        catalog_path.write_text(catalog_path.read_text() + "300,SN300,0.0,,2019-01-01 00:00:00,,OAC\n")
+
+        radius = DecimalDegrees(0.005)
+        catalog = read_table(catalog_path)
+        self.assertTrue(catalog["declination"].isna().any())
+        expected = cross_match(catalog, read_table(components_path), 1, radius)
+        self.assertGreater(len(expected), 100)
+
+        # A tiny budget runs one band at a time, and small chunks spill each band in pieces.
+        for memory_budget in (1, 1 << 30):
+            with self.subTest(memory_budget=memory_budget):
+                matches = cross_match_partitioned(catalog, components_path, 1, radius, num_processes=2,
+                                                  memory_budget=memory_budget, chunk_rows=97, spill_dir=root)
+                self.assertEqual(matches.to_csv(index=False), expected.to_csv(index=False))
+
+        radii = [DecimalDegrees(0.001), radius]
+        matches = cross_match_partitioned(catalog, components_path, 1, num_processes=2, chunk_rows=97, radii=radii)
+        expected = cross_match_radii(catalog, read_table(components_path), 1, radii)
+        self.assertEqual(matches.to_csv(index=False), expected.to_csv(index=False))
+
+        matches = cross_match_partitioned(catalog, components_path, 1, radius, num_processes=2, chunk_rows=97, best=True)
+        expected = cross_match_best(catalog, read_table(components_path), 1, radius)
+        self.assertGreater(expected["match_count"].max(), 1)
+        self.assertTrue(matches.equals(expected))
+
+    def test_best(self):
+        catalog, components = read_table(self.catalog_path), read_table(self.components_path)
+        best = cross_match_best(catalog, components, 1, DecimalDegrees(40 / 3600))
+
+        # SN2019a and SN2019b both match components 10 and 14, which are in the same file.
+        self.assertEqual(list(best["name"]), ["SN2019a", "SN2019b", "SN2018d"])
+        self.assertEqual(list(best["nearest_id"]), ["10", "10", "12"])
+        self.assertEqual(list(best["match_count"]), [2, 2, 1])
+        self.assertEqual(list(best["file_names"]), [["VLASS1.1.ql.T01.fits"], ["VLASS1.1.ql.T01.fits"],
+                                                    ["VLASS1.2.ql.T02.fits"]])
+        self.assertTrue(np.allclose(best["separation"] * 3600, [1.44, 2.16, 2.84], atol=0.01))
+        self.assertEqual(best["nearest_ra"].dtype, np.float64)
+
+        path = Path(self.tmp.name).joinpath("best.pickle")
+        save_best_matches(best, path)
+        self.assertTrue(load_best_matches(path).equals(best))
+
+        self.assertEqual(len(cross_match_best(catalog, components, 1, DecimalDegrees(1 / 3600))), 0)
+
+if __name__ == "__main__":
+    unittest.main()
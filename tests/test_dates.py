@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+import unittest
+
+import numpy as np
+
+from sneparse.dates import (try_parse_date, _try_parse_date_slow, parse_timestamp,
+                            try_parse_dates, parse_timestamps, TIMESTAMP_FORMAT)
+
+def outcome(f, s):
+    try:
+        return f(s)
+    except Exception as e:
+        return type(e)
+
+class DateParsingTests(unittest.TestCase):
+    OAC_DATES = [
+        "2020/01/15", "2020/1/5", "2022/11/11.52435", "2020/01", "2020/1", "2020",
+        "850/05/12", "0850/05/12", "50/01/01", "12/31/1667", "1667",
+        "2020/02/30", "2020/13", "2020/00/10", "2020/01/00", "31", "0031", "850/05", "2020/01/15.5.5",
+        "2020-01-15", "", "2020/01/nan", "9999/12/31.9",
+    ]
+
+    def test_try_parse_date(self):
+        self.assertEqual(try_parse_date("2022/11/11.5"), datetime(2022, 11, 11, 12))
+        self.assertEqual(try_parse_date("850/05/12"), datetime(850, 5, 12))
+        self.assertEqual(try_parse_date("12/31/1667"), datetime(1667, 12, 31))
+
+        # The fast paths must agree with the original algorithm, errors and all.
+        for s in self.OAC_DATES:
+            with self.subTest(s=s):
+                self.assertEqual(outcome(try_parse_date, s), outcome(_try_parse_date_slow, s))
+
+    def test_parse_timestamp(self):
+        for s in ["2021-03-04 05:06:07.890", "2021-03-04 05:06:07.123456", "2021-03-04 05:06:07.1",
+                  "2021-03-04 24:06:07.890", "2021-02-30 05:06:07.890", "2021-03-04 05:06:61.890",
+                  "2021-03-04 05:06:07", "2021-03-04 05:06:07.1234567", "2021-3-4 5:06:07.890", ""]:
+            with self.subTest(s=s):
+                self.assertEqual(outcome(parse_timestamp, s),
+                                 outcome(lambda s: datetime.strptime(s, TIMESTAMP_FORMAT), s))
+
+    def test_batch(self):
+        dates = try_parse_dates(["2022/11/11.5", None, "", "2020/02/30", "1667"])
+        self.assertEqual(dates.dtype, np.dtype("datetime64[us]"))
+        self.assertEqual(dates[0], np.datetime64(datetime(2022, 11, 11) + timedelta(hours=12)))
+        self.assertTrue(np.isnat(dates[1:4]).all())
+        self.assertEqual(dates[4], np.datetime64("1667-01-01"))
+
+        timestamps = parse_timestamps(["2021-03-04 05:06:07.890", None, "garbage"])
+        self.assertEqual(list(np.isnat(timestamps)), [False, True, True])
+        self.assertEqual(timestamps[0].item(), datetime(2021, 3, 4, 5, 6, 7, 890000))
+
+if __name__ == "__main__":
+    unittest.main()
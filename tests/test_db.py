@@ -0,0 +1,67 @@
+from unittest import mock
+import unittest
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from sneparse.db.models import EpochComponents
+from sneparse.db.util import epoch_components_table
+
+class EpochComponentsTests(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        with self.engine.begin() as connection:
+            connection.execute(text("CREATE TABLE pybdsf_gaussian (file_name TEXT, ra REAL, decl REAL);"))
+            for file_name in ["VLASS1.1.ql.T01.fits", "VLASS1.2.ql.T02.fits", "VLASS2.1.ql.T01.fits"]:
+                connection.execute(text(f"INSERT INTO pybdsf_gaussian VALUES ('{file_name}', 150.0, 2.0);"))
+        self.session_maker = sessionmaker(self.engine)
+
+        # The q3c index can only be built in PostgreSQL.
+        patcher = mock.patch("sneparse.db.util.prepare_q3c_index")
+        self.prepare = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def table(self, epoch, rebuild=False):
+        with self.session_maker() as session:
+            return epoch_components_table(session, epoch, rebuild)
+
+    def test_build_and_reuse(self):
+        table_name = self.table(1)
+        self.assertEqual(table_name, "pybdsf_gaussian_epoch1")
+        self.assertEqual(self.prepare.call_count, 1)
+        with self.session_maker() as session:
+            self.assertEqual(session.execute(text(f"SELECT count(*) FROM {table_name};")).scalar_one(), 2)
+            self.assertEqual(session.get(EpochComponents, 1).row_count, 2)
+
+        # Nothing changed, so the table is reused. Other epochs get tables of their own.
+        self.assertEqual(self.table(1), table_name)
+        self.assertEqual(self.prepare.call_count, 1)
+        self.assertEqual(self.table(2), "pybdsf_gaussian_epoch2")
+        self.assertEqual(self.prepare.call_count, 2)
+
+    def test_rebuild(self):
+        table_name = self.table(1)
+
+        # New or removed components of the epoch make the table out of date. Those of
+        # other epochs don't.
+        for (statement, expected) in (("INSERT INTO pybdsf_gaussian VALUES ('VLASS1.2.ql.T03.fits', 20.0, 20.0);", 3),
+                                      ("DELETE FROM pybdsf_gaussian WHERE file_name LIKE 'VLASS1.1%';", 2),
+                                      ("INSERT INTO pybdsf_gaussian VALUES ('VLASS2.2.ql.T03.fits', 20.0, 20.0);", 2)):
+            with self.subTest(statement=statement):
+                with self.engine.begin() as connection:
+                    connection.execute(text(statement))
+                self.table(1)
+                with self.session_maker() as session:
+                    self.assertEqual(session.execute(text(f"SELECT count(*) FROM {table_name};")).scalar_one(), expected)
+                    self.assertEqual(session.get(EpochComponents, 1).row_count, expected)
+        self.assertEqual(self.prepare.call_count, 3)
+
+        # So does a missing table, or asking for a rebuild.
+        with self.engine.begin() as connection:
+            connection.execute(text(f"DROP TABLE {table_name};"))
+        self.table(1)
+        self.table(1, rebuild=True)
+        self.assertEqual(self.prepare.call_count, 5)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import gzip
+import importlib.util
+import unittest
+
+from sneparse.crossmatch import read_table
+from sneparse.export import copy_to, export_path, select_list
+
+ROWS = [b"id,name,file_name\n"] + [f"{i},SN{i},VLASS1.1.ql.T{i % 7:02}.fits\n".encode() for i in range(1000)]
+
+class ChunkedCursor():
+    # Writes the rows of a COPY a few at a time, like psycopg2 does.
+    def __init__(self):
+        self.copies = []
+
+    def copy_expert(self, sql, f):
+        self.copies.append(sql)
+        for i in range(0, len(ROWS), 64):
+            f.write(b"".join(ROWS[i:i + 64]))
+
+class ExportTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_select_list(self):
+        self.assertEqual(select_list(None, None), "a.*, b.*")
+        self.assertEqual(select_list(["name", "right_ascension"], None), 'a."name", a."right_ascension", b.*')
+
+        # Quotes in names are escaped, and columns kept from both tables are renamed.
+        self.assertEqual(select_list(['x"; DROP TABLE a; --'], None), 'a."x""; DROP TABLE a; --", b.*')
+        self.assertEqual(select_list(["name", "ra"], ["ra", "file_name"]),
+                         'a."name", a."ra", b."ra" AS "b_ra", b."file_name"')
+
+    def test_export_path(self):
+        path = self.root.joinpath("epoch1_cross_matches.csv")
+        self.assertEqual(export_path(path, "csv"), path)
+        self.assertEqual(export_path(path, "zstd").name, "epoch1_cross_matches.csv.zst")
+        self.assertEqual(export_path(path, "parquet").name, "epoch1_cross_matches.parquet")
+
+    def test_copy_to(self):
+        def read_zstd(path):
+            import zstandard
+            with path.open("rb") as f:
+                return zstandard.ZstdDecompressor().stream_reader(f).read()
+
+        cursor = ChunkedCursor()
+        for (format, read) in (("csv", lambda path: path.read_bytes()),
+                               ("gzip", lambda path: gzip.decompress(path.read_bytes())),
+                               ("zstd", read_zstd)):
+            if format == "zstd" and importlib.util.find_spec("zstandard") is None:
+                continue
+            with self.subTest(format=format):
+                path = export_path(self.root.joinpath("matches.csv"), format)
+                copy_to(cursor, "temp_cross_match", path)
+                self.assertEqual(read(path), b"".join(ROWS))
+        self.assertEqual(cursor.copies[0], "COPY temp_cross_match TO STDOUT WITH (FORMAT csv, HEADER);\n")
+
+        with self.assertRaises(Exception):
+            copy_to(cursor, "temp_cross_match", self.root.joinpath("matches.txt"))
+
+    @unittest.skipUnless(importlib.util.find_spec("pyarrow"), "requires pyarrow")
+    def test_copy_to_parquet(self):
+        path = self.root.joinpath("matches.parquet")
+        copy_to(ChunkedCursor(), "temp_cross_match", path, chunk_rows=97)
+        table = read_table(path)
+        self.assertEqual(len(table), 1000)
+        self.assertEqual(list(table.columns), ["id", "name", "file_name"])
+        self.assertEqual(table["name"].iloc[-1], "SN999")
+        # Only the Parquet file is left behind.
+        self.assertEqual(list(self.root.iterdir()), [path])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+import unittest
+
+import numpy as np
+
+from sneparse.coordinates import DecimalDegrees
+from sneparse.dates import to_datetime64
+from sneparse.grouping import FriendsOfFriends, label_components, group_members
+
+def same_groups(labels, groups):
+    return sorted(m.tolist() for m in group_members(labels)) == sorted(groups)
+
+class GroupingTests(unittest.TestCase):
+    def setUp(self):
+        day = datetime(2020, 1, 15)
+        # 0-1-2 is a chain, spaced 0.9" apart, so 0 and 2 are only linked through 1.
+        # 3 is close to 0 but discovered two days later, 4 has no date and 5 has no position.
+        # 6 and 7 are close, and far from the rest.
+        arcsec = 1 / 3600
+        self.ra = np.array([10, 10 + 0.9 * arcsec, 10 + 1.8 * arcsec, 10, 10, np.nan, 200, 200])
+        self.dec = np.array([5, 5, 5, 5 + 0.5 * arcsec, 5 - 0.5 * arcsec, 5, -30, -30 + 0.5 * arcsec])
+        self.dates = to_datetime64([day, day + timedelta(hours=12), day + timedelta(hours=30), day + timedelta(days=2),
+                                    None, day, day, day - timedelta(hours=23)])
+
+    def test_label_components(self):
+        labels = label_components(5, np.array([[0, 3], [3, 4]]))
+        self.assertEqual(len(set(labels)), 3)
+        self.assertTrue(labels[0] == labels[3] == labels[4])
+        self.assertNotEqual(labels[1], labels[2])
+
+    def test_groups(self):
+        fof = FriendsOfFriends(self.ra, self.dec, self.dates)
+        self.assertTrue(same_groups(fof.groups(DecimalDegrees(1 / 3600)), [[0, 1, 2], [6, 7]]))
+
+        # Without the date filter, 3 and 4 join the first group, but 5 never can.
+        fof = FriendsOfFriends(self.ra, self.dec, self.dates, time_window=None)
+        self.assertTrue(same_groups(fof.groups(DecimalDegrees(1 / 3600)), [[0, 1, 2, 3, 4], [6, 7]]))
+
+    def test_names(self):
+        names = ["a", "b", "c", "d", "e", "f", "g", "g"]
+        fof = FriendsOfFriends(self.ra, self.dec, self.dates, names=names)
+        self.assertTrue(same_groups(fof.groups(DecimalDegrees(1 / 3600)), [[0, 1, 2]]))
+
+    def test_sweep(self):
+        fof = FriendsOfFriends(self.ra, self.dec, self.dates)
+        lengths = [DecimalDegrees(0.4 / 3600), DecimalDegrees(1 / 3600), DecimalDegrees(0.6 / 3600)]
+        labels = fof.sweep(lengths)
+        self.assertEqual(len(labels), 3)
+        for length, swept in zip(lengths, labels):
+            self.assertTrue(np.array_equal(swept, fof.groups(length)))
+        self.assertTrue(same_groups(labels[0], []))
+        self.assertTrue(same_groups(labels[2], [[6, 7]]))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,11 @@
 from typing import Any
 import unittest
+import pickle
 import json
 from datetime import datetime
 
 from sneparse.record import SneRecord, Source
+from sneparse.oac import extract_oac_fields
 from sneparse.coordinates import DegreesMinutesSeconds, HoursMinutesSeconds
 
 class RecordParsingTests(unittest.TestCase):
@@ -348,5 +350,71 @@ class RecordParsingTests(unittest.TestCase):
                                    Source.OAC)
                          )
 
+class OacExtractionTests(unittest.TestCase):
+    def check(self, s: str):
+        self.assertEqual(SneRecord.from_oac(extract_oac_fields(s)), SneRecord.from_oac(json.loads(s)))
+
+    def test_extract(self):
+        d = {
+            "SN2011fe": {
+                "schema": "https://github.com/astrocatalogs/supernovae/blob/d3ef5fc/SCHEMA.md",
+                "name": "<a id=\"SN2011fe\">SN2011fe</a>",
+                "sources": [{ "name": "ATel \"[13413]\" {x} \\", "alias": "1" }, { "name": "é", "alias": "2" }],
+                "claimedtype": [{ "value": "Ia", "source": "1" }, { "value": "Ia-norm" }],
+                "dec": [{ "value": "+54:16:25.2", "u_value": "degrees" }],
+                "discoverdate": [{ "value": "2011/08/24.167" }],
+                "photometry": [{ "time": str(55000 + i), "magnitude": "12.3", "upperlimit": True } for i in range(100)],
+                "ra": [{ "value": "14:03:05.81" }],
+                "redshift": [{ "value": 0.0008, "kind": None }],
+                "spectra": [{ "data": [[str(j), [str(2.0 * j)]] for j in range(50)], "time": "55000" }],
+            }
+        }
+        self.check(json.dumps(d, indent="\t"))
+        self.check(json.dumps(d, separators=(",", ":")))
+        self.check(json.dumps(d, sort_keys=True, indent=4))
+
+        self.assertEqual(extract_oac_fields(json.dumps(d))["SN2011fe"],
+                         { "name": "<a id=\"SN2011fe\">SN2011fe</a>",
+                           "claimedtype": [{ "value": "Ia", "source": "1" }],
+                           "dec": [{ "value": "+54:16:25.2", "u_value": "degrees" }],
+                           "discoverdate": [{ "value": "2011/08/24.167" }],
+                           "ra": [{ "value": "14:03:05.81" }] })
+
+        # Missing keys
+        del d["SN2011fe"]["ra"]
+        self.check(json.dumps(d))
+        self.assertEqual(extract_oac_fields('{"SN2011fe": {"name": "SN2011fe", "ra": []}}'),
+                         { "SN2011fe": { "name": "SN2011fe", "ra": [] } })
+
+    def test_invalid(self):
+        with self.assertRaises(json.JSONDecodeError):
+            extract_oac_fields('{"SN2011fe": {"name": "SN2011fe", "photometry": [{"time": "1"}')
+        with self.assertRaises(json.JSONDecodeError):
+            extract_oac_fields("")
+
+class RecordIdentityTests(unittest.TestCase):
+    def test_slots(self):
+        r = SneRecord("SN2020a", 10.0, -20.0, datetime(2020, 1, 15), "Ia", Source.OAC)
+        self.assertFalse(hasattr(r, "__dict__"))
+        self.assertFalse(hasattr(r.right_ascension, "__dict__"))
+        self.assertEqual(list(r.as_dict().keys()),
+                         ["name", "right_ascension", "declination", "discover_date", "claimed_type", "source"])
+        self.assertEqual(list(r.as_row()),
+                         ["SN2020a", "10.0", "-20.0", "2020-01-15 00:00:00.000000", "Ia", "Source.OAC"])
+        self.assertEqual(pickle.loads(pickle.dumps(r)), r)
+
+    def test_hash(self):
+        r = SneRecord("SN2020a", 10.0, -20.0, datetime(2020, 1, 15), "Ia", Source.OAC)
+
+        # Records that are equal within the coordinate tolerance must hash the same
+        s = SneRecord("SN2020a", 10.0 + 1e-9, -20.0, datetime(2020, 1, 15), "Ia", Source.OAC)
+        self.assertEqual(r, s)
+        self.assertEqual(hash(r), hash(s))
+        self.assertEqual(len({r, s}), 1)
+
+        t = SneRecord("SN2020a", 10.0, -20.0, datetime(2020, 1, 15), None, Source.OAC)
+        self.assertNotEqual(r, t)
+        self.assertEqual(len({r, s, t}), 2)
+
 if __name__ == "__main__":
     unittest.main()